@@ -0,0 +1,5 @@
+# -*- coding: utf-8 -*-
+"""
+    Benchmarks of the scenario analysis, run against synthetic scenarios
+    of configurable size.
+"""
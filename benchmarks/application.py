@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+"""
+    QGIS application used by the benchmarks.
+"""
+
+
+def init_qgis():
+    """Initializes QGIS processing, returning the application or None
+    when QGIS is not available.
+    """
+    try:
+        from qgis.core import QgsApplication
+        from qgis.analysis import QgsNativeAlgorithms
+        from processing.core.Processing import Processing
+    except ImportError:
+        return None
+
+    application = QgsApplication([], False)
+    application.initQgis()
+    Processing.initialize()
+    QgsApplication.processingRegistry().addProvider(QgsNativeAlgorithms())
+
+    return application
@@ -0,0 +1,367 @@
+# -*- coding: utf-8 -*-
+"""
+    Synthetic pathways, priority weighting layers (PWL) and mask datasets
+    of configurable size used to benchmark the scenario analysis.
+"""
+
+import dataclasses
+import math
+import os
+import typing
+import uuid
+
+import numpy as np
+from osgeo import gdal, ogr, osr
+
+from cplus_core.definitions.constants import NO_DATA_VALUE
+from cplus_core.utils.raster import RasterGrid
+
+# Rows written at once when generating the rasters.
+STRIP_HEIGHT = 256
+
+# Projected CRS of the synthetic datasets.
+DATASETS_EPSG = 32735
+
+# Offsets of the model UUIDs, the models of a scenario keep their UUIDs
+# between calls so the analysis can be resumed.
+SCENARIO_UUID = 10000
+ACTIVITY_UUID_OFFSET = 20000
+PATHWAY_UUID_OFFSET = 30000
+
+
+@dataclasses.dataclass
+class SyntheticScenarioSpec:
+    """Size and shape of a synthetic scenario."""
+
+    size: int = 1024
+    activities: int = 3
+    pathways_per_activity: int = 2
+    priority_layers_per_pathway: int = 2
+    # Fraction of the pathways PWL references pointing to a shared PWL
+    pwl_reuse_ratio: float = 0.5
+    nodata_fraction: float = 0.1
+    mask_count: int = 0
+    # Side in pixels of the patches of equal values
+    patch_size: int = 8
+    pixel_size: float = 30.0
+    seed: int = 0
+
+    def to_dict(self) -> dict:
+        """Returns the spec as a dictionary."""
+        return dataclasses.asdict(self)
+
+    @property
+    def priority_layer_count(self) -> int:
+        """Number of distinct PWLs shared by the pathways."""
+        references = (
+            self.activities
+            * self.pathways_per_activity
+            * self.priority_layers_per_pathway
+        )
+        distinct = math.ceil(references * (1.0 - self.pwl_reuse_ratio))
+
+        return max(distinct, self.priority_layers_per_pathway)
+
+
+def spec_grid(spec: SyntheticScenarioSpec) -> RasterGrid:
+    """Returns the grid of the synthetic scenario rasters.
+
+    :param spec: Synthetic scenario spec
+    :type spec: SyntheticScenarioSpec
+
+    :returns: Raster grid
+    :rtype: RasterGrid
+    """
+    srs = osr.SpatialReference()
+    srs.ImportFromEPSG(DATASETS_EPSG)
+    extent = spec.size * spec.pixel_size
+
+    return RasterGrid.from_extent(
+        0, extent, 0, extent, spec.pixel_size, spec.pixel_size, srs.ExportToWkt()
+    )
+
+
+def write_random_raster(
+    path: str,
+    grid: RasterGrid,
+    rng: np.random.Generator,
+    nodata_fraction: float = 0.0,
+    patch_size: int = 1,
+    decimals: int = 2,
+) -> str:
+    """Writes a raster of random values in [0, 1) made of square patches
+    of equal values, with random nodata pixels. Values are rounded to
+    create ties between the rasters.
+
+    :param path: Raster path
+    :type path: str
+
+    :param grid: Raster grid
+    :type grid: RasterGrid
+
+    :param rng: Random values generator
+    :type rng: np.random.Generator
+
+    :param nodata_fraction: Fraction of the pixels set as nodata
+    :type nodata_fraction: float
+
+    :param patch_size: Side in pixels of the patches of equal values
+    :type patch_size: int
+
+    :param decimals: Decimals of the rounded values
+    :type decimals: int
+
+    :returns: Raster path
+    :rtype: str
+    """
+    driver = gdal.GetDriverByName("GTiff")
+    dataset = driver.Create(
+        path,
+        grid.width,
+        grid.height,
+        1,
+        gdal.GDT_Float32,
+        ["TILED=YES", "COMPRESS=LZW"],
+    )
+    dataset.SetGeoTransform(grid.geotransform)
+    dataset.SetProjection(grid.crs_wkt)
+    band = dataset.GetRasterBand(1)
+    band.SetNoDataValue(NO_DATA_VALUE)
+
+    patch_size = max(int(patch_size), 1)
+    strip_height = max(STRIP_HEIGHT // patch_size, 1) * patch_size
+    patch_columns = math.ceil(grid.width / patch_size)
+    for row_off in range(0, grid.height, strip_height):
+        height = min(strip_height, grid.height - row_off)
+        patches = rng.random((math.ceil(height / patch_size), patch_columns))
+        values = np.repeat(np.repeat(patches, patch_size, 0), patch_size, 1)
+        values = np.round(values[:height, : grid.width], decimals).astype(np.float32)
+        values[rng.random(values.shape) < nodata_fraction] = NO_DATA_VALUE
+        band.WriteArray(values, 0, row_off)
+
+    dataset = None
+
+    return path
+
+
+def write_mask(
+    path: str, grid: RasterGrid, rng: np.random.Generator, count: int = 4
+) -> str:
+    """Writes a GeoJSON mask layer of random rectangles.
+
+    :param path: Mask layer path
+    :type path: str
+
+    :param grid: Grid of the masked rasters
+    :type grid: RasterGrid
+
+    :param rng: Random values generator
+    :type rng: np.random.Generator
+
+    :param count: Number of rectangles
+    :type count: int
+
+    :returns: Mask layer path
+    :rtype: str
+    """
+    x_min, y_min, x_max, y_max = grid.bounds
+    srs = osr.SpatialReference()
+    srs.ImportFromWkt(grid.crs_wkt)
+
+    dataset = ogr.GetDriverByName("GeoJSON").CreateDataSource(path)
+    layer = dataset.CreateLayer("mask", srs, ogr.wkbPolygon)
+    for _ in range(count):
+        width, height = rng.uniform(0.05, 0.2, 2) * (x_max - x_min, y_max - y_min)
+        left = rng.uniform(x_min, x_max - width)
+        bottom = rng.uniform(y_min, y_max - height)
+        ring = ogr.Geometry(ogr.wkbLinearRing)
+        for x, y in [
+            (left, bottom),
+            (left + width, bottom),
+            (left + width, bottom + height),
+            (left, bottom + height),
+            (left, bottom),
+        ]:
+            ring.AddPoint_2D(float(x), float(y))
+        polygon = ogr.Geometry(ogr.wkbPolygon)
+        polygon.AddGeometry(ring)
+        feature = ogr.Feature(layer.GetLayerDefn())
+        feature.SetGeometry(polygon)
+        layer.CreateFeature(feature)
+    dataset = None
+
+    return path
+
+
+@dataclasses.dataclass
+class SyntheticScenario:
+    """Datasets of a generated synthetic scenario."""
+
+    spec: SyntheticScenarioSpec
+    grid: RasterGrid
+    # Pathway paths and the indices of their PWLs, by activity
+    activity_pathways: typing.List[typing.List[typing.Tuple[str, typing.List[int]]]]
+    priority_layer_paths: typing.List[str]
+    mask_paths: typing.List[str]
+
+    def priority_layers(self) -> typing.Tuple[typing.List, typing.List]:
+        """Returns the PWLs settings and their priority groups.
+
+        :returns: Priority layers and priority layer groups
+        :rtype: typing.Tuple[typing.List, typing.List]
+        """
+        group = {"name": "Benchmark", "value": "5"}
+        priority_layers = [
+            {
+                "uuid": str(uuid.UUID(int=index + 1)),
+                "name": f"priority_layer_{index}",
+                "description": "",
+                "path": path,
+                "selected": True,
+                "groups": [group],
+            }
+            for index, path in enumerate(self.priority_layer_paths)
+        ]
+        groups = [dict(group, layers=[layer["name"] for layer in priority_layers])]
+
+        return priority_layers, groups
+
+    def task_config(self, base_dir: str, **options):
+        """Creates the task config of the scenario analysis. Models are
+        created on each call with the same UUIDs, the analysis updates
+        their paths.
+
+        :param base_dir: Scenario analysis output directory
+        :type base_dir: str
+
+        :param options: Task config options
+        :type options: dict
+
+        :returns: Task config
+        :rtype: TaskConfig
+        """
+        from cplus_core.analysis import TaskConfig
+        from cplus_core.models.base import (
+            Activity,
+            LayerType,
+            NcsPathway,
+            Scenario,
+            SpatialExtent,
+        )
+
+        priority_layers, groups = self.priority_layers()
+        activities = []
+        for activity_index, pathways in enumerate(self.activity_pathways):
+            activities.append(
+                Activity(
+                    uuid=uuid.UUID(int=ACTIVITY_UUID_OFFSET + activity_index),
+                    name=f"activity_{activity_index}",
+                    description="",
+                    pathways=[
+                        NcsPathway(
+                            uuid=uuid.UUID(
+                                int=PATHWAY_UUID_OFFSET
+                                + activity_index * self.spec.pathways_per_activity
+                                + pathway_index
+                            ),
+                            name=os.path.splitext(os.path.basename(path))[0],
+                            description="",
+                            path=path,
+                            layer_type=LayerType.RASTER,
+                            priority_layers=[
+                                {
+                                    "uuid": priority_layers[index]["uuid"],
+                                    "name": priority_layers[index]["name"],
+                                }
+                                for index in layer_indices
+                            ],
+                        )
+                        for pathway_index, (path, layer_indices) in enumerate(pathways)
+                    ],
+                )
+            )
+
+        x_min, y_min, x_max, y_max = self.grid.bounds
+        scenario = Scenario(
+            uuid=uuid.UUID(int=SCENARIO_UUID),
+            name="Benchmark scenario",
+            description="",
+            extent=SpatialExtent(bbox=[x_min, x_max, y_min, y_max]),
+            activities=activities,
+            weighted_activities=[],
+            priority_layer_groups=groups,
+        )
+
+        return TaskConfig(
+            scenario,
+            priority_layers,
+            groups,
+            activities,
+            activities,
+            mask_layers_paths=",".join(self.mask_paths),
+            base_dir=base_dir,
+            **options,
+        )
+
+
+def generate_scenario(spec: SyntheticScenarioSpec, directory: str) -> SyntheticScenario:
+    """Writes the datasets of a synthetic scenario.
+
+    :param spec: Synthetic scenario spec
+    :type spec: SyntheticScenarioSpec
+
+    :param directory: Directory of the datasets
+    :type directory: str
+
+    :returns: Synthetic scenario
+    :rtype: SyntheticScenario
+    """
+    os.makedirs(directory, exist_ok=True)
+    rng = np.random.default_rng(spec.seed)
+    grid = spec_grid(spec)
+
+    priority_layer_paths = [
+        write_random_raster(
+            os.path.join(directory, f"priority_layer_{index}.tif"),
+            grid,
+            rng,
+            spec.nodata_fraction,
+            spec.patch_size,
+        )
+        for index in range(spec.priority_layer_count)
+    ]
+
+    activity_pathways = []
+    pathway_index = 0
+    for activity_index in range(spec.activities):
+        pathways = []
+        for _ in range(spec.pathways_per_activity):
+            path = write_random_raster(
+                os.path.join(directory, f"pathway_{pathway_index}.tif"),
+                grid,
+                rng,
+                spec.nodata_fraction,
+                spec.patch_size,
+            )
+            # Consecutive references cycle through the distinct PWLs
+            layer_indices = [
+                (pathway_index * spec.priority_layers_per_pathway + offset)
+                % len(priority_layer_paths)
+                for offset in range(spec.priority_layers_per_pathway)
+            ]
+            pathways.append((path, layer_indices))
+            pathway_index += 1
+        activity_pathways.append(pathways)
+
+    mask_paths = [
+        write_mask(os.path.join(directory, f"mask_{index}.geojson"), grid, rng)
+        for index in range(spec.mask_count)
+    ]
+
+    return SyntheticScenario(
+        spec=spec,
+        grid=grid,
+        activity_pathways=activity_pathways,
+        priority_layer_paths=priority_layer_paths,
+        mask_paths=mask_paths,
+    )
@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+"""
+    Benchmark of the native streaming highest position kernel against the
+    QGIS highest position in raster stack algorithm.
+
+    Usage: python -m benchmarks.highest_position [--size 2048]
+        [--counts 10 50 200] [--output report.json]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+from osgeo import gdal
+
+from cplus_core.analysis.engine import (
+    ActivityPlan,
+    EnginePlan,
+    HIGHEST_POSITION_PIXEL_BYTES,
+    HighestPositionEngine,
+)
+from cplus_core.definitions.constants import NO_DATA_VALUE
+from cplus_core.utils.raster import RasterGrid
+
+from .application import init_qgis
+from .datasets import SyntheticScenarioSpec, spec_grid, write_random_raster
+from .report import BenchmarkReport, BenchmarkResult
+
+DEFAULT_COUNTS = [10, 50, 200]
+
+# Fraction of the synthetic activities pixels set as nodata.
+NODATA_FRACTION = 0.2
+
+
+def create_activities(
+    directory: str, grid: RasterGrid, count: int, seed: int = 0
+) -> list:
+    """Writes random activities rasters with nodata gaps and ties."""
+    rng = np.random.default_rng(seed)
+
+    return [
+        write_random_raster(
+            os.path.join(directory, f"activity_{index}.tif"),
+            grid,
+            rng,
+            NODATA_FRACTION,
+        )
+        for index in range(count)
+    ]
+
+
+def run_native(grid: RasterGrid, paths: list, output_path: str, budget: int):
+    """Runs the native kernel, returning the elapsed seconds."""
+    plan = EnginePlan(
+        grid=grid,
+        pathways=[],
+        activities=[
+            ActivityPlan(uuid=str(index), name=str(index), path=path)
+            for index, path in enumerate(paths)
+        ],
+        highest_position_path=output_path,
+    )
+    plan.set_memory_budget(budget, bytes_per_pixel=HIGHEST_POSITION_PIXEL_BYTES)
+
+    start = time.perf_counter()
+    HighestPositionEngine(plan).run()
+
+    return time.perf_counter() - start
+
+
+def run_qgis(grid: RasterGrid, paths: list, output_path: str) -> float:
+    """Runs the QGIS algorithm, returning the elapsed seconds."""
+    import processing
+
+    x_min, y_min, x_max, y_max = grid.bounds
+    start = time.perf_counter()
+    processing.run(
+        "native:highestpositioninrasterstack",
+        {
+            "IGNORE_NODATA": True,
+            "INPUT_RASTERS": paths,
+            "EXTENT": f"{x_min},{x_max},{y_min},{y_max}",
+            "OUTPUT_NODATA_VALUE": NO_DATA_VALUE,
+            "REFERENCE_LAYER": paths[0],
+            "OUTPUT": output_path,
+        },
+    )
+
+    return time.perf_counter() - start
+
+
+def mismatches(first_path: str, second_path: str) -> int:
+    """Returns the number of differing pixels of the two outputs."""
+    first = gdal.Open(first_path).ReadAsArray()
+    second = gdal.Open(second_path).ReadAsArray()
+
+    return int(np.count_nonzero(first != second))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, default=2048)
+    parser.add_argument("--counts", type=int, nargs="+", default=DEFAULT_COUNTS)
+    parser.add_argument("--memory-budget", type=int, default=512, help="MB")
+    parser.add_argument("--output", help="Path of the JSON report")
+    args = parser.parse_args()
+
+    application = init_qgis()
+
+    grid = spec_grid(SyntheticScenarioSpec(size=args.size))
+    report = BenchmarkReport(name="highest_position")
+
+    print("activities,native_seconds,qgis_seconds,mismatched_pixels")
+    for count in args.counts:
+        with tempfile.TemporaryDirectory() as directory:
+            paths = create_activities(directory, grid, count)
+            native_path = os.path.join(directory, "native.tif")
+            qgis_path = os.path.join(directory, "qgis.tif")
+
+            native_seconds = run_native(
+                grid, paths, native_path, args.memory_budget * 1024 * 1024
+            )
+            qgis_seconds = None
+            differences = ""
+            if application is not None:
+                qgis_seconds = run_qgis(grid, paths, qgis_path)
+                differences = mismatches(native_path, qgis_path)
+
+            result = BenchmarkResult(
+                parameters={"size": args.size, "activities": count},
+                timings={"native": native_seconds},
+            )
+            if qgis_seconds is not None:
+                result.timings["qgis"] = qgis_seconds
+            report.results.append(result)
+
+            print(
+                f"{count},{native_seconds:.3f},"
+                f"{'' if qgis_seconds is None else f'{qgis_seconds:.3f}'},"
+                f"{differences}"
+            )
+
+    if application is not None:
+        application.exitQgis()
+
+    if args.output:
+        report.save(args.output, curve_parameters=["activities"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""
+    Benchmark of the import time of the cplus_core modules, each module is
+    imported in a fresh interpreter. The report records whether the
+    import loaded QGIS.
+
+    Usage: python -m benchmarks.imports [--repeat 5] [--output report.json]
+        [--baseline baseline.json]
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+from .report import (
+    BenchmarkReport,
+    BenchmarkResult,
+    DEFAULT_TOLERANCE,
+    compare_reports,
+)
+
+DEFAULT_MODULES = [
+    "cplus_core",
+    "cplus_core.models.base",
+    "cplus_core.analysis",
+    "cplus_core.analysis.task_config",
+    "cplus_core.analysis.runner",
+]
+
+# Code timing the import of a module in the child interpreter.
+IMPORT_SCRIPT = """
+import importlib, json, sys, time
+start = time.perf_counter()
+importlib.import_module(sys.argv[1])
+seconds = time.perf_counter() - start
+print(json.dumps({
+    "seconds": seconds,
+    "qgis_loaded": "qgis.core" in sys.modules,
+    "modules": len(sys.modules),
+}))
+"""
+
+
+def time_import(module: str) -> dict:
+    """Imports the module in a new interpreter.
+
+    :param module: Module name
+    :type module: str
+
+    :returns: Import seconds, whether QGIS was loaded and the number of
+    loaded modules
+    :rtype: dict
+    """
+    process = subprocess.run(
+        [sys.executable, "-c", IMPORT_SCRIPT, module],
+        capture_output=True,
+        text=True,
+    )
+    if process.returncode != 0:
+        raise RuntimeError(f"Unable to import {module}: {process.stderr}")
+
+    return json.loads(process.stdout.splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--modules", nargs="+", default=DEFAULT_MODULES)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="Path of the JSON report")
+    parser.add_argument("--baseline", help="Path of the baseline JSON report")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args()
+
+    report = BenchmarkReport(name="imports")
+    print("module,median_seconds,qgis_loaded,modules")
+    for module in args.modules:
+        runs = [time_import(module) for _ in range(max(args.repeat, 1))]
+        seconds = statistics.median(run["seconds"] for run in runs)
+        report.results.append(
+            BenchmarkResult(
+                parameters={"module": module},
+                timings={"import": seconds},
+                metrics=runs,
+            )
+        )
+        print(
+            f"{module},{seconds:.4f},{runs[0]['qgis_loaded']}," f"{runs[0]['modules']}"
+        )
+
+    if args.output:
+        report.save(args.output)
+
+    if args.baseline:
+        regressions = compare_reports(
+            BenchmarkReport.load(args.baseline), report, args.tolerance
+        )
+        for regression in regressions:
+            print(f"Regression: {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
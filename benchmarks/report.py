@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+"""
+    JSON reports of the benchmark runs and their comparison against a
+    stored baseline report.
+"""
+
+import dataclasses
+import datetime
+import json
+import os
+import platform
+import typing
+
+# Relative slowdown of a stage reported as a regression.
+DEFAULT_TOLERANCE = 0.2
+
+# Stages faster than this in the baseline are not compared, their
+# timings are dominated by noise.
+MIN_COMPARED_SECONDS = 0.05
+
+
+def environment() -> dict:
+    """Returns the environment the benchmarks run in."""
+    info = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+    try:
+        from osgeo import gdal
+
+        info["gdal"] = gdal.__version__
+    except ImportError:
+        pass
+    try:
+        from qgis.core import Qgis
+
+        info["qgis"] = Qgis.QGIS_VERSION
+    except ImportError:
+        pass
+
+    return info
+
+
+@dataclasses.dataclass
+class BenchmarkResult:
+    """Timings of one benchmark case."""
+
+    # Parameters of the case, identifying it across reports
+    parameters: dict
+    # Wall time in seconds of each stage, including the end to end run
+    timings: typing.Dict[str, float] = dataclasses.field(default_factory=dict)
+    # Additional measures of the stages
+    metrics: typing.List[dict] = dataclasses.field(default_factory=list)
+
+    @property
+    def key(self) -> str:
+        """Key of the case parameters."""
+        return json.dumps(self.parameters, sort_keys=True)
+
+
+@dataclasses.dataclass
+class Regression:
+    """Stage slower than in the baseline."""
+
+    parameters: dict
+    stage: str
+    baseline: float
+    current: float
+
+    @property
+    def ratio(self) -> float:
+        """Current timing relative to the baseline timing."""
+        return self.current / self.baseline
+
+    def __str__(self) -> str:
+        return (
+            f"{self.stage} {json.dumps(self.parameters, sort_keys=True)}: "
+            f"{self.baseline:.3f}s -> {self.current:.3f}s "
+            f"({(self.ratio - 1) * 100:+.1f}%)"
+        )
+
+
+@dataclasses.dataclass
+class BenchmarkReport:
+    """Results of a benchmark run."""
+
+    name: str
+    results: typing.List[BenchmarkResult] = dataclasses.field(default_factory=list)
+    environment: dict = dataclasses.field(default_factory=environment)
+    created_date: str = dataclasses.field(
+        default_factory=lambda: datetime.datetime.now().isoformat()
+    )
+
+    def scaling_curves(self, parameter: str) -> typing.Dict[str, list]:
+        """Returns the timings of each stage against a case parameter,
+        sorted by the parameter value.
+
+        :param parameter: Case parameter name
+        :type parameter: str
+
+        :returns: Points (parameter value, seconds) by stage
+        :rtype: typing.Dict[str, list]
+        """
+        curves = {}
+        for result in sorted(
+            self.results, key=lambda item: item.parameters.get(parameter, 0)
+        ):
+            for stage, seconds in result.timings.items():
+                curves.setdefault(stage, []).append(
+                    [result.parameters.get(parameter), seconds]
+                )
+
+        return curves
+
+    def to_dict(self, curve_parameters: typing.List[str] = None) -> dict:
+        """Returns the report as a dictionary.
+
+        :param curve_parameters: Case parameters of the scaling curves
+        :type curve_parameters: typing.List[str]
+
+        :returns: Report dictionary
+        :rtype: dict
+        """
+        return {
+            "name": self.name,
+            "created_date": self.created_date,
+            "environment": self.environment,
+            "results": [dataclasses.asdict(result) for result in self.results],
+            "scaling_curves": {
+                parameter: self.scaling_curves(parameter)
+                for parameter in curve_parameters or []
+            },
+        }
+
+    def save(self, path: str, curve_parameters: typing.List[str] = None):
+        """Writes the report as JSON.
+
+        :param path: Report path
+        :type path: str
+
+        :param curve_parameters: Case parameters of the scaling curves
+        :type curve_parameters: typing.List[str]
+        """
+        with open(path, "w") as f:
+            json.dump(self.to_dict(curve_parameters), f, indent=2)
+
+    @classmethod
+    def load(cls, path: str) -> "BenchmarkReport":
+        """Reads a JSON report.
+
+        :param path: Report path
+        :type path: str
+
+        :returns: Benchmark report
+        :rtype: BenchmarkReport
+        """
+        with open(path) as f:
+            data = json.load(f)
+
+        return cls(
+            name=data["name"],
+            results=[BenchmarkResult(**result) for result in data["results"]],
+            environment=data.get("environment", {}),
+            created_date=data.get("created_date", ""),
+        )
+
+
+def compare_reports(
+    baseline: BenchmarkReport,
+    current: BenchmarkReport,
+    tolerance: float = DEFAULT_TOLERANCE,
+    min_seconds: float = MIN_COMPARED_SECONDS,
+) -> typing.List[Regression]:
+    """Returns the stages of the current report slower than in the
+    baseline by more than the tolerance, for the cases in both reports.
+
+    :param baseline: Baseline report
+    :type baseline: BenchmarkReport
+
+    :param current: Current report
+    :type current: BenchmarkReport
+
+    :param tolerance: Relative slowdown reported as a regression
+    :type tolerance: float
+
+    :param min_seconds: Minimum baseline timing of the compared stages
+    :type min_seconds: float
+
+    :returns: Regressions
+    :rtype: typing.List[Regression]
+    """
+    baseline_results = {result.key: result for result in baseline.results}
+    regressions = []
+    for result in current.results:
+        baseline_result = baseline_results.get(result.key)
+        if baseline_result is None:
+            continue
+
+        for stage, seconds in result.timings.items():
+            baseline_seconds = baseline_result.timings.get(stage)
+            if baseline_seconds is None or baseline_seconds < min_seconds:
+                continue
+            if seconds > baseline_seconds * (1 + tolerance):
+                regressions.append(
+                    Regression(result.parameters, stage, baseline_seconds, seconds)
+                )
+
+    return regressions
@@ -0,0 +1,260 @@
+# -*- coding: utf-8 -*-
+"""
+    Benchmark of the scenario analysis stages over synthetic scenarios.
+
+    Every case generates a synthetic scenario, runs the analysis runner end
+    to end and reports the wall time of the run and of each of its
+    stages, taken from the runner stage metrics. Each completed stage is
+    then run again on its own, by resuming the analysis with the other
+    stages restored from the checkpoint of the run. The JSON report holds
+    the scaling curves of the stages against the scenario size and number
+    of activities, and can be compared with a baseline report.
+
+    The cases mask the activities and sieve them by default so that every
+    stage is measured, the fused engine is only used without the sieve.
+
+    Usage: python -m benchmarks.scenario [--sizes 512 1024 2048]
+        [--activities 2 4 8] [--option fused_engine_enabled=true]
+        [--sieve-threshold 0] [--output report.json] [--baseline baseline.json]
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+from .application import init_qgis
+from .datasets import SyntheticScenarioSpec, generate_scenario
+from .report import (
+    BenchmarkReport,
+    BenchmarkResult,
+    DEFAULT_TOLERANCE,
+    compare_reports,
+)
+
+DEFAULT_SIZES = [512, 1024, 2048]
+
+DEFAULT_ACTIVITIES = [3]
+
+# Timing key of the end to end run.
+TOTAL_TIMING = "total"
+
+# Suffix of the timing keys of the stages run on their own.
+ISOLATED_SUFFIX = "_isolated"
+
+
+def parse_options(values: list) -> dict:
+    """Parses the KEY=VALUE task config options, values are read as
+    JSON and fall back to strings.
+    """
+    options = {}
+    for value in values or []:
+        key, _, text = value.partition("=")
+        try:
+            options[key] = json.loads(text)
+        except ValueError:
+            options[key] = text
+
+    return options
+
+
+def stage_timings(runner) -> dict:
+    """Returns the wall time of each stage recorded by the runner.
+
+    :param runner: Scenario runner
+    :type runner: ScenarioRunner
+
+    :returns: Seconds by stage
+    :rtype: dict
+    """
+    return {
+        metrics.stage: metrics.wall_time
+        for metrics in runner.metrics.records
+        if not metrics.item_uuid
+    }
+
+
+def check_run(runner, success: bool):
+    """Raises an error when the analysis did not complete.
+
+    :param runner: Scenario runner
+    :type runner: ScenarioRunner
+
+    :param success: Result of the run
+    :type success: bool
+    """
+    if not success or runner.error is not None:
+        raise RuntimeError(f"Scenario analysis failed, {runner.error}")
+
+
+def run_isolated_stage(config, stage: str):
+    """Runs a single stage of a completed analysis again. The analysis is
+    resumed from its checkpoint with the stage marked as not completed,
+    so the other stages restore their outputs instead of running.
+
+    The runner is returned unfinished, the outputs in its temporary
+    directory are restored by the stages run after it.
+
+    :param config: Task config of the completed analysis
+    :type config: TaskConfig
+
+    :param stage: Stage name
+    :type stage: str
+
+    :returns: Runner of the stage
+    :rtype: ScenarioRunner
+    """
+    from cplus_core.analysis import ScenarioRunner
+    from cplus_core.analysis.manifest import RunManifest
+
+    manifest = RunManifest.load(config.base_dir)
+    manifest.data["completed_stages"] = [
+        completed
+        for completed in manifest.data.get("completed_stages", [])
+        if completed != stage
+    ]
+    manifest.save()
+
+    runner = ScenarioRunner(config)
+    check_run(runner, runner.resume())
+
+    return runner
+
+
+def run_case(spec: SyntheticScenarioSpec, options: dict, repeat: int = 1):
+    """Runs the analysis of a synthetic scenario end to end and then each
+    of its stages on its own, keeping the fastest timing of each stage
+    over the repeats.
+
+    :param spec: Synthetic scenario spec
+    :type spec: SyntheticScenarioSpec
+
+    :param options: Task config options
+    :type options: dict
+
+    :param repeat: Number of runs
+    :type repeat: int
+
+    :returns: Benchmark result of the case
+    :rtype: BenchmarkResult
+    """
+    from cplus_core.analysis import ScenarioRunner
+
+    result = BenchmarkResult(parameters=dict(spec.to_dict(), options=options))
+    with tempfile.TemporaryDirectory() as directory:
+        scenario = generate_scenario(spec, os.path.join(directory, "data"))
+        for index in range(max(repeat, 1)):
+            base_dir = os.path.join(directory, f"run_{index}")
+            runner = ScenarioRunner(scenario.task_config(base_dir, **options))
+
+            start = time.perf_counter()
+            success = runner.run()
+            total = time.perf_counter() - start
+            check_run(runner, success)
+
+            timings = dict(stage_timings(runner), **{TOTAL_TIMING: total})
+            runners = [runner]
+            for stage in list(timings):
+                if stage == TOTAL_TIMING:
+                    continue
+                # The task config is created again as the run updates the
+                # models paths, with the same UUIDs and options.
+                runners.append(
+                    run_isolated_stage(scenario.task_config(base_dir, **options), stage)
+                )
+                timings[f"{stage}{ISOLATED_SUFFIX}"] = stage_timings(runners[-1])[stage]
+            for stage_runner in runners:
+                stage_runner.finished(True)
+            for stage, seconds in timings.items():
+                result.timings[stage] = min(seconds, result.timings.get(stage, seconds))
+            if index == 0:
+                result.metrics = [
+                    metrics.to_dict() for metrics in runner.metrics.records
+                ]
+
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--activities", type=int, nargs="+", default=DEFAULT_ACTIVITIES)
+    parser.add_argument("--pathways", type=int, default=2, help="Per activity")
+    parser.add_argument("--pwls", type=int, default=2, help="Per pathway")
+    parser.add_argument("--pwl-reuse", type=float, default=0.5)
+    parser.add_argument("--nodata", type=float, default=0.1)
+    parser.add_argument("--masks", type=int, default=2)
+    parser.add_argument(
+        "--sieve-threshold",
+        type=float,
+        default=10.0,
+        help="Sieve threshold in pixels, 0 disables the sieve",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument(
+        "--option",
+        action="append",
+        default=[],
+        help="Task config option as KEY=VALUE, VALUE read as JSON",
+    )
+    parser.add_argument("--name", default="scenario")
+    parser.add_argument("--output", help="Path of the JSON report")
+    parser.add_argument("--baseline", help="Path of the baseline JSON report")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args()
+
+    application = init_qgis()
+    if application is None:
+        sys.exit("The scenario benchmark requires QGIS.")
+
+    options = dict(
+        {
+            "sieve_enabled": args.sieve_threshold > 0,
+            "sieve_threshold": args.sieve_threshold,
+        },
+        **parse_options(args.option),
+    )
+    report = BenchmarkReport(name=args.name)
+    try:
+        for activities in args.activities:
+            for size in args.sizes:
+                spec = SyntheticScenarioSpec(
+                    size=size,
+                    activities=activities,
+                    pathways_per_activity=args.pathways,
+                    priority_layers_per_pathway=args.pwls,
+                    pwl_reuse_ratio=args.pwl_reuse,
+                    nodata_fraction=args.nodata,
+                    mask_count=args.masks,
+                    seed=args.seed,
+                )
+                result = run_case(spec, options, args.repeat)
+                report.results.append(result)
+                print(
+                    f"size={size} activities={activities} "
+                    + " ".join(
+                        f"{stage}={seconds:.3f}s"
+                        for stage, seconds in result.timings.items()
+                    )
+                )
+    finally:
+        application.exitQgis()
+
+    if args.output:
+        report.save(args.output, curve_parameters=["size", "activities"])
+
+    if args.baseline:
+        regressions = compare_reports(
+            BenchmarkReport.load(args.baseline), report, args.tolerance
+        )
+        for regression in regressions:
+            print(f"Regression: {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""
+    Command line runner of the scenario analysis.
+
+    Usage: python -m cplus_core run config.json [--base-dir DIR] [--resume]
+
+    The config file holds the task config dictionary, as created by
+    TaskConfig.to_dict. Logs and progress are written to stderr and the
+    scenario result summary to stdout as JSON.
+"""
+
+import argparse
+import json
+import sys
+
+from .utils.application import init_qgis
+
+
+def print_event(event, quiet: bool = False):
+    """Writes the runner event to stderr.
+
+    :param event: Runner event
+    :type event: ScenarioEvent
+
+    :param quiet: Only write the error logs
+    :type quiet: bool
+    """
+    from .analysis.events import ScenarioEventType
+
+    if event.type == ScenarioEventType.LOG:
+        if event.data["info"] and quiet:
+            return
+        level = "INFO" if event.data["info"] else "ERROR"
+        print(f"[{level}] {event.data['message']}".rstrip(), file=sys.stderr)
+    elif event.type == ScenarioEventType.PROGRESS and not quiet:
+        print(f"[PROGRESS] {event.data['value']:.1f}%", file=sys.stderr)
+
+
+def run(args) -> int:
+    """Runs the scenario analysis of the config file.
+
+    :returns: Exit code
+    :rtype: int
+    """
+    with open(args.config) as f:
+        config_dict = json.load(f)
+    if args.base_dir:
+        config_dict["base_dir"] = args.base_dir
+
+    application = init_qgis()
+    try:
+        from .analysis.runner import ScenarioRunner
+        from .analysis.task_config import TaskConfig
+
+        runner = ScenarioRunner(
+            TaskConfig.from_dict(config_dict),
+            lambda event: print_event(event, args.quiet),
+        )
+        result = runner.resume() if args.resume else runner.run()
+        runner.finished(result)
+
+        summary = {
+            "success": bool(result),
+            "scenario_directory": runner.scenario_directory,
+            "analysis_output": runner.output,
+            "stage_metrics": [metrics.to_dict() for metrics in runner.metrics.records],
+        }
+        print(json.dumps(summary, indent=2, default=str))
+    finally:
+        application.exitQgis()
+
+    return 0 if result else 1
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m cplus_core")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Run a scenario analysis")
+    run_parser.add_argument("config", help="Path of the task config JSON file")
+    run_parser.add_argument(
+        "--base-dir", help="Scenario output directory, overrides the config"
+    )
+    run_parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Resume the interrupted run in the scenario directory",
+    )
+    run_parser.add_argument(
+        "--quiet", action="store_true", help="Only write the error logs"
+    )
+    run_parser.set_defaults(handler=run)
+
+    args = parser.parse_args()
+    sys.exit(args.handler(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,2 +1,38 @@
-from .analysis import ScenarioAnalysisTask
-from .task_config import TaskConfig
+import importlib
+import typing
+
+if typing.TYPE_CHECKING:
+    from .analysis import ScenarioAnalysisTask
+    from .events import ScenarioEvent, ScenarioEventType
+    from .pool import JobResult, ScenarioWorkerPool
+    from .runner import ScenarioRunner
+    from .task_config import TaskConfig
+
+# Module defining each public name, the modules are imported on the first
+# access so that importing the task config does not load QGIS.
+_LAZY_ATTRIBUTES = {
+    "JobResult": ".pool",
+    "ScenarioAnalysisTask": ".analysis",
+    "ScenarioEvent": ".events",
+    "ScenarioEventType": ".events",
+    "ScenarioRunner": ".runner",
+    "ScenarioWorkerPool": ".pool",
+    "TaskConfig": ".task_config",
+}
+
+__all__ = list(_LAZY_ATTRIBUTES)
+
+
+def __getattr__(name: str):
+    module_name = _LAZY_ATTRIBUTES.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value
+
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""
+    Execution backends of the scenario analysis stages.
+
+    Each stage can run through the QGIS processing algorithms, direct
+    GDAL API calls or the in-process NumPy engine. The backend of every
+    stage is selected in the task config, stages without a selection use
+    their default backend.
+"""
+
+import enum
+import typing
+
+from ..utils.conf import Settings
+
+
+class StageBackend(enum.Enum):
+    """Execution backends of the analysis stages."""
+
+    PROCESSING = "processing"
+    GDAL = "gdal"
+    NUMPY = "numpy"
+
+
+class AnalysisStage(enum.Enum):
+    """Analysis stages with a selectable backend."""
+
+    SNAP = "snap"
+    WEIGHT = "weight"
+    SUM = "sum"
+    MASK = "mask"
+    CLEAN = "clean"
+    SIEVE = "sieve"
+    HIGHEST_POSITION = "highest_position"
+
+
+# Backends implemented by each stage.
+STAGE_BACKENDS = {
+    AnalysisStage.SNAP: [StageBackend.PROCESSING, StageBackend.GDAL],
+    AnalysisStage.WEIGHT: [StageBackend.PROCESSING, StageBackend.NUMPY],
+    AnalysisStage.SUM: [StageBackend.PROCESSING, StageBackend.NUMPY],
+    AnalysisStage.MASK: [StageBackend.PROCESSING, StageBackend.NUMPY],
+    AnalysisStage.CLEAN: [StageBackend.PROCESSING, StageBackend.NUMPY],
+    AnalysisStage.SIEVE: [
+        StageBackend.PROCESSING,
+        StageBackend.GDAL,
+        StageBackend.NUMPY,
+    ],
+    AnalysisStage.HIGHEST_POSITION: [StageBackend.PROCESSING, StageBackend.NUMPY],
+}
+
+# Backends used when the stage backend is not set.
+DEFAULT_STAGE_BACKENDS = {
+    AnalysisStage.SNAP: StageBackend.GDAL,
+    AnalysisStage.WEIGHT: StageBackend.PROCESSING,
+    AnalysisStage.SUM: StageBackend.PROCESSING,
+    AnalysisStage.MASK: StageBackend.PROCESSING,
+    AnalysisStage.CLEAN: StageBackend.PROCESSING,
+    AnalysisStage.SIEVE: StageBackend.PROCESSING,
+    AnalysisStage.HIGHEST_POSITION: StageBackend.PROCESSING,
+}
+
+# Boolean settings that selected the NumPy backend of a stage before the
+# stage backends setting, kept for the existing task configs.
+NUMPY_BACKEND_SETTINGS = {
+    AnalysisStage.WEIGHT: Settings.BATCHED_WEIGHTING,
+    AnalysisStage.MASK: Settings.RASTER_MASKING,
+    AnalysisStage.HIGHEST_POSITION: Settings.NATIVE_HIGHEST_POSITION,
+}
+
+
+def stage_backend(
+    stage: AnalysisStage,
+    stage_backends: typing.Dict[str, str],
+    default: StageBackend = None,
+) -> StageBackend:
+    """Returns the backend selected for the stage.
+
+    :param stage: Analysis stage
+    :type stage: AnalysisStage
+
+    :param stage_backends: Backend names by stage name
+    :type stage_backends: typing.Dict[str, str]
+
+    :param default: Backend used when the stage backend is not set,
+    the stage default backend when None
+    :type default: StageBackend
+
+    :returns: Stage backend
+    :rtype: StageBackend
+
+    :raises ValueError: If the selected backend is unknown or not
+    implemented by the stage
+    """
+    value = (stage_backends or {}).get(stage.value)
+    if not value:
+        return default or DEFAULT_STAGE_BACKENDS[stage]
+
+    backend = StageBackend(value)
+    if backend not in STAGE_BACKENDS[stage]:
+        raise ValueError(
+            f"The {backend.value} backend is not available for the "
+            f"{stage.value} stage, available backends are "
+            f"{', '.join(item.value for item in STAGE_BACKENDS[stage])}"
+        )
+
+    return backend
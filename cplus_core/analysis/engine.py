@@ -0,0 +1,890 @@
+# -*- coding: utf-8 -*-
+"""
+    Fused single-pass raster engine for the scenario analysis.
+
+    The engine reads each input block once per window and computes the
+    weighted pathways, activities sums, masking, cleaning and the highest
+    position in memory, writing only the requested outputs.
+"""
+
+import concurrent.futures
+import dataclasses
+import multiprocessing
+import os
+import shutil
+import sys
+import typing
+
+import numpy as np
+from osgeo import gdal
+
+from ..definitions.constants import NO_DATA_VALUE
+from ..utils.raster import (
+    GridSource,
+    GridWriter,
+    RasterGrid,
+    Window,
+    iter_windows,
+    plan_window_size,
+)
+from ..utils.statistics import RasterStatistics, read_statistics, write_statistics
+from . import kernels
+from .weighting import CoefficientMatrix
+
+
+# Default number of grid rows read per window.
+DEFAULT_WINDOW_ROWS = 256
+
+# Bytes held for each window pixel by a Float32 block and its valid mask.
+BLOCK_PIXEL_BYTES = 5
+
+# Default tile size in pixels for the tile-parallel execution.
+DEFAULT_TILE_SIZE = 4096
+
+# Bytes held for each window pixel by the streaming highest position, the
+# running maximum and position, the current block and the output buffer.
+HIGHEST_POSITION_PIXEL_BYTES = 8 + BLOCK_PIXEL_BYTES + 4
+
+
+@dataclasses.dataclass
+class PathwayPlan:
+    """Weighting inputs and output of a single pathway."""
+
+    uuid: str
+    name: str
+    path: str
+    terms: typing.List[typing.Tuple[str, float]]
+    output_path: str = ""
+
+
+@dataclasses.dataclass
+class ActivityPlan:
+    """Inputs and outputs of a single activity."""
+
+    uuid: str
+    name: str
+    pathways: typing.List[str] = dataclasses.field(default_factory=list)
+    path: str = ""
+    mask_paths: typing.List[str] = dataclasses.field(default_factory=list)
+    output_path: str = ""
+    cleaned_output_path: str = ""
+
+
+@dataclasses.dataclass
+class EnginePlan:
+    """Complete description of a fused analysis run, activities are
+    listed in their highest position order.
+    """
+
+    grid: RasterGrid
+    pathways: typing.List[PathwayPlan]
+    activities: typing.List[ActivityPlan]
+    mask_paths: typing.List[str] = dataclasses.field(default_factory=list)
+    highest_position_path: str = ""
+    window_width: int = 0
+    window_height: int = DEFAULT_WINDOW_ROWS
+    col_phase: int = 0
+    row_phase: int = 0
+    cache_size: int = 0
+    mask_rasters: typing.Dict[typing.Tuple[str, ...], str] = dataclasses.field(
+        default_factory=dict
+    )
+    statistics: bool = False
+
+    def source_paths(self) -> typing.List[str]:
+        """Returns the distinct raster inputs of the plan.
+
+        :returns: List of raster paths
+        :rtype: typing.List[str]
+        """
+        paths = []
+        for pathway in self.pathways:
+            for path, _ in pathway.terms:
+                if path not in paths:
+                    paths.append(path)
+        for activity in self.activities:
+            if activity.path and activity.path not in paths:
+                paths.append(activity.path)
+
+        return paths
+
+    def bytes_per_pixel(self) -> int:
+        """Estimates the working memory that the engine holds for each
+        window pixel, used to size the windows from a memory budget.
+
+        :returns: Number of bytes per window pixel
+        :rtype: int
+        """
+        mask_sets = {tuple(self.mask_paths)} | {
+            tuple(activity.mask_paths) for activity in self.activities
+        }
+        blocks = len(self.source_paths()) + len(self.pathways)
+        # Activity sum and cleaned block
+        activity_bytes = len(self.activities) * 2 * BLOCK_PIXEL_BYTES
+
+        return (
+            blocks * BLOCK_PIXEL_BYTES
+            + activity_bytes
+            + len(mask_sets)
+            + HIGHEST_POSITION_PIXEL_BYTES
+        )
+
+    def set_memory_budget(
+        self,
+        memory_budget: int,
+        block_width: int = 256,
+        block_height: int = 256,
+        col_phase: int = 0,
+        row_phase: int = 0,
+        bytes_per_pixel: int = 0,
+    ):
+        """Sizes the plan windows to fit the memory budget. A quarter of
+        the budget is reserved for the GDAL block cache.
+
+        :param memory_budget: Memory budget in bytes
+        :type memory_budget: int
+
+        :param block_width: Width of the source internal blocks
+        :type block_width: int
+
+        :param block_height: Height of the source internal blocks
+        :type block_height: int
+
+        :param col_phase: Grid column of the first block boundary
+        :type col_phase: int
+
+        :param row_phase: Grid row of the first block boundary
+        :type row_phase: int
+
+        :param bytes_per_pixel: Working memory of each window pixel,
+        estimated from the plan when zero
+        :type bytes_per_pixel: int
+        """
+        self.cache_size = memory_budget // 4
+        self.window_width, self.window_height = plan_window_size(
+            self.grid,
+            bytes_per_pixel or self.bytes_per_pixel(),
+            memory_budget - self.cache_size,
+            block_width,
+            block_height,
+        )
+        # Phases only matter when the windows split the grid dimension
+        self.col_phase = col_phase if self.window_width < self.grid.width else 0
+        self.row_phase = row_phase if self.window_height < self.grid.height else 0
+
+    def output_paths(self) -> typing.List[str]:
+        """Returns the requested output paths of the plan.
+
+        :returns: List of output paths
+        :rtype: typing.List[str]
+        """
+        paths = [pathway.output_path for pathway in self.pathways]
+        for activity in self.activities:
+            paths.extend([activity.output_path, activity.cleaned_output_path])
+        paths.append(self.highest_position_path)
+
+        return [path for path in paths if path]
+
+    def tile_plan(self, tile: Window, directory: str) -> "EnginePlan":
+        """Creates the plan for a tile of the grid, writing its outputs
+        as tile files in the passed directory.
+
+        :param tile: Tile window on the plan grid
+        :type tile: Window
+
+        :param directory: Directory for the tile outputs
+        :type directory: str
+
+        :returns: Plan of the tile
+        :rtype: EnginePlan
+        """
+        suffix = f"r{tile.row_off}_c{tile.col_off}"
+
+        def tile_path(path):
+            if not path:
+                return ""
+            stem = os.path.splitext(os.path.basename(path))[0]
+            return os.path.join(directory, f"{stem}_{suffix}.tif")
+
+        pathways = [
+            dataclasses.replace(p, output_path=tile_path(p.output_path))
+            for p in self.pathways
+        ]
+        activities = [
+            dataclasses.replace(
+                a,
+                output_path=tile_path(a.output_path),
+                cleaned_output_path=tile_path(a.cleaned_output_path),
+            )
+            for a in self.activities
+        ]
+        window_width = min(self.window_width or tile.width, tile.width)
+        window_height = min(self.window_height or tile.height, tile.height)
+
+        return dataclasses.replace(
+            self,
+            grid=self.grid.window_grid(tile),
+            pathways=pathways,
+            activities=activities,
+            highest_position_path=tile_path(self.highest_position_path),
+            window_width=window_width,
+            window_height=window_height,
+            col_phase=(self.col_phase - tile.col_off) % window_width,
+            row_phase=(self.row_phase - tile.row_off) % window_height,
+        )
+
+    def windows(self) -> typing.Iterator[Window]:
+        """Iterates the windows of the plan grid.
+
+        :returns: Iterator of the grid windows
+        :rtype: typing.Iterator[Window]
+        """
+        return iter_windows(
+            self.grid,
+            self.window_width or self.grid.width,
+            self.window_height or self.grid.height,
+            self.col_phase,
+            self.row_phase,
+        )
+
+
+class FusedRasterEngine:
+    """Runs an :py:class:`EnginePlan` window by window."""
+
+    def __init__(
+        self,
+        plan: EnginePlan,
+        progress_callback: typing.Callable[[float], None] = None,
+        cancel_callback: typing.Callable[[], bool] = None,
+    ):
+        self.plan = plan
+        self.progress_callback = progress_callback
+        self.cancel_callback = cancel_callback
+
+        self._sources: typing.Dict[str, GridSource] = {}
+        self._writers: typing.Dict[str, GridWriter] = {}
+        self._masks: typing.Dict[typing.Tuple[str, ...], typing.List] = {}
+        self._mask_sources: typing.Dict[typing.Tuple[str, ...], GridSource] = {}
+        self._weighting = CoefficientMatrix.from_terms(
+            {pathway.uuid: pathway.terms for pathway in plan.pathways}
+        )
+
+    def run(self) -> bool:
+        """Runs the plan.
+
+        :returns: True if all the windows were processed, False if
+        the run was cancelled.
+        :rtype: bool
+        """
+        cache_max = gdal.GetCacheMax()
+        if self.plan.cache_size > 0:
+            gdal.SetCacheMax(self.plan.cache_size)
+
+        try:
+            self._open()
+            windows = list(self.plan.windows())
+
+            for index, window in enumerate(windows):
+                if self.cancel_callback is not None and self.cancel_callback():
+                    return False
+
+                self.process_window(window)
+
+                if self.progress_callback is not None:
+                    self.progress_callback(100.0 * (index + 1) / len(windows))
+        finally:
+            self._close()
+            gdal.SetCacheMax(cache_max)
+
+        return True
+
+    def process_window(self, window: Window):
+        """Computes and writes all the plan outputs for the window.
+
+        :param window: Grid window
+        :type window: Window
+        """
+        blocks = {path: source.read(window) for path, source in self._sources.items()}
+
+        weighted = self._weighting.accumulate(
+            [blocks[path] for path in self._weighting.layers]
+        )
+        for pathway in self.plan.pathways:
+            self._write(pathway.output_path, window, weighted[pathway.uuid])
+
+        global_mask = self._mask(tuple(self.plan.mask_paths), window)
+
+        highest_position = kernels.HighestPositionAccumulator(
+            (window.height, window.width)
+        )
+        for position, activity in enumerate(self.plan.activities, start=1):
+            inputs = [weighted[uuid] for uuid in activity.pathways]
+            if activity.path:
+                inputs.insert(0, blocks[activity.path])
+
+            block = kernels.nodata_sum(inputs)
+            self._write(activity.output_path, window, block)
+
+            if global_mask is not None:
+                block = kernels.apply_mask(block, global_mask)
+
+            activity_mask = self._mask(tuple(activity.mask_paths), window)
+            if activity_mask is not None:
+                block = kernels.apply_mask(block, activity_mask)
+
+            block = kernels.zero_to_nodata(block)
+            self._write(activity.cleaned_output_path, window, block)
+            highest_position.add(position, block)
+
+        if self.plan.activities:
+            self._write(
+                self.plan.highest_position_path,
+                window,
+                highest_position.result(),
+            )
+
+    def _open(self):
+        """Opens the plan sources, masks and output writers."""
+        grid = self.plan.grid
+        for path in self.plan.source_paths():
+            self._sources[path] = GridSource(path, grid)
+
+        mask_sets = [tuple(self.plan.mask_paths)] + [
+            tuple(activity.mask_paths) for activity in self.plan.activities
+        ]
+        for mask_set in mask_sets:
+            if mask_set in self.plan.mask_rasters:
+                if mask_set not in self._mask_sources:
+                    self._mask_sources[mask_set] = GridSource(
+                        self.plan.mask_rasters[mask_set], grid
+                    )
+            elif mask_set and mask_set not in self._masks:
+                self._masks[mask_set] = [
+                    gdal.OpenEx(path, gdal.OF_VECTOR) for path in mask_set
+                ]
+
+        for pathway in self.plan.pathways:
+            self._add_writer(pathway.output_path)
+        for activity in self.plan.activities:
+            self._add_writer(activity.output_path)
+            # Cleaned activities use zero as the nodata value
+            self._add_writer(activity.cleaned_output_path, nodata=0)
+        self._add_writer(self.plan.highest_position_path, data_type=gdal.GDT_Int32)
+
+    def _add_writer(
+        self,
+        path: str,
+        data_type: int = gdal.GDT_Float32,
+        nodata: float = NO_DATA_VALUE,
+    ):
+        """Creates a writer for the output path if it is set."""
+        if path:
+            self._writers[path] = GridWriter(
+                path,
+                self.plan.grid,
+                data_type=data_type,
+                nodata=nodata,
+                statistics=self.plan.statistics,
+            )
+
+    def _write(self, path: str, window: Window, block: kernels.Block):
+        """Writes the block into the output path if it is requested."""
+        if path:
+            values, valid = block
+            self._writers[path].write(window, values, valid)
+
+    def _mask(
+        self, mask_set: typing.Tuple[str, ...], window: Window
+    ) -> typing.Union[np.ndarray, None]:
+        """Burns the polygons of the mask layers into the window, or
+        reads the window of the mask raster burned beforehand.
+
+        :returns: Boolean mask of the window pixels covered by the
+        mask layers or None if there are no mask layers.
+        :rtype: typing.Union[np.ndarray, None]
+        """
+        mask_source = self._mask_sources.get(mask_set)
+        if mask_source is not None:
+            values, valid = mask_source.read(window)
+            return valid & (values > 0)
+
+        datasets = self._masks.get(mask_set)
+        if not datasets:
+            return None
+
+        window_grid = self.plan.grid.window_grid(window)
+        target = gdal.GetDriverByName("MEM").Create(
+            "", window.width, window.height, 1, gdal.GDT_Byte
+        )
+        target.SetGeoTransform(window_grid.geotransform)
+        if window_grid.crs_wkt:
+            target.SetProjection(window_grid.crs_wkt)
+
+        for dataset in datasets:
+            if dataset is not None:
+                gdal.Rasterize(
+                    target,
+                    dataset,
+                    layers=[dataset.GetLayer(0).GetName()],
+                    burnValues=[1],
+                )
+
+        return target.GetRasterBand(1).ReadAsArray().astype(bool)
+
+    def _close(self):
+        """Closes all the sources and writers."""
+        for source in self._sources.values():
+            source.close()
+        for writer in self._writers.values():
+            writer.close()
+        for mask_source in self._mask_sources.values():
+            mask_source.close()
+        self._sources = {}
+        self._writers = {}
+        self._masks = {}
+        self._mask_sources = {}
+
+
+class HighestPositionEngine:
+    """Streams the highest position of the plan activities rasters,
+    reading a single activity block at a time so the memory used does
+    not grow with the number of activities.
+    """
+
+    def __init__(
+        self,
+        plan: EnginePlan,
+        progress_callback: typing.Callable[[float], None] = None,
+        cancel_callback: typing.Callable[[], bool] = None,
+    ):
+        self.plan = plan
+        self.progress_callback = progress_callback
+        self.cancel_callback = cancel_callback
+
+    def run(self) -> bool:
+        """Runs the highest position of the plan activities paths, in
+        the plan activities order.
+
+        :returns: True if all the windows were processed, False if
+        the run was cancelled.
+        :rtype: bool
+        """
+        cache_max = gdal.GetCacheMax()
+        if self.plan.cache_size > 0:
+            gdal.SetCacheMax(self.plan.cache_size)
+
+        sources = []
+        writer = None
+        try:
+            sources = [
+                GridSource(activity.path, self.plan.grid)
+                for activity in self.plan.activities
+            ]
+            writer = GridWriter(
+                self.plan.highest_position_path,
+                self.plan.grid,
+                data_type=gdal.GDT_Int32,
+                statistics=self.plan.statistics,
+            )
+            windows = list(self.plan.windows())
+
+            for index, window in enumerate(windows):
+                if self.cancel_callback is not None and self.cancel_callback():
+                    return False
+
+                accumulator = kernels.HighestPositionAccumulator(
+                    (window.height, window.width)
+                )
+                for position, source in enumerate(sources, start=1):
+                    accumulator.add(position, source.read(window))
+
+                writer.write(window, *accumulator.result())
+
+                if self.progress_callback is not None:
+                    self.progress_callback(100.0 * (index + 1) / len(windows))
+        finally:
+            for source in sources:
+                source.close()
+            if writer is not None:
+                writer.close()
+            gdal.SetCacheMax(cache_max)
+
+        return True
+
+
+def apply_raster_mask(
+    source_path: str,
+    mask_path: str,
+    grid: RasterGrid,
+    output_path: str,
+    window_height: int = DEFAULT_WINDOW_ROWS,
+    statistics: bool = False,
+) -> str:
+    """Sets the source pixels covered by the mask raster as nodata,
+    streaming full width windows of the grid.
+
+    :param source_path: Path of the source raster
+    :type source_path: str
+
+    :param mask_path: Path of the mask raster created by
+    :py:func:`burn_mask`
+    :type mask_path: str
+
+    :param grid: Target grid
+    :type grid: RasterGrid
+
+    :param output_path: Path of the masked raster
+    :type output_path: str
+
+    :param window_height: Number of grid rows of each window
+    :type window_height: int
+
+    :param statistics: Whether to gather the output statistics
+    :type statistics: bool
+
+    :returns: Path of the masked raster
+    :rtype: str
+    """
+    source = GridSource(source_path, grid)
+    mask = GridSource(mask_path, grid)
+    writer = GridWriter(output_path, grid, statistics=statistics)
+    try:
+        for window in iter_windows(grid, grid.width, window_height):
+            mask_values, mask_valid = mask.read(window)
+            values, valid = kernels.apply_mask(
+                source.read(window), mask_valid & (mask_values > 0)
+            )
+            writer.write(window, values, valid)
+    finally:
+        source.close()
+        mask.close()
+        writer.close()
+
+    return output_path
+
+
+def cell_sum(
+    source_paths: typing.List[str],
+    grid: RasterGrid,
+    output_path: str,
+    ignore_nodata: bool = True,
+    output_nodata: float = NO_DATA_VALUE,
+    clean_zeros: bool = False,
+    window_height: int = DEFAULT_WINDOW_ROWS,
+    statistics: bool = False,
+) -> str:
+    """Sums the sources streaming full width windows of the grid, as the
+    sum statistic of the processing cell statistics algorithm.
+
+    :param source_paths: Paths of the source rasters
+    :type source_paths: typing.List[str]
+
+    :param grid: Target grid
+    :type grid: RasterGrid
+
+    :param output_path: Path of the summed raster
+    :type output_path: str
+
+    :param ignore_nodata: Whether nodata source pixels are skipped,
+    otherwise a nodata pixel in any source results in a nodata pixel
+    :type ignore_nodata: bool
+
+    :param output_nodata: Nodata value of the output
+    :type output_nodata: float
+
+    :param clean_zeros: Whether to set the zero value sums as nodata,
+    cleaning the output in the same pass
+    :type clean_zeros: bool
+
+    :param window_height: Number of grid rows of each window
+    :type window_height: int
+
+    :param statistics: Whether to gather the output statistics
+    :type statistics: bool
+
+    :returns: Path of the summed raster
+    :rtype: str
+    """
+    sources = [GridSource(path, grid) for path in source_paths]
+    writer = GridWriter(output_path, grid, nodata=output_nodata, statistics=statistics)
+    sum_kernel = kernels.nodata_sum if ignore_nodata else kernels.strict_sum
+    try:
+        for window in iter_windows(grid, grid.width, window_height):
+            block = sum_kernel([source.read(window) for source in sources])
+            if clean_zeros:
+                block = kernels.zero_to_nodata(block)
+            writer.write(window, *block)
+    finally:
+        for source in sources:
+            source.close()
+        writer.close()
+
+    return output_path
+
+
+def sieve_raster(
+    source_path: str,
+    output_path: str,
+    threshold: int,
+    window_height: int = DEFAULT_WINDOW_ROWS,
+    statistics: bool = False,
+) -> str:
+    """Removes the areas of positive pixels smaller than the threshold
+    with the GDAL sieve filter. The filter runs on a binary raster of
+    the positive pixels with eight connectedness, the source pixels
+    outside the kept areas are set as nodata.
+
+    :param source_path: Path of the source raster
+    :type source_path: str
+
+    :param output_path: Path of the sieved raster
+    :type output_path: str
+
+    :param threshold: Minimum area size in pixels
+    :type threshold: int
+
+    :param window_height: Number of grid rows of each window
+    :type window_height: int
+
+    :param statistics: Whether to gather the output statistics
+    :type statistics: bool
+
+    :returns: Path of the sieved raster
+    :rtype: str
+    """
+    dataset = gdal.Open(source_path)
+    if dataset is None:
+        raise ValueError(f"Unable to open raster {source_path}")
+    grid = RasterGrid.from_dataset(dataset)
+    dataset = None
+
+    binary_path = f"{os.path.splitext(output_path)[0]}_binary.tif"
+    source = GridSource(source_path, grid)
+    binary = sieved = writer = None
+    try:
+        binary = GridWriter(binary_path, grid, gdal.GDT_Byte, nodata=255)
+        for window in iter_windows(grid, grid.width, window_height):
+            values, valid = source.read(window)
+            binary.write(
+                window,
+                (valid & (values > 0)).astype(np.uint8),
+                np.ones(values.shape, dtype=bool),
+            )
+
+        # Nodata pixels are part of the zero areas, no mask band is used
+        result = gdal.SieveFilter(binary.band, None, binary.band, int(threshold), 8)
+        if result != 0:
+            raise ValueError(f"Unable to sieve raster {source_path}")
+        binary.close()
+
+        sieved = GridSource(binary_path, grid)
+        writer = GridWriter(output_path, grid, statistics=statistics)
+        for window in iter_windows(grid, grid.width, window_height):
+            values, valid = source.read(window)
+            sieved_values, sieved_valid = sieved.read(window)
+            writer.write(
+                window,
+                values,
+                valid & (values > 0) & sieved_valid & (sieved_values > 0),
+            )
+    finally:
+        for dataset in (source, binary, sieved, writer):
+            if dataset is not None:
+                dataset.close()
+        if os.path.exists(binary_path):
+            os.remove(binary_path)
+
+    return output_path
+
+
+def run_tile(plan: EnginePlan, tile: Window, directory: str) -> EnginePlan:
+    """Runs the plan on a single tile, used by the process pool workers.
+
+    :param plan: Plan of the full grid
+    :type plan: EnginePlan
+
+    :param tile: Tile window on the plan grid
+    :type tile: Window
+
+    :param directory: Directory for the tile outputs
+    :type directory: str
+
+    :returns: Plan of the tile with its output paths
+    :rtype: EnginePlan
+    """
+    tile_plan = plan.tile_plan(tile, directory)
+    FusedRasterEngine(tile_plan).run()
+
+    return tile_plan
+
+
+def worker_python_executable() -> typing.Union[str, None]:
+    """Returns the Python interpreter used to spawn the worker processes.
+    The executable of the process is the QGIS binary inside the QGIS
+    desktop application, the interpreter of its Python installation is
+    used instead.
+
+    :returns: Interpreter path or None if it cannot be found
+    :rtype: typing.Union[str, None]
+    """
+    executable = sys.executable or ""
+    if os.path.basename(executable).lower().startswith("python"):
+        return executable
+
+    if sys.platform == "win32":
+        names = ["python.exe"]
+    else:
+        version = sys.version_info
+        names = [f"python{version.major}.{version.minor}", f"python{version.major}"]
+
+    for prefix in (sys.exec_prefix, sys.base_exec_prefix):
+        for directory in (prefix, os.path.join(prefix, "bin")):
+            for name in names:
+                path = os.path.join(directory, name)
+                if os.path.isfile(path):
+                    return path
+
+    return None
+
+
+def mosaic_tiles(tile_paths: typing.List[str], output_path: str) -> str:
+    """Assembles the tile files into a single GeoTIFF through a
+    virtual mosaic.
+
+    :param tile_paths: Paths of the tile files
+    :type tile_paths: typing.List[str]
+
+    :param output_path: Path of the assembled output
+    :type output_path: str
+
+    :returns: Output path
+    :rtype: str
+    """
+    vrt_path = f"{os.path.splitext(output_path)[0]}.vrt"
+    vrt = gdal.BuildVRT(vrt_path, tile_paths)
+    if vrt is None:
+        raise ValueError(f"Unable to build the mosaic of {output_path}")
+
+    output = gdal.Translate(
+        output_path,
+        vrt,
+        format="GTiff",
+        creationOptions=["TILED=YES", "BIGTIFF=IF_SAFER"],
+    )
+    if output is None:
+        raise ValueError(f"Unable to write the mosaic {output_path}")
+
+    output = None
+    vrt = None
+    os.remove(vrt_path)
+
+    tile_statistics = [read_statistics(path) for path in tile_paths]
+    if tile_statistics and all(item is not None for item in tile_statistics):
+        statistics = RasterStatistics()
+        for item in tile_statistics:
+            statistics.merge(item)
+        write_statistics(output_path, statistics)
+
+    return output_path
+
+
+class TiledEngineExecutor:
+    """Runs an :py:class:`EnginePlan` as independent tiles across a
+    process pool and assembles the tile outputs into the plan outputs.
+    The tiles are run in the current process when no Python interpreter
+    is found to spawn the workers.
+    """
+
+    def __init__(
+        self,
+        plan: EnginePlan,
+        tile_directory: str,
+        max_workers: int,
+        tile_size: int = DEFAULT_TILE_SIZE,
+        progress_callback: typing.Callable[[float], None] = None,
+        cancel_callback: typing.Callable[[], bool] = None,
+    ):
+        self.plan = plan
+        self.tile_directory = tile_directory
+        self.max_workers = max_workers
+        self.tile_size = tile_size
+        self.progress_callback = progress_callback
+        self.cancel_callback = cancel_callback
+
+    def tiles(self) -> typing.List[Window]:
+        """Splits the plan grid into tiles, tile sizes are rounded to
+        multiples of the plan windows.
+
+        :returns: List of the tile windows
+        :rtype: typing.List[Window]
+        """
+        window_width = self.plan.window_width or self.plan.grid.width
+        window_height = self.plan.window_height or self.plan.grid.height
+        tile_width = max(self.tile_size // window_width, 1) * window_width
+        tile_height = max(self.tile_size // window_height, 1) * window_height
+
+        return list(
+            iter_windows(
+                self.plan.grid,
+                tile_width,
+                tile_height,
+                self.plan.col_phase,
+                self.plan.row_phase,
+            )
+        )
+
+    def run(self) -> bool:
+        """Runs the tiles and assembles the outputs.
+
+        :returns: True if all the tiles were processed, False if
+        the run was cancelled.
+        :rtype: bool
+        """
+        tiles = self.tiles()
+        os.makedirs(self.tile_directory, exist_ok=True)
+        tile_plans = []
+
+        try:
+            executable = worker_python_executable()
+            if executable is None:
+                # Embedded Python without an interpreter to spawn workers
+                for tile in tiles:
+                    if self.cancel_callback is not None and self.cancel_callback():
+                        return False
+
+                    tile_plans.append(run_tile(self.plan, tile, self.tile_directory))
+
+                    if self.progress_callback is not None:
+                        self.progress_callback(100.0 * len(tile_plans) / len(tiles))
+            else:
+                # Spawned workers avoid forking the Qt application state
+                context = multiprocessing.get_context("spawn")
+                context.set_executable(executable)
+                with concurrent.futures.ProcessPoolExecutor(
+                    max_workers=self.max_workers, mp_context=context
+                ) as executor:
+                    futures = [
+                        executor.submit(run_tile, self.plan, tile, self.tile_directory)
+                        for tile in tiles
+                    ]
+                    for future in concurrent.futures.as_completed(futures):
+                        if self.cancel_callback is not None and self.cancel_callback():
+                            for pending in futures:
+                                pending.cancel()
+                            return False
+
+                        tile_plans.append(future.result())
+
+                        if self.progress_callback is not None:
+                            self.progress_callback(100.0 * len(tile_plans) / len(tiles))
+
+            for index, output_path in enumerate(self.plan.output_paths()):
+                mosaic_tiles(
+                    [tile_plan.output_paths()[index] for tile_plan in tile_plans],
+                    output_path,
+                )
+        finally:
+            # The executor has waited for the running tiles on exit
+            shutil.rmtree(self.tile_directory, ignore_errors=True)
+
+        return True
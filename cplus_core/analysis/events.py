@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+"""
+    Events reported by the scenario runner.
+"""
+
+import dataclasses
+import enum
+
+
+class ScenarioEventType(enum.Enum):
+    """Types of the events reported by the scenario runner."""
+
+    STATUS_MESSAGE = "status_message"
+    INFO_MESSAGE = "info_message"
+    PROGRESS = "progress"
+    LOG = "log"
+    CANCELLED = "cancelled"
+    STAGE_METRICS = "stage_metrics"
+    FINISHED = "finished"
+
+
+@dataclasses.dataclass
+class ScenarioEvent:
+    """Event reported by the scenario runner.
+
+    The event data holds:
+    - STATUS_MESSAGE: message
+    - INFO_MESSAGE: message and level
+    - PROGRESS: value
+    - LOG: message, name, info and notify
+    - CANCELLED: error, whether the run was cancelled by an error
+    - STAGE_METRICS: metrics dictionary
+    - FINISHED: result, only reported by the events iterator
+    """
+
+    type: ScenarioEventType
+    data: dict = dataclasses.field(default_factory=dict)
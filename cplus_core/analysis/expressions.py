@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+    Typed linear expressions of the pathways weighting.
+
+    A weighting expression is a constant plus coefficient weighted layer
+    terms. Layers are bound by their full path, folding the expression
+    merges the terms of a repeated layer into one coefficient and drops
+    the zero coefficient terms, so every layer is read once. Expressions
+    are evaluated over windows by the weighting coefficient matrix.
+"""
+
+import dataclasses
+import typing
+
+
+@dataclasses.dataclass(frozen=True)
+class Term:
+    """Layer weighted by a coefficient."""
+
+    layer: str
+    coefficient: float
+
+
+@dataclasses.dataclass
+class LinearExpression:
+    """Sum of a constant and of weighted layer terms."""
+
+    terms: typing.List[Term] = dataclasses.field(default_factory=list)
+    constant: float = 0.0
+
+    @classmethod
+    def from_terms(
+        cls, terms: typing.Sequence[typing.Tuple[str, float]], constant: float = 0.0
+    ) -> "LinearExpression":
+        """Creates the expression from layer paths and coefficients.
+
+        :param terms: Layer paths and their coefficients
+        :type terms: typing.Sequence[typing.Tuple[str, float]]
+
+        :param constant: Constant of the expression
+        :type constant: float
+
+        :returns: Linear expression
+        :rtype: LinearExpression
+        """
+        return cls(
+            [Term(layer, float(coefficient)) for layer, coefficient in terms],
+            float(constant),
+        )
+
+    @property
+    def layers(self) -> typing.List[str]:
+        """Distinct layer paths in their binding order."""
+        return list(dict.fromkeys(term.layer for term in self.terms))
+
+    @property
+    def coefficients(self) -> typing.List[float]:
+        """Coefficients of the terms."""
+        return [term.coefficient for term in self.terms]
+
+    def fold(self) -> "LinearExpression":
+        """Returns the expression with the coefficients of repeated
+        layers merged and the zero coefficient terms dropped. A dropped
+        layer no longer sets the output pixels where it has nodata.
+
+        :returns: Folded expression
+        :rtype: LinearExpression
+        """
+        coefficients: typing.Dict[str, float] = {}
+        for term in self.terms:
+            coefficients[term.layer] = (
+                coefficients.get(term.layer, 0.0) + term.coefficient
+            )
+
+        return LinearExpression(
+            [
+                Term(layer, coefficient)
+                for layer, coefficient in coefficients.items()
+                if coefficient != 0
+            ],
+            self.constant,
+        )
+
+    def is_identity(self, layer: str) -> bool:
+        """Returns whether the expression evaluates to the passed layer
+        unchanged.
+
+        :param layer: Layer path
+        :type layer: str
+
+        :returns: Whether the expression is the layer itself
+        :rtype: bool
+        """
+        return (
+            self.constant == 0
+            and len(self.terms) == 1
+            and self.terms[0] == Term(layer, 1.0)
+        )
+
+    def raster_calculator_expression(self, names: typing.Dict[str, str]) -> str:
+        """Returns the expression in the QGIS raster calculator syntax.
+
+        :param names: Raster calculator layer name bound to each layer path
+        :type names: typing.Dict[str, str]
+
+        :returns: Raster calculator expression
+        :rtype: str
+        """
+        parts = [f'({term.coefficient}*"{names[term.layer]}@1")' for term in self.terms]
+        if self.constant or not parts:
+            parts.append(f"({self.constant})")
+
+        return " + ".join(parts)
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""
+    Vectorized per-pixel kernels of the scenario analysis stages.
+
+    Every kernel works on a window of Float32 values together with the
+    boolean mask of its valid (not nodata) pixels.
+"""
+
+import typing
+
+import numpy as np
+
+
+Block = typing.Tuple[np.ndarray, np.ndarray]
+
+
+def nodata_sum(blocks: typing.Sequence[Block]) -> Block:
+    """Sums the blocks ignoring nodata pixels, a pixel is valid
+    when at least one of the inputs is valid.
+
+    :param blocks: Values and valid masks of the inputs
+    :type blocks: typing.Sequence[Block]
+
+    :returns: Summed values and valid mask
+    :rtype: Block
+    """
+    values, valid = blocks[0]
+    result = np.where(valid, values, np.float32(0))
+    result_valid = valid.copy()
+
+    for values, valid in blocks[1:]:
+        result += np.where(valid, values, np.float32(0))
+        result_valid |= valid
+
+    return result, result_valid
+
+
+def strict_sum(blocks: typing.Sequence[Block]) -> Block:
+    """Sums the blocks, a pixel is valid only when all the inputs
+    are valid.
+
+    :param blocks: Values and valid masks of the inputs
+    :type blocks: typing.Sequence[Block]
+
+    :returns: Summed values and valid mask
+    :rtype: Block
+    """
+    values, valid = blocks[0]
+    result = values.copy()
+    result_valid = valid.copy()
+
+    for values, valid in blocks[1:]:
+        result += values
+        result_valid &= valid
+
+    return result, result_valid
+
+
+def apply_mask(block: Block, mask: np.ndarray) -> Block:
+    """Sets the pixels covered by the mask as nodata.
+
+    :param block: Values and valid mask
+    :type block: Block
+
+    :param mask: Boolean mask of the pixels to exclude
+    :type mask: np.ndarray
+
+    :returns: Masked values and valid mask
+    :rtype: Block
+    """
+    values, valid = block
+    return values, valid & ~mask
+
+
+def zero_to_nodata(block: Block) -> Block:
+    """Sets the zero value pixels as nodata.
+
+    :param block: Values and valid mask
+    :type block: Block
+
+    :returns: Cleaned values and valid mask
+    :rtype: Block
+    """
+    values, valid = block
+    return values, valid & (values != 0)
+
+
+class HighestPositionAccumulator:
+    """Streaming highest position of ordered blocks keeping only the
+    running maximum and its position for each pixel, so the memory does
+    not grow with the number of blocks.
+
+    Nodata pixels are ignored. A block only replaces the running maximum
+    when its value is strictly greater, so ties resolve to the lowest
+    position as in the QGIS highest position in raster stack algorithm.
+    """
+
+    def __init__(self, shape: typing.Tuple[int, int]):
+        """
+        :param shape: Shape of the window blocks
+        :type shape: typing.Tuple[int, int]
+        """
+        self.maximum = np.full(shape, -np.inf, dtype=np.float32)
+        self.positions = np.zeros(shape, dtype=np.int32)
+
+    def add(self, position: int, block: Block):
+        """Adds the block found at the 1-based position of the stack.
+
+        :param position: 1-based position of the block
+        :type position: int
+
+        :param block: Values and valid mask of the block
+        :type block: Block
+        """
+        values, valid = block
+        greater = valid & (values > self.maximum)
+        np.copyto(self.maximum, values, where=greater)
+        self.positions[greater] = position
+
+    def result(self) -> Block:
+        """Returns the positions of the highest values, pixels without
+        any valid value are nodata.
+
+        :returns: Positions and valid mask
+        :rtype: Block
+        """
+        return self.positions, self.positions > 0
+
+
+def highest_position(blocks: typing.Sequence[Block]) -> Block:
+    """Computes the 1-based position of the block with the highest
+    value for each pixel, ignoring nodata pixels. Ties resolve to the
+    lowest position.
+
+    :param blocks: Values and valid masks of the ordered inputs
+    :type blocks: typing.Sequence[Block]
+
+    :returns: Positions and valid mask
+    :rtype: Block
+    """
+    accumulator = HighestPositionAccumulator(blocks[0][0].shape)
+    for position, block in enumerate(blocks, start=1):
+        accumulator.add(position, block)
+
+    return accumulator.result()
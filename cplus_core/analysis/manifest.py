@@ -0,0 +1,292 @@
+# -*- coding: utf-8 -*-
+"""
+    Run manifest recording the configuration, the completed stages and
+    the per-pathway and per-activity outputs of a scenario analysis run.
+    The manifest is saved after every stage output so it doubles as the
+    checkpoint of an interrupted run.
+"""
+
+import json
+import os
+import typing
+import uuid
+
+from ..utils.helper import CustomJsonEncoder
+
+MANIFEST_FILE_NAME = "cplus_run_manifest.json"
+
+# Task config keys that do not change the analysis outputs, or that are
+# compared per pathway through the weighting signatures.
+NON_STRUCTURAL_CONFIG_KEYS = [
+    "scenario_name",
+    "scenario_desc",
+    "base_dir",
+    "priority_layers",
+    "priority_layer_groups",
+    "memory_budget",
+    "parallel_workers",
+    "tile_size",
+    "batched_weighting",
+    "native_highest_position",
+    "raster_masking",
+    "warp_multithreading",
+    "stage_backends",
+    "streaming_statistics",
+    "cache_dir",
+    "cache_max_size",
+    "snap_store_dir",
+    "previous_run_dir",
+]
+
+
+def structural_config(config: dict) -> dict:
+    """Returns the part of a task config dictionary that affects every
+    output of a run, pathways priority layers are excluded as their
+    contribution is captured by the pathways weighting signatures.
+
+    :param config: Task config dictionary
+    :type config: dict
+
+    :returns: Structural config
+    :rtype: dict
+    """
+    structural = {
+        key: value
+        for key, value in config.items()
+        if key not in NON_STRUCTURAL_CONFIG_KEYS
+    }
+    activities = []
+    for activity in config.get("activities", []):
+        activity = dict(activity)
+        activity["pathways"] = [
+            {key: value for key, value in pathway.items() if key != "priority_layers"}
+            for pathway in activity.get("pathways", [])
+        ]
+        activities.append(activity)
+    structural["activities"] = activities
+
+    return json.loads(json.dumps(structural, cls=CustomJsonEncoder, sort_keys=True))
+
+
+class RunManifest:
+    """Manifest of a scenario analysis run stored in the scenario
+    directory.
+    """
+
+    def __init__(self, path: str, data: dict = None):
+        """
+        :param path: Manifest file path
+        :type path: str
+
+        :param data: Manifest content
+        :type data: dict
+        """
+        self.path = path
+        self.data = data or {
+            "config": {},
+            "settings": {},
+            "priority_layer_groups": [],
+            "completed_stages": [],
+            "pathways": {},
+            "activities": {},
+        }
+
+    @classmethod
+    def for_directory(cls, directory: str) -> "RunManifest":
+        """Creates an empty manifest for the scenario directory.
+
+        :param directory: Scenario directory
+        :type directory: str
+
+        :returns: Run manifest
+        :rtype: RunManifest
+        """
+        return cls(os.path.join(directory, MANIFEST_FILE_NAME))
+
+    @classmethod
+    def load(cls, directory: str) -> typing.Union["RunManifest", None]:
+        """Loads the manifest saved in the scenario directory.
+
+        :param directory: Scenario directory
+        :type directory: str
+
+        :returns: Run manifest or None if there is no valid manifest
+        :rtype: typing.Union[RunManifest, None]
+        """
+        path = os.path.join(directory, MANIFEST_FILE_NAME)
+        if not os.path.exists(path):
+            return None
+
+        try:
+            with open(path) as f:
+                return cls(path, json.load(f))
+        except (OSError, ValueError):
+            return None
+
+    def save(self):
+        """Writes the manifest into its file. The content is written to a
+        temporary file first and renamed into place, so an interrupted
+        write never leaves a truncated manifest.
+        """
+        temporary_path = f"{self.path}.{uuid.uuid4().hex}.tmp"
+        with open(temporary_path, "w") as f:
+            json.dump(self.data, f, cls=CustomJsonEncoder, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary_path, self.path)
+
+    def set_config(self, config: dict):
+        """Records the task config of the run.
+
+        :param config: Task config dictionary
+        :type config: dict
+        """
+        self.data["config"] = structural_config(config)
+        self.data["settings"] = json.loads(
+            json.dumps(config, cls=CustomJsonEncoder, sort_keys=True)
+        )
+        self.data["priority_layer_groups"] = json.loads(
+            json.dumps(config.get("priority_layer_groups", []), cls=CustomJsonEncoder)
+        )
+
+    def restore_progress(self, manifest: "RunManifest"):
+        """Copies the completed stages and the recorded outputs of another
+        manifest, like the checkpoint of the run being resumed, so that
+        they are kept until the outputs are restored.
+
+        :param manifest: Manifest whose progress is copied
+        :type manifest: RunManifest
+        """
+        self.data["completed_stages"] = list(manifest.data.get("completed_stages", []))
+        for pathway_uuid, previous in manifest.data.get("pathways", {}).items():
+            entry = self.data["pathways"].setdefault(pathway_uuid, {"paths": {}})
+            entry["paths"].update(previous.get("paths", {}))
+            if previous.get("priority_layers") is not None:
+                entry["priority_layers"] = previous["priority_layers"]
+        for activity_uuid, previous in manifest.data.get("activities", {}).items():
+            entry = self.data["activities"].setdefault(activity_uuid, {"paths": {}})
+            entry["paths"].update(previous.get("paths", {}))
+
+    def complete_stage(self, stage: str):
+        """Marks the stage as completed for all the analysed items.
+
+        :param stage: Stage name
+        :type stage: str
+        """
+        if stage not in self.data.setdefault("completed_stages", []):
+            self.data["completed_stages"].append(stage)
+
+    def is_stage_completed(self, stage: str) -> bool:
+        """Returns whether the stage was completed."""
+        return stage in self.data.get("completed_stages", [])
+
+    def set_pathway_signature(self, pathway_uuid: str, signature: dict):
+        """Records the weighting signature of a pathway.
+
+        :param pathway_uuid: Pathway UUID
+        :type pathway_uuid: str
+
+        :param signature: Weighting inputs of the pathway
+        :type signature: dict
+        """
+        entry = self.data["pathways"].setdefault(pathway_uuid, {"paths": {}})
+        entry["signature"] = signature
+
+    def pathway_signature(self, pathway_uuid: str) -> typing.Union[dict, None]:
+        """Returns the recorded weighting signature of a pathway."""
+        return self.data["pathways"].get(pathway_uuid, {}).get("signature")
+
+    def record_pathway(self, pathway_uuid: str, stage: str, path: str):
+        """Records the output of a pathway stage.
+
+        :param pathway_uuid: Pathway UUID
+        :type pathway_uuid: str
+
+        :param stage: Stage name
+        :type stage: str
+
+        :param path: Output path
+        :type path: str
+        """
+        entry = self.data["pathways"].setdefault(pathway_uuid, {"paths": {}})
+        entry["paths"][stage] = path
+
+    def record_activity(self, activity_uuid: str, stage: str, path: str):
+        """Records the output of an activity stage.
+
+        :param activity_uuid: Activity UUID
+        :type activity_uuid: str
+
+        :param stage: Stage name
+        :type stage: str
+
+        :param path: Output path
+        :type path: str
+        """
+        entry = self.data["activities"].setdefault(activity_uuid, {"paths": {}})
+        entry["paths"][stage] = path
+
+    def record_pathway_priority_layers(
+        self, pathway_uuid: str, priority_layers: typing.List[dict]
+    ):
+        """Records the snapped priority layers of a pathway.
+
+        :param pathway_uuid: Pathway UUID
+        :type pathway_uuid: str
+
+        :param priority_layers: Pathway priority layers
+        :type priority_layers: typing.List[dict]
+        """
+        entry = self.data["pathways"].setdefault(pathway_uuid, {"paths": {}})
+        entry["priority_layers"] = json.loads(
+            json.dumps(priority_layers, cls=CustomJsonEncoder)
+        )
+
+    def pathway_priority_layers(
+        self, pathway_uuid: str
+    ) -> typing.Union[typing.List[dict], None]:
+        """Returns the recorded snapped priority layers of a pathway."""
+        return self.data["pathways"].get(pathway_uuid, {}).get("priority_layers")
+
+    def pathway_path(self, pathway_uuid: str, stage: str) -> typing.Union[str, None]:
+        """Returns the recorded output of a pathway stage if the
+        file still exists.
+        """
+        path = self.data["pathways"].get(pathway_uuid, {}).get("paths", {}).get(stage)
+        return path if path and os.path.exists(path) else None
+
+    def activity_path(self, activity_uuid: str, stage: str) -> typing.Union[str, None]:
+        """Returns the recorded output of an activity stage if the
+        file still exists.
+        """
+        path = (
+            self.data["activities"].get(activity_uuid, {}).get("paths", {}).get(stage)
+        )
+        return path if path and os.path.exists(path) else None
+
+    def changed_priority_groups(self, priority_layer_groups: list) -> typing.List[str]:
+        """Returns the names of the priority groups whose values differ
+        from the recorded ones.
+
+        :param priority_layer_groups: Priority layer groups of the new run
+        :type priority_layer_groups: list
+
+        :returns: Names of the changed priority groups
+        :rtype: typing.List[str]
+        """
+
+        def group_values(groups):
+            return {
+                str(group.get("name")): group.get("value")
+                for group in groups or []
+                if isinstance(group, dict)
+            }
+
+        previous = group_values(self.data.get("priority_layer_groups"))
+        current = group_values(priority_layer_groups)
+
+        return sorted(
+            name
+            for name in set(previous) | set(current)
+            if previous.get(name) != current.get(name)
+        )
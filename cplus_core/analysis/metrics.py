@@ -0,0 +1,356 @@
+# -*- coding: utf-8 -*-
+"""
+    Timing, I/O and memory metrics of the scenario analysis stages and
+    of their pathways and activities.
+"""
+
+import contextlib
+import dataclasses
+import os
+import sys
+import threading
+import time
+import typing
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows
+    resource = None
+
+# Linux process I/O counters.
+PROC_IO_PATH = "/proc/self/io"
+
+# Linux process memory pages.
+PROC_STATM_PATH = "/proc/self/statm"
+
+# Seconds between the resident set size samples of the measures.
+RSS_SAMPLE_INTERVAL = 0.05
+
+
+@dataclasses.dataclass
+class StageMetrics:
+    """Metrics of a stage, or of one of its items when the item UUID
+    is set. The CPU time and the bytes read and written include the child
+    processes that exited during the measure, child processes still
+    running at the end of the measure are not counted. The peak resident
+    set size is sampled during the measure and given above the resident
+    set size at its start, the children peak is the increase of the
+    largest peak of the terminated child processes. The created files
+    are only counted for the stages.
+    """
+
+    stage: str
+    item_uuid: str = ""
+    item_name: str = ""
+    wall_time: float = 0.0
+    cpu_time: float = 0.0
+    peak_rss_delta: int = 0
+    children_peak_rss_delta: int = 0
+    bytes_read: int = 0
+    bytes_written: int = 0
+    files_created: int = 0
+    output_size: int = 0
+
+    def to_dict(self) -> dict:
+        """Returns the metrics as a dictionary."""
+        return dataclasses.asdict(self)
+
+
+@dataclasses.dataclass
+class ResourceSnapshot:
+    """Process resources usage at a point in time."""
+
+    wall_time: float
+    cpu_time: float
+    rss: int
+    children_peak_rss: int
+    bytes_read: int
+    bytes_written: int
+    file_count: int
+
+    @classmethod
+    def take(cls, directory: str = None) -> "ResourceSnapshot":
+        """Takes a snapshot of the process resources usage.
+
+        :param directory: Directory whose files are counted, the files
+        are not counted when it is not set
+        :type directory: str
+
+        :returns: Resources snapshot
+        :rtype: ResourceSnapshot
+        """
+        bytes_read, bytes_written = io_counters()
+
+        return cls(
+            wall_time=time.perf_counter(),
+            cpu_time=time.process_time() + children_cpu_time(),
+            rss=current_rss(),
+            children_peak_rss=peak_rss(children=True),
+            bytes_read=bytes_read,
+            bytes_written=bytes_written,
+            file_count=file_count(directory),
+        )
+
+
+def io_counters() -> typing.Tuple[int, int]:
+    """Returns the bytes read and written by the process, zero where
+    the counters are not available. Linux adds the counters of the
+    terminated child processes to the process counters once they are
+    waited for.
+
+    :returns: Bytes read and bytes written
+    :rtype: typing.Tuple[int, int]
+    """
+    try:
+        with open(PROC_IO_PATH) as f:
+            counters = dict(line.split(":", 1) for line in f if ":" in line)
+        return int(counters["rchar"]), int(counters["wchar"])
+    except (OSError, KeyError, ValueError):
+        return 0, 0
+
+
+def children_cpu_time() -> float:
+    """Returns the CPU time of the terminated child processes of the
+    process, like the engine and sieve workers, zero where it is not
+    available.
+
+    :returns: User and system CPU time in seconds
+    :rtype: float
+    """
+    if resource is None:
+        return 0.0
+
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+
+    return usage.ru_utime + usage.ru_stime
+
+
+def peak_rss(children: bool = False) -> int:
+    """Returns the peak resident set size of the process in bytes, zero
+    where it is not available.
+
+    :param children: Whether to return the largest peak resident set
+    size of the terminated child processes instead
+    :type children: bool
+
+    :returns: Peak resident set size
+    :rtype: int
+    """
+    if resource is None:
+        return 0
+
+    peak = resource.getrusage(
+        resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF
+    ).ru_maxrss
+
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def current_rss() -> int:
+    """Returns the resident set size of the process in bytes, the peak
+    resident set size where the current size is not available.
+
+    :returns: Resident set size
+    :rtype: int
+    """
+    try:
+        with open(PROC_STATM_PATH) as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, IndexError, ValueError, AttributeError):
+        return peak_rss()
+
+
+class RssSampler:
+    """Samples the resident set size of the process in a background
+    thread, keeping the largest sample since the last reset.
+    """
+
+    def __init__(self, interval: float = RSS_SAMPLE_INTERVAL):
+        """
+        :param interval: Seconds between the samples
+        :type interval: float
+        """
+        self.interval = interval
+        self._peak = 0
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Starts sampling."""
+        self.reset()
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stops sampling."""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def reset(self) -> int:
+        """Returns the largest resident set size sampled since the last
+        reset, including the current size, and starts a new peak.
+
+        :returns: Peak resident set size in bytes
+        :rtype: int
+        """
+        rss = current_rss()
+        with self._lock:
+            peak = max(self._peak, rss)
+            self._peak = rss
+
+        return peak
+
+    def _sample(self):
+        """Samples the resident set size until stopped."""
+        while not self._stopped.wait(self.interval):
+            rss = current_rss()
+            with self._lock:
+                self._peak = max(self._peak, rss)
+
+
+def file_count(directory: str) -> int:
+    """Returns the number of files in the directory tree.
+
+    :param directory: Directory path
+    :type directory: str
+
+    :returns: Number of files
+    :rtype: int
+    """
+    if not directory or not os.path.isdir(directory):
+        return 0
+
+    return sum(len(files) for _, _, files in os.walk(directory))
+
+
+class MetricsRecorder:
+    """Records the metrics of the stages and of the items that each
+    stage outputs. An item is measured from the previous item output of
+    the stage, or from the stage start, so the items processed together
+    by a batched stage are all measured at the end of the batch. The
+    scenario directory files are only counted at the stage start and end,
+    the resident set size is sampled while a stage runs.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        callback: typing.Callable[[dict], None] = None,
+    ):
+        """
+        :param directory: Scenario directory whose created files are counted
+        :type directory: str
+
+        :param callback: Function called with each recorded metrics
+        dictionary
+        :type callback: typing.Callable[[dict], None]
+        """
+        self.directory = directory
+        self.callback = callback
+        self.records: typing.List[StageMetrics] = []
+        self._stage = None
+        self._item_start = None
+        self._stage_peak = 0
+        self._sampler = RssSampler()
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        """Measures the stage run inside the context.
+
+        :param name: Stage name
+        :type name: str
+        """
+        start = ResourceSnapshot.take(self.directory)
+        self._stage = name
+        self._item_start = start
+        self._stage_peak = 0
+        self._sampler.start()
+        try:
+            yield
+        finally:
+            self._stage = None
+            self._item_start = None
+            item_peak = self._sampler.reset()
+            self._sampler.stop()
+            self._record(
+                StageMetrics(stage=name),
+                start,
+                max(self._stage_peak, item_peak),
+                count_files=True,
+            )
+
+    def item(self, item_uuid: str, item_name: str, output_path: str = None):
+        """Records the item output of the current stage.
+
+        :param item_uuid: Pathway or activity UUID
+        :type item_uuid: str
+
+        :param item_name: Pathway or activity name
+        :type item_name: str
+
+        :param output_path: Path of the item output
+        :type output_path: str
+        """
+        if self._stage is None:
+            return
+
+        peak = self._sampler.reset()
+        self._stage_peak = max(self._stage_peak, peak)
+        self._item_start = self._record(
+            StageMetrics(
+                stage=self._stage,
+                item_uuid=str(item_uuid),
+                item_name=item_name,
+                output_size=(
+                    os.path.getsize(output_path)
+                    if output_path and os.path.isfile(output_path)
+                    else 0
+                ),
+            ),
+            self._item_start,
+            peak,
+        )
+
+    def _record(
+        self,
+        metrics: StageMetrics,
+        start: ResourceSnapshot,
+        peak: int,
+        count_files: bool = False,
+    ) -> ResourceSnapshot:
+        """Completes the metrics from the start snapshot and stores them.
+
+        :param peak: Resident set size peak sampled during the measure
+        :type peak: int
+
+        :param count_files: Whether to count the files created since the
+        start snapshot
+        :type count_files: bool
+
+        :returns: Snapshot taken at the end of the measure
+        :rtype: ResourceSnapshot
+        """
+        end = ResourceSnapshot.take(self.directory if count_files else None)
+        metrics.wall_time = end.wall_time - start.wall_time
+        metrics.cpu_time = end.cpu_time - start.cpu_time
+        metrics.peak_rss_delta = max(peak - start.rss, 0)
+        metrics.children_peak_rss_delta = max(
+            end.children_peak_rss - start.children_peak_rss, 0
+        )
+        metrics.bytes_read = end.bytes_read - start.bytes_read
+        metrics.bytes_written = end.bytes_written - start.bytes_written
+        if count_files:
+            metrics.files_created = max(end.file_count - start.file_count, 0)
+
+        self.records.append(metrics)
+        if self.callback is not None:
+            self.callback(metrics.to_dict())
+
+        return end
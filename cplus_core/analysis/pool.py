@@ -0,0 +1,374 @@
+# -*- coding: utf-8 -*-
+"""
+    Pool of long-lived scenario analysis workers.
+
+    Each worker process initializes QGIS and the processing providers
+    once, then runs the task configs taken from a shared job queue. A
+    worker is replaced by a new one after a number of jobs or when its
+    resident memory exceeds a threshold, which contains the memory
+    leaked by the QGIS layers of the runs. The replacement is started as
+    soon as the worker retires so that warm workers stay available.
+"""
+
+import concurrent.futures
+import dataclasses
+import gc
+import multiprocessing
+import os
+import queue
+import threading
+import traceback
+import typing
+import uuid
+
+from .events import ScenarioEvent, ScenarioEventType
+from .metrics import current_rss
+
+# Jobs run by a worker before it is replaced.
+DEFAULT_MAX_JOBS_PER_WORKER = 20
+
+# Resident memory in megabytes above which a worker is replaced.
+DEFAULT_MAX_WORKER_RSS = 2048
+
+# Seconds between the checks of the workers processes.
+MONITOR_INTERVAL = 0.5
+
+
+@dataclasses.dataclass
+class JobResult:
+    """Result of a scenario analysis run by a pool worker."""
+
+    job_id: str
+    success: bool = False
+    scenario_directory: str = ""
+    analysis_output: typing.Dict = None
+    stage_metrics: typing.List[dict] = dataclasses.field(default_factory=list)
+    error: str = ""
+    worker_pid: int = 0
+
+
+def _event_data(event: ScenarioEvent) -> dict:
+    """Returns the event data that can be sent to the pool process."""
+    data = dict(event.data)
+    if event.type == ScenarioEventType.INFO_MESSAGE:
+        data["level"] = int(data["level"])
+
+    return data
+
+
+def _run_job(job_id: str, payload: dict, messages, stream_events: bool) -> JobResult:
+    """Runs the scenario analysis of a job in the worker.
+
+    :param job_id: Job ID
+    :type job_id: str
+
+    :param payload: Task config dictionary
+    :type payload: dict
+
+    :param messages: Queue of the messages sent to the pool
+    :type messages: multiprocessing.Queue
+
+    :param stream_events: Whether to send the runner events to the pool
+    :type stream_events: bool
+
+    :returns: Job result
+    :rtype: JobResult
+    """
+    from .runner import ScenarioRunner
+    from .task_config import TaskConfig
+
+    callback = None
+    if stream_events:
+
+        def callback(event):
+            messages.put(("event", job_id, event.type.value, _event_data(event)))
+
+    runner = ScenarioRunner(TaskConfig.from_dict(payload), callback)
+    success = runner.run()
+    runner.finished(success)
+
+    return JobResult(
+        job_id=job_id,
+        success=bool(success),
+        scenario_directory=runner.scenario_directory,
+        analysis_output=runner.output,
+        stage_metrics=[metrics.to_dict() for metrics in runner.metrics.records],
+        error="" if runner.error is None else str(runner.error),
+        worker_pid=os.getpid(),
+    )
+
+
+def _worker_main(jobs, messages, max_jobs: int, max_rss: int):
+    """Worker process loop, initializes QGIS and runs the queued jobs
+    until it gets the stop sentinel or has to be replaced.
+
+    :param jobs: Queue of the jobs
+    :type jobs: multiprocessing.Queue
+
+    :param messages: Queue of the messages sent to the pool
+    :type messages: multiprocessing.Queue
+
+    :param max_jobs: Jobs run before the worker retires, unlimited when 0
+    :type max_jobs: int
+
+    :param max_rss: Resident memory in bytes above which the worker
+    retires, unlimited when 0
+    :type max_rss: int
+    """
+    from ..utils.application import init_qgis
+
+    application = init_qgis()
+    pid = os.getpid()
+    messages.put(("ready", pid))
+
+    completed = 0
+    try:
+        while True:
+            job = jobs.get()
+            if job is None:
+                messages.put(("stopped", pid))
+                break
+
+            job_id, payload, stream_events = job
+            messages.put(("started", pid, job_id))
+            try:
+                result = _run_job(job_id, payload, messages, stream_events)
+            except Exception:
+                result = JobResult(
+                    job_id=job_id, error=traceback.format_exc(), worker_pid=pid
+                )
+            messages.put(("finished", pid, job_id, result))
+
+            gc.collect()
+            completed += 1
+            if (max_jobs and completed >= max_jobs) or (
+                max_rss and current_rss() > max_rss
+            ):
+                messages.put(("retiring", pid))
+                break
+    finally:
+        application.exitQgis()
+
+
+class ScenarioWorkerPool:
+    """Runs task configs on warm worker processes, returning a future of
+    the :py:class:`JobResult` of each submitted config.
+    """
+
+    def __init__(
+        self,
+        workers: int = 1,
+        max_jobs_per_worker: int = DEFAULT_MAX_JOBS_PER_WORKER,
+        max_worker_rss: int = DEFAULT_MAX_WORKER_RSS,
+    ):
+        """
+        :param workers: Number of worker processes
+        :type workers: int
+
+        :param max_jobs_per_worker: Jobs run by a worker before it is
+        replaced, unlimited when 0
+        :type max_jobs_per_worker: int
+
+        :param max_worker_rss: Resident memory in megabytes above which a
+        worker is replaced after its job, unlimited when 0
+        :type max_worker_rss: int
+        """
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self.max_worker_rss = max_worker_rss
+
+        # Spawned workers avoid forking the Qt application state
+        self._context = multiprocessing.get_context("spawn")
+        self._jobs = self._context.Queue()
+        self._messages = self._context.Queue()
+        self._lock = threading.Lock()
+
+        # Futures and event callbacks by job ID
+        self._futures = {}
+        self._callbacks = {}
+        # Worker processes and the job they run by process ID
+        self._workers = {}
+        self._running = {}
+        # Workers that reported their initialization, retirement or stop
+        self._ready = set()
+        self._exiting = set()
+
+        self._closed = False
+        for _ in range(max(int(workers), 1)):
+            self._start_worker()
+
+        self._monitor = threading.Thread(target=self._monitor_loop, daemon=True)
+        self._monitor.start()
+
+    def __enter__(self) -> "ScenarioWorkerPool":
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
+
+    def submit(
+        self,
+        task_config,
+        callback: typing.Callable[[ScenarioEvent], None] = None,
+    ) -> concurrent.futures.Future:
+        """Queues the scenario analysis of the task config.
+
+        :param task_config: Scenario analysis config
+        :type task_config: TaskConfig
+
+        :param callback: Function called in the pool monitor thread with
+        each event of the run
+        :type callback: typing.Callable[[ScenarioEvent], None]
+
+        :returns: Future of the job result
+        :rtype: concurrent.futures.Future
+        """
+        payload = task_config.to_dict()
+
+        job_id = uuid.uuid4().hex
+        future = concurrent.futures.Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("The worker pool has been shut down.")
+            self._futures[job_id] = future
+            if callback is not None:
+                self._callbacks[job_id] = callback
+
+        self._jobs.put((job_id, payload, callback is not None))
+
+        return future
+
+    def shutdown(self, wait: bool = True):
+        """Stops the workers once the queued jobs are run.
+
+        :param wait: Whether to wait for the workers to stop
+        :type wait: bool
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            worker_count = len(self._workers)
+
+        for _ in range(worker_count):
+            self._jobs.put(None)
+
+        if wait:
+            self._monitor.join()
+
+    def _start_worker(self):
+        """Starts a worker process."""
+        process = self._context.Process(
+            target=_worker_main,
+            args=(
+                self._jobs,
+                self._messages,
+                self.max_jobs_per_worker,
+                self.max_worker_rss * 1024 * 1024,
+            ),
+            daemon=True,
+        )
+        process.start()
+        self._workers[process.pid] = process
+
+    def _monitor_loop(self):
+        """Handles the workers messages and replaces the exited workers
+        until the pool is shut down.
+        """
+        while True:
+            try:
+                self._handle_message(self._messages.get(timeout=MONITOR_INTERVAL))
+            except queue.Empty:
+                pass
+
+            with self._lock:
+                exited = [
+                    pid
+                    for pid, process in self._workers.items()
+                    if not process.is_alive()
+                ]
+            if exited:
+                # The last messages of the exited workers are handled
+                # before deciding whether they crashed.
+                while True:
+                    try:
+                        self._handle_message(self._messages.get_nowait())
+                    except queue.Empty:
+                        break
+
+            with self._lock:
+                for pid in exited:
+                    self._remove_worker(pid)
+                if self._closed and not self._workers:
+                    break
+
+    def _handle_message(self, message: tuple):
+        """Handles a message sent by a worker."""
+        kind, *args = message
+        if kind == "event":
+            job_id, event_type, data = args
+            callback = self._callbacks.get(job_id)
+            if callback is not None:
+                try:
+                    callback(ScenarioEvent(ScenarioEventType(event_type), data))
+                except Exception:
+                    traceback.print_exc()
+            return
+
+        with self._lock:
+            if kind == "ready":
+                self._ready.add(args[0])
+            elif kind == "started":
+                pid, job_id = args
+                self._running[pid] = job_id
+                future = self._futures.get(job_id)
+                if future is not None:
+                    future.set_running_or_notify_cancel()
+            elif kind == "finished":
+                pid, job_id, result = args
+                self._running.pop(pid, None)
+                self._callbacks.pop(job_id, None)
+                future = self._futures.pop(job_id, None)
+                if future is not None and not future.cancelled():
+                    future.set_result(result)
+            elif kind == "retiring":
+                # A warm replacement takes over the retiring worker
+                self._exiting.add(args[0])
+                self._start_worker()
+            elif kind == "stopped":
+                self._exiting.add(args[0])
+
+    def _remove_worker(self, pid: int):
+        """Removes an exited worker, failing the job of a crashed worker
+        and replacing it.
+
+        :param pid: Process ID of the worker
+        :type pid: int
+        """
+        process = self._workers.pop(pid)
+        process.join()
+        ready = pid in self._ready
+        self._ready.discard(pid)
+        if pid in self._exiting:
+            self._exiting.discard(pid)
+            return
+
+        error = RuntimeError(
+            f"Scenario analysis worker {pid} exited with code {process.exitcode}"
+        )
+        job_id = self._running.pop(pid, None)
+        if job_id is not None:
+            self._callbacks.pop(job_id, None)
+            future = self._futures.pop(job_id, None)
+            if future is not None and not future.cancelled():
+                future.set_exception(error)
+
+        if ready:
+            self._start_worker()
+        elif not self._workers:
+            # Workers failing to initialize are not restarted
+            for future in self._futures.values():
+                if not future.done():
+                    future.set_exception(error)
+            self._futures.clear()
+            self._callbacks.clear()
+            self._closed = True
@@ -0,0 +1,4535 @@
+# coding=utf-8
+"""
+ Scenario analysis runner, reporting the analysis progress and logs
+ through a callback or an events iterator without Qt signals.
+
+"""
+import concurrent.futures
+import dataclasses
+import datetime
+import os
+import queue
+import shutil
+import tempfile
+import threading
+import traceback
+import uuid
+from pathlib import Path
+import typing
+
+import math
+from qgis import processing
+from qgis.core import (
+    Qgis,
+    QgsCoordinateReferenceSystem,
+    QgsProcessing,
+    QgsProcessingContext,
+    QgsProcessingFeedback,
+    QgsRasterLayer,
+    QgsRectangle,
+    QgsVectorLayer,
+    QgsWkbTypes,
+)
+
+from ..utils.conf import Settings
+from ..definitions.constants import NO_DATA_VALUE
+from ..definitions.defaults import (
+    DEFAULT_VALUES,
+    SCENARIO_OUTPUT_FILE_NAME,
+)
+from ..models.base import ScenarioResult, Activity, NcsPathway
+from ..utils.helper import (
+    align_rasters,
+    clean_filename,
+    transform_extent,
+    tr,
+    BaseFileUtils,
+)
+from ..utils.cache import SnapStore, StageCache, file_identity
+from ..utils.statistics import read_statistics
+from ..utils.raster import (
+    RasterGrid,
+    alias_raster,
+    aligned_offsets,
+    block_layout,
+    burn_mask,
+    raster_size,
+    reference_grid,
+    warp_to_grid,
+    window_vrt,
+)
+from .events import ScenarioEvent, ScenarioEventType
+from .manifest import RunManifest
+from .metrics import MetricsRecorder
+from .backends import (
+    AnalysisStage,
+    NUMPY_BACKEND_SETTINGS,
+    StageBackend,
+    stage_backend,
+)
+from .expressions import LinearExpression
+from .sieve import TiledSieve, sieve_tile_size
+from .engine import (
+    ActivityPlan,
+    EnginePlan,
+    FusedRasterEngine,
+    HIGHEST_POSITION_PIXEL_BYTES,
+    HighestPositionEngine,
+    PathwayPlan,
+    TiledEngineExecutor,
+    apply_raster_mask,
+    cell_sum,
+    sieve_raster,
+)
+from .task_config import TaskConfig
+
+
+# Checkpointed stages whose outputs are recorded per pathway, the other
+# stages record their outputs per activity.
+PATHWAY_STAGES = ["snapping", "weighting"]
+
+
+class ScenarioRunner:
+    """Prepares and runs the scenario analysis"""
+
+    def __init__(
+        self,
+        task_config: TaskConfig,
+        callback: typing.Callable[[ScenarioEvent], None] = None,
+    ):
+        """
+        :param task_config: Scenario analysis config
+        :type task_config: TaskConfig
+
+        :param callback: Function called with each event of the run
+        :type callback: typing.Callable[[ScenarioEvent], None]
+        """
+        self.callback = callback
+        self.cancelled = False
+        self.task_config = task_config
+        self.analysis_scenario_name = task_config.scenario.name
+        self.analysis_scenario_description = task_config.scenario.description
+
+        self.analysis_activities = task_config.analysis_activities
+        self.analysis_priority_layers_groups = task_config.priority_layer_groups
+        self.analysis_extent = task_config.scenario.extent
+        self.analysis_extent_string = None
+
+        self.analysis_weighted_activities = []
+        self.scenario_result = None
+
+        self.success = True
+        self.output = None
+        self.error = None
+        self.status_message = None
+
+        self.info_message = None
+
+        self.processing_cancelled = False
+        self.feedback = QgsProcessingFeedback()
+        self.processing_context = QgsProcessingContext()
+
+        self.scenario = task_config.scenario
+        self.scenario_directory = task_config.base_dir
+
+        self.run_manifest = RunManifest.for_directory(self.scenario_directory)
+        self.metrics = MetricsRecorder(
+            self.scenario_directory,
+            lambda metrics: self.emit_event(
+                ScenarioEventType.STAGE_METRICS, metrics=metrics
+            ),
+        )
+        self.reused_pathways = set()
+        self.reused_activities = set()
+
+        self.resuming = False
+        self.resumed_manifest = None
+
+        # Activities cleaned in the same pass as their sum
+        self.cleaned_activities = set()
+
+        # Mask rasters burned during the run, by mask layers and grid
+        self.mask_rasters = {}
+
+        # Mask layers prepared during the run, by mask layers and extent
+        self.prepared_masks = {}
+
+        # Snapped priority layers of the run, by layer UUID and source path
+        self.snapped_layers = {}
+
+        # Directory of the outputs that are not saved, removed when the
+        # run finishes
+        self.temporary_directory = None
+
+        # Logs of the snapping threads, reported by the calling thread
+        self.thread_logs = threading.local()
+
+        self.snap_store = None
+        snap_store_dir = self.get_settings_value(Settings.SNAP_STORE_DIR, default="")
+        if snap_store_dir:
+            self.snap_store = SnapStore(snap_store_dir)
+
+        self.stage_cache = None
+        cache_dir = self.get_settings_value(Settings.CACHE_DIR, default="")
+        if cache_dir:
+            cache_max_size = float(
+                self.get_settings_value(
+                    Settings.CACHE_MAX_SIZE, default=DEFAULT_VALUES.cache_max_size
+                )
+            )
+            self.stage_cache = StageCache(cache_dir, int(cache_max_size * 1024 * 1024))
+
+    def get_settings_value(self, name: str, default=None, setting_type=None):
+        """Get attribute value by attribute name.
+
+        :param name: Attribute name/config key
+        :type name: Settings
+
+        :param default: Default value if not found, defaults to None
+        :type default: any, optional
+
+        :param setting_type: type of attribute, defaults to None
+        :type setting_type: any, optional
+
+        :return: Attribute value
+        :rtype: any
+        """
+        return self.task_config.get_value(name, default)
+
+    def stage_backend(self, stage: AnalysisStage) -> StageBackend:
+        """Returns the backend used to run the analysis stage, the stage
+        default backend is used when the selected one is not valid.
+
+        :param stage: Analysis stage
+        :type stage: AnalysisStage
+
+        :returns: Stage backend
+        :rtype: StageBackend
+        """
+        default = None
+        numpy_setting = NUMPY_BACKEND_SETTINGS.get(stage)
+        if numpy_setting is not None and self.get_settings_value(
+            numpy_setting, default=False, setting_type=bool
+        ):
+            default = StageBackend.NUMPY
+
+        try:
+            return stage_backend(
+                stage,
+                self.get_settings_value(Settings.STAGE_BACKENDS, default={}),
+                default,
+            )
+        except ValueError as e:
+            self.log_message(f"Invalid backend for the {stage.value} stage, {e}")
+            return stage_backend(stage, {}, default)
+
+    def gather_statistics(self) -> bool:
+        """Returns whether the native stages gather the statistics of
+        their outputs while writing them.
+
+        :returns: Whether to gather the outputs statistics
+        :rtype: bool
+        """
+        return self.get_settings_value(
+            Settings.STREAMING_STATISTICS,
+            default=DEFAULT_VALUES.streaming_statistics,
+            setting_type=bool,
+        )
+
+    def get_priority_layer(self, identifier):
+        """Get priority layer dict by its UUID.
+
+        :param identifier: Priority Layer UUID
+        :type identifier: str
+
+        :return: Priority Layer dict
+        :rtype: typing.Dict
+        """
+        return self.task_config.get_priority_layer(identifier)
+
+    def get_activity(self, activity_uuid):
+        """Get activity object by its UUID.
+
+        :param activity_uuid: activity UUID
+        :type activity_uuid: str
+
+        :return: Activity object or None if not found
+        :rtype: typing.Union[Activity, None]
+        """
+        return self.task_config.get_activity(activity_uuid)
+
+    def get_priority_layers(self):
+        """Get all priority layers.
+
+        :return: List of priority layer dictionary
+        :rtype: typing.List
+        """
+        return self.task_config.get_priority_layers()
+
+    def get_masking_layers(self):
+        """Get masking layers
+
+        :return: list of mask layer file path
+        :rtype: List
+        """
+        masking_layers_paths = self.get_settings_value(
+            Settings.MASK_LAYERS_PATHS, default=None
+        )
+        masking_layers = masking_layers_paths.split(",") if masking_layers_paths else []
+
+        masking_layers.remove("") if "" in masking_layers else None
+        return masking_layers
+
+    def cached_stage_output(
+        self,
+        stage: str,
+        inputs: typing.List[str],
+        params: dict,
+        extent: str = "",
+    ) -> typing.Tuple[typing.Union[str, None], typing.Union[str, None]]:
+        """Looks up the output of a stage in the stage outputs cache.
+
+        :param stage: Stage name
+        :type stage: str
+
+        :param inputs: Paths of the stage inputs
+        :type inputs: typing.List[str]
+
+        :param params: Stage parameters, excluding the inputs and output
+        :type params: dict
+
+        :param extent: Processing extent
+        :type extent: str
+
+        :returns: Cache key and the path of the cached output linked into
+        the scenario directory, both are None when the cache is disabled
+        and the path is None on a cache miss.
+        :rtype: typing.Tuple[typing.Union[str, None], typing.Union[str, None]]
+        """
+        if self.stage_cache is None:
+            return None, None
+
+        key = self.stage_cache.key(
+            stage, inputs, params, extent, self.get_reference_layer() or ""
+        )
+        cached_path = self.stage_cache.materialize(
+            key, self.cached_output_path("stage_cache", stage, key)
+        )
+        if cached_path:
+            self.log_message(f"Reusing cached {stage} output {cached_path} \n")
+
+        return key, cached_path
+
+    def cached_output_path(self, store: str, stage: str, key: str) -> str:
+        """Returns the scenario directory path a cached output is linked to.
+
+        :param store: Name of the cache holding the output
+        :type store: str
+
+        :param stage: Stage name
+        :type stage: str
+
+        :param key: Cache key
+        :type key: str
+
+        :returns: Path of the linked output
+        :rtype: str
+        """
+        return os.path.join(self.scenario_directory, store, stage, f"{key}.tif")
+
+    def cache_stage_output(self, key: typing.Union[str, None], path: str) -> str:
+        """Stores a stage output in the stage outputs cache. The output is
+        linked into the cache, the analysis keeps using the passed path.
+
+        :param key: Cache key from :py:meth:`cached_stage_output`
+        :type key: str
+
+        :param path: Stage output path
+        :type path: str
+
+        :returns: The passed output path
+        :rtype: str
+        """
+        if self.stage_cache is None or key is None:
+            return path
+
+        if not path or not os.path.isfile(path):
+            return path
+
+        try:
+            self.stage_cache.store(key, path)
+        except OSError as e:
+            self.log_message(f"Problem caching the stage output {path}, {e}")
+
+        return path
+
+    def stored_snapped_layer(
+        self,
+        input_path: str,
+        reference_path: str,
+        extent: str,
+        grid: typing.Union[RasterGrid, None],
+        rescale_values: bool,
+        resampling_method: int,
+        nodata_value: float,
+    ) -> typing.Tuple[typing.Union[str, None], typing.Union[str, None]]:
+        """Looks up the snapped layer in the snapped layers store.
+
+        :param input_path: Input layer source
+        :type input_path: str
+
+        :param reference_path: Reference layer source
+        :type reference_path: str
+
+        :param extent: Clip extent
+        :type extent: str
+
+        :param grid: Snapping grid, None when QgsAlignRaster computes it
+        :type grid: RasterGrid
+
+        :param rescale_values: Whether to rescale pixel values
+        :type rescale_values: bool
+
+        :param resampling_method: Method to use when resampling
+        :type resampling_method: int
+
+        :param nodata_value: Original no data value of the input layer
+        :type nodata_value: float
+
+        :returns: Store key and the path of the stored layer linked into
+        the scenario directory, both are None when the store is disabled
+        and the path is None if the layer is not in the store.
+        :rtype: typing.Tuple[typing.Union[str, None], typing.Union[str, None]]
+        """
+        if self.snap_store is None:
+            return None, None
+
+        key = self.snap_store.layer_key(
+            input_path,
+            (
+                dataclasses.asdict(grid)
+                if grid is not None
+                else {"reference": file_identity(reference_path)}
+            ),
+            extent,
+            resampling_method,
+            rescale_values,
+            nodata_value,
+            self.snap_options(),
+        )
+        stored_path = self.snap_store.materialize(
+            key, self.cached_output_path("snap_store", "snap", key)
+        )
+        if stored_path:
+            self.log_message(f"Reusing stored snapped layer {stored_path} \n")
+            if self.stage_cache is not None:
+                self.stage_cache.add_alias(stored_path, {"snap_entry": key})
+
+        return key, stored_path
+
+    def snap_options(self) -> dict:
+        """Returns the snapping options that change the snapped layers
+        besides the snapping parameters, used in their cache keys.
+
+        :returns: Snap backend and warp options
+        :rtype: dict
+        """
+        return {
+            "backend": self.stage_backend(AnalysisStage.SNAP).value,
+            "warp_multithreading": self.get_settings_value(
+                Settings.WARP_MULTITHREADING, default=False, setting_type=bool
+            ),
+        }
+
+    def store_snapped_layer(self, key: typing.Union[str, None], path: str) -> str:
+        """Adds a snapped layer to the snapped layers store.
+
+        :param key: Store key from :py:meth:`stored_snapped_layer`
+        :type key: str
+
+        :param path: Snapped layer path
+        :type path: str
+
+        :returns: The passed layer path
+        :rtype: str
+        """
+        if self.snap_store is None or key is None:
+            return path
+
+        if not path or not os.path.isfile(path):
+            return path
+
+        try:
+            self.snap_store.store(key, path)
+        except OSError as e:
+            self.log_message(f"Problem storing the snapped layer {path}, {e}")
+
+        return path
+
+    def cancel_task(self, exception=None):
+        """Cancel current task.
+
+        :param exception: exception if any, defaults to None
+        :type exception: Exception, optional
+        """
+        self.error = exception
+        self.cancelled = True
+        self.emit_event(ScenarioEventType.CANCELLED, error=exception is not None)
+
+    def cancel(self):
+        """Cancels the run, the running stage stops at its next
+        cancellation check.
+        """
+        self.cancelled = True
+        self.processing_cancelled = True
+        self.feedback.cancel()
+
+    def emit_event(self, event_type: ScenarioEventType, **data):
+        """Reports an event of the run to the callback.
+
+        :param event_type: Event type
+        :type event_type: ScenarioEventType
+
+        :param data: Event data
+        :type data: dict
+        """
+        if self.callback is not None:
+            self.callback(ScenarioEvent(event_type, data))
+
+    def events(self, resume: bool = False) -> typing.Iterator[ScenarioEvent]:
+        """Runs the analysis in a worker thread and yields its events,
+        the last event is FINISHED with the run result. The run is
+        cancelled when the iteration stops early.
+
+        :param resume: Whether to resume the interrupted run
+        :type resume: bool
+
+        :returns: Events of the run
+        :rtype: typing.Iterator[ScenarioEvent]
+        """
+        events = queue.Queue()
+        callback = self.callback
+        outcome = {}
+
+        def forward(event):
+            if callback is not None:
+                callback(event)
+            events.put(event)
+
+        def target():
+            try:
+                outcome["result"] = self.resume() if resume else self.run()
+            except Exception as e:
+                outcome["error"] = e
+            finally:
+                events.put(None)
+
+        self.callback = forward
+        thread = threading.Thread(target=target, daemon=True)
+        thread.start()
+        try:
+            while True:
+                event = events.get()
+                if event is None:
+                    break
+                yield event
+        finally:
+            if thread.is_alive():
+                self.cancel()
+            thread.join()
+            self.callback = callback
+
+        if "error" in outcome:
+            raise outcome["error"]
+
+        yield ScenarioEvent(
+            ScenarioEventType.FINISHED, {"result": outcome.get("result", False)}
+        )
+
+    def log_message(
+        self,
+        message: str,
+        name: str = "qgis_cplus",
+        info: bool = True,
+        notify: bool = True,
+    ):
+        """Handle when log is received from running task.
+
+        :param message: Message log
+        :type message: str
+
+        :param name: log name, defaults to "qgis_cplus"
+        :type name: str, optional
+
+        :param info: True if it is information log, defaults to True
+        :type info: bool, optional
+
+        :param notify: Not used in API, defaults to True
+        :type notify: bool, optional
+        """
+        thread_logs = getattr(self.thread_logs, "messages", None)
+        if thread_logs is not None:
+            thread_logs.append((message, name, info, notify))
+            return
+
+        self.emit_event(
+            ScenarioEventType.LOG,
+            message=message,
+            name=name,
+            info=info,
+            notify=notify,
+        )
+
+    def on_terminated(self):
+        """Called when the task is terminated."""
+        message = "Processing has been cancelled by the user."
+        if self.error:
+            message = f"Problem in running scenario analysis: {self.error}"
+        self.set_status_message(tr(message))
+        self.log_message(message)
+
+    def get_temporary_directory(self) -> str:
+        """Returns the directory of the stage outputs that are not saved,
+        created on first use and removed when the run finishes.
+
+        :returns: Temporary directory path
+        :rtype: str
+        """
+        if self.temporary_directory is None:
+            self.temporary_directory = tempfile.mkdtemp(prefix="cplus_")
+
+        return self.temporary_directory
+
+    def get_reference_layer(self):
+        """Get the path of the reference layer
+
+        Returns:
+            str|None: Return the path of the reference layer or None is it doesn't exist
+        """
+        snapping_enabled = self.get_settings_value(
+            Settings.SNAPPING_ENABLED, default=False, setting_type=bool
+        )
+        reference_layer = self.get_settings_value(Settings.SNAP_LAYER, default="")
+        reference_layer_path = Path(reference_layer)
+        if (
+            snapping_enabled
+            and os.path.exists(reference_layer)
+            and reference_layer_path.is_file()
+        ):
+            return reference_layer
+
+    def run(self):
+        """Runs the main scenario analysis task operations"""
+
+        BaseFileUtils.create_new_dir(self.scenario_directory)
+
+        selected_pathway = None
+        pathway_found = False
+
+        for activity in self.analysis_activities:
+            if pathway_found:
+                break
+            for pathway in activity.pathways:
+                if pathway is not None:
+                    pathway_found = True
+                    selected_pathway = pathway
+                    break
+
+        target_layer = QgsRasterLayer(selected_pathway.path, selected_pathway.name)
+
+        dest_crs = (
+            target_layer.crs()
+            if selected_pathway and selected_pathway.path
+            else QgsCoordinateReferenceSystem("EPSG:4326")
+        )
+
+        processing_extent = QgsRectangle(
+            float(self.analysis_extent.bbox[0]),
+            float(self.analysis_extent.bbox[2]),
+            float(self.analysis_extent.bbox[1]),
+            float(self.analysis_extent.bbox[3]),
+        )
+
+        snapped_extent = self.align_extent(target_layer, processing_extent)
+
+        extent_string = (
+            f"{snapped_extent.xMinimum()},{snapped_extent.xMaximum()},"
+            f"{snapped_extent.yMinimum()},{snapped_extent.yMaximum()}"
+            f" [{dest_crs.authid()}]"
+        )
+
+        self.log_message(
+            "Original area of interest extent: "
+            f"{processing_extent.asWktPolygon()} \n"
+        )
+        self.log_message(
+            "Snapped area of interest extent " f"{snapped_extent.asWktPolygon()} \n"
+        )
+        self.run_manifest = RunManifest.for_directory(self.scenario_directory)
+        self.run_manifest.set_config(self.task_config.to_dict())
+        self.record_pathway_signatures(self.analysis_activities)
+
+        self.resumed_manifest = self.load_resumed_manifest() if self.resuming else None
+        if self.resumed_manifest is not None:
+            # The checkpoint progress is kept until the outputs are restored
+            self.run_manifest.restore_progress(self.resumed_manifest)
+        self.run_manifest.save()
+
+        # Reuse the outputs of the previous run not affected by the changes
+        stage_activities = self.apply_previous_run(self.analysis_activities)
+
+        # Run pathways layers snapping using a specified reference layer
+
+        snapping_enabled = self.get_settings_value(
+            Settings.SNAPPING_ENABLED, default=False, setting_type=bool
+        )
+        reference_layer = self.get_reference_layer()
+        if (
+            snapping_enabled
+            and reference_layer
+            and stage_activities
+            and not self.resume_stage("snapping", stage_activities)
+        ):
+            with self.metrics.stage("snapping"):
+                result = self.snap_analysis_data(
+                    stage_activities,
+                    extent_string,
+                )
+            if result:
+                self.complete_stage("snapping")
+
+        fused_engine_enabled = self.get_settings_value(
+            Settings.FUSED_ENGINE_ENABLED, default=False, setting_type=bool
+        )
+        sieve_enabled = self.get_settings_value(
+            Settings.SIEVE_ENABLED, default=False, setting_type=bool
+        )
+
+        if fused_engine_enabled and sieve_enabled:
+            self.log_message(
+                "The fused raster engine does not support the sieve "
+                "function, running the analysis stages separately."
+            )
+        elif fused_engine_enabled:
+            # Activities cleaned before the interruption are not analysed again
+            for activity in stage_activities:
+                if self.resume_activity(activity, "cleaning"):
+                    self.reused_activities.add(str(activity.uuid))
+
+            with self.metrics.stage("fused"):
+                result = self.run_fused_analysis(
+                    self.analysis_activities,
+                    self.analysis_priority_layers_groups,
+                    snapped_extent,
+                    dest_crs,
+                )
+            if result:
+                self.complete_stage("fused")
+            return result and self.run_succeeded()
+
+        if stage_activities:
+            self.run_analysis_stages(stage_activities, extent_string, sieve_enabled)
+
+        # The highest position tool analysis
+        save_output = self.get_settings_value(
+            Settings.HIGHEST_POSITION, default=True, setting_type=bool
+        )
+        with self.metrics.stage("highest_position"):
+            result = self.run_highest_position_analysis(
+                temporary_output=not save_output
+            )
+        if result:
+            self.complete_stage("highest_position")
+
+        return self.run_succeeded()
+
+    def run_succeeded(self) -> bool:
+        """Returns whether the run completed, a stage error or a
+        cancellation of the run make it unsuccessful.
+
+        :returns: Whether the run completed
+        :rtype: bool
+        """
+        return self.error is None and not (self.cancelled or self.processing_cancelled)
+
+    def run_analysis_stages(
+        self,
+        activities: typing.List[Activity],
+        extent_string: str,
+        sieve_enabled: bool,
+    ):
+        """Runs the analysis stages that create the cleaned activities
+        layers from their pathways.
+
+        :param activities: List of the activities to be analysed
+        :type activities: typing.List[Activity]
+
+        :param extent_string: Snapped analysis extent
+        :type extent_string: str
+
+        :param sieve_enabled: Whether to run the sieve function
+        :type sieve_enabled: bool
+        """
+        # Weight the pathways using the pathway suitability index
+        # and priority group coefficients for the PWLs
+
+        save_output = self.get_settings_value(
+            Settings.NCS_WEIGHTED, default=True, setting_type=bool
+        )
+
+        if not self.resume_stage("weighting", activities):
+            with self.metrics.stage("weighting"):
+                result = self.run_pathways_weighting(
+                    activities,
+                    self.analysis_priority_layers_groups,
+                    extent_string,
+                    temporary_output=not save_output,
+                )
+            if result:
+                self.complete_stage("weighting")
+
+        # Creating activities from the weigghted pathways
+        save_output = self.get_settings_value(
+            Settings.LANDUSE_PROJECT, default=True, setting_type=bool
+        )
+
+        if not self.resume_stage("activity_sum", activities):
+            with self.metrics.stage("activity_sum"):
+                result = self.run_activities_analysis(
+                    activities,
+                    extent_string,
+                    temporary_output=not save_output,
+                )
+            if result:
+                self.complete_stage("activity_sum")
+
+        # Run masking of the activities layers
+        masking_layers = self.get_masking_layers()
+        self.log_message(f"Masking layers: {masking_layers}")
+
+        if masking_layers and not self.resume_stage("masking", activities):
+            with self.metrics.stage("masking"):
+                result = self.run_activities_masking(
+                    activities,
+                    masking_layers,
+                    extent_string,
+                )
+            if result:
+                self.complete_stage("masking")
+
+        # Run internal masking of the activities layers
+        if not self.resume_stage("internal_masking", activities):
+            with self.metrics.stage("internal_masking"):
+                result = self.run_internal_activities_masking(
+                    activities,
+                    extent_string,
+                )
+            if result:
+                self.complete_stage("internal_masking")
+
+        # TODO enable the sieve functionality
+        if sieve_enabled and not self.resume_stage("sieve", activities):
+            with self.metrics.stage("sieve"):
+                result = self.run_activities_sieve(
+                    activities,
+                )
+            if result:
+                self.complete_stage("sieve")
+
+        # Clean up activities
+        save_output = self.get_settings_value(
+            Settings.LANDUSE_NORMALIZED, default=True, setting_type=bool
+        )
+
+        if not self.resume_stage("cleaning", activities):
+            with self.metrics.stage("cleaning"):
+                result = self.run_activities_cleaning(
+                    activities,
+                    extent_string,
+                    temporary_output=not save_output,
+                )
+            if result:
+                self.complete_stage("cleaning")
+
+    def pathway_weighting_signature(
+        self, pathway: NcsPathway, suitability_index: float
+    ) -> dict:
+        """Returns the inputs that determine the weighted output of
+        the pathway.
+
+        :param pathway: Pathway
+        :type pathway: NcsPathway
+
+        :param suitability_index: Pathway suitability index
+        :type suitability_index: float
+
+        :returns: Pathway weighting signature
+        :rtype: dict
+        """
+        return {
+            "path": pathway.path,
+            "suitability_index": suitability_index,
+            "terms": [
+                [path, coefficient]
+                for path, coefficient in self.priority_layer_terms(
+                    pathway, self.analysis_priority_layers_groups
+                )
+            ],
+        }
+
+    def record_pathway_signatures(self, activities: typing.List[Activity]):
+        """Records the weighting signatures of the activities pathways
+        in the run manifest, before any of the stages updates them.
+
+        :param activities: List of the selected activities
+        :type activities: typing.List[Activity]
+        """
+        suitability_index = float(
+            self.get_settings_value(Settings.PATHWAY_SUITABILITY_INDEX, default=0)
+        )
+        for pathway in self.unique_pathways(activities):
+            self.run_manifest.set_pathway_signature(
+                str(pathway.uuid),
+                self.pathway_weighting_signature(pathway, suitability_index),
+            )
+
+    def apply_previous_run(
+        self, activities: typing.List[Activity]
+    ) -> typing.List[Activity]:
+        """Reuses the outputs of the previous run recorded in the
+        previous run directory setting.
+
+        When only the priority groups coefficients have changed, the
+        weighted pathways whose weighting inputs are unchanged and the
+        activities made of such pathways are taken from the previous run.
+
+        :param activities: List of the selected activities
+        :type activities: typing.List[Activity]
+
+        :returns: Activities that need to be analysed
+        :rtype: typing.List[Activity]
+        """
+        self.reused_pathways = set()
+        self.reused_activities = set()
+
+        previous_run_dir = self.get_settings_value(
+            Settings.PREVIOUS_RUN_DIR, default=""
+        )
+        if not previous_run_dir:
+            return activities
+
+        previous_manifest = RunManifest.load(previous_run_dir)
+        if previous_manifest is None:
+            self.log_message(
+                f"No run manifest found in {previous_run_dir}, "
+                f"running the full analysis."
+            )
+            return activities
+
+        if previous_manifest.data["config"] != self.run_manifest.data["config"]:
+            self.log_message(
+                "The analysis settings changed since the previous run, "
+                "running the full analysis."
+            )
+            return activities
+
+        changed_groups = previous_manifest.changed_priority_groups(
+            self.analysis_priority_layers_groups
+        )
+        self.log_message(f"Changed priority groups: {changed_groups} \n")
+
+        reused_pathways = {}
+        for pathway in self.unique_pathways(activities):
+            pathway_uuid = str(pathway.uuid)
+            previous_path = previous_manifest.pathway_path(pathway_uuid, "weighting")
+            if previous_path and previous_manifest.pathway_signature(
+                pathway_uuid
+            ) == self.run_manifest.pathway_signature(pathway_uuid):
+                reused_pathways[pathway_uuid] = previous_path
+
+        remaining_activities = []
+        for activity in activities:
+            activity_uuid = str(activity.uuid)
+            previous_path = previous_manifest.activity_path(activity_uuid, "cleaning")
+            if previous_path and all(
+                str(pathway.uuid) in reused_pathways for pathway in activity.pathways
+            ):
+                activity.path = previous_path
+                self.reused_activities.add(activity_uuid)
+                self.run_manifest.record_activity(
+                    activity_uuid, "cleaning", previous_path
+                )
+            else:
+                remaining_activities.append(activity)
+
+        for pathway in self.unique_pathways(remaining_activities):
+            pathway_uuid = str(pathway.uuid)
+            if pathway_uuid in reused_pathways:
+                pathway.path = reused_pathways[pathway_uuid]
+                self.reused_pathways.add(pathway_uuid)
+                self.run_manifest.record_pathway(
+                    pathway_uuid, "weighting", pathway.path
+                )
+
+        self.log_message(
+            f"Reusing {len(self.reused_activities)} activities and "
+            f"{len(self.reused_pathways)} weighted pathways from the previous "
+            f"run, analysing {len(remaining_activities)} activities \n"
+        )
+
+        return remaining_activities
+
+    def resume(self) -> bool:
+        """Resumes an interrupted run of the scenario using the checkpoint
+        manifest saved in the scenario directory. Completed stages are
+        skipped and the partially completed stage only processes the
+        pathways or activities without a recorded output.
+
+        :returns: Whether the task operations was successful
+        :rtype: bool
+        """
+        self.resuming = True
+        return self.run()
+
+    def load_resumed_manifest(self) -> typing.Union[RunManifest, None]:
+        """Loads the checkpoint manifest of the interrupted run, the
+        checkpoint is only used when it was created with the same settings.
+
+        :returns: Checkpoint manifest or None if the run cannot be resumed
+        :rtype: typing.Union[RunManifest, None]
+        """
+        manifest = RunManifest.load(self.scenario_directory)
+        if manifest is None:
+            self.log_message(
+                f"No checkpoint found in {self.scenario_directory}, "
+                f"running the full analysis."
+            )
+            return None
+
+        if manifest.data.get("settings") != self.run_manifest.data["settings"]:
+            self.log_message(
+                "The scenario settings changed since the interrupted run, "
+                "running the full analysis."
+            )
+            return None
+
+        self.log_message(
+            f"Resuming the scenario analysis, completed stages "
+            f"{manifest.data.get('completed_stages', [])} \n"
+        )
+
+        return manifest
+
+    def complete_stage(self, stage: str):
+        """Records the stage completion in the checkpoint manifest.
+
+        :param stage: Stage name
+        :type stage: str
+        """
+        self.run_manifest.complete_stage(stage)
+        self.run_manifest.save()
+
+    def checkpoint_pathway(self, pathway: NcsPathway, stage: str):
+        """Records the pathway stage output in the checkpoint manifest.
+
+        :param pathway: Pathway
+        :type pathway: NcsPathway
+
+        :param stage: Stage name
+        :type stage: str
+        """
+        self.run_manifest.record_pathway(str(pathway.uuid), stage, pathway.path)
+        if stage == "snapping":
+            self.run_manifest.record_pathway_priority_layers(
+                str(pathway.uuid), pathway.priority_layers
+            )
+        self.run_manifest.save()
+        self.metrics.item(pathway.uuid, pathway.name, pathway.path)
+
+    def checkpoint_activity(self, activity: Activity, stage: str):
+        """Records the activity stage output in the checkpoint manifest.
+
+        :param activity: Activity
+        :type activity: Activity
+
+        :param stage: Stage name
+        :type stage: str
+        """
+        self.run_manifest.record_activity(str(activity.uuid), stage, activity.path)
+        self.run_manifest.save()
+        self.metrics.item(activity.uuid, activity.name, activity.path)
+
+    def resume_pathway(self, pathway: NcsPathway, stage: str) -> bool:
+        """Restores the pathway output of the stage from the run being
+        resumed.
+
+        :param pathway: Pathway
+        :type pathway: NcsPathway
+
+        :param stage: Stage name
+        :type stage: str
+
+        :returns: Whether the pathway output was restored
+        :rtype: bool
+        """
+        if self.resumed_manifest is None:
+            return False
+
+        pathway_uuid = str(pathway.uuid)
+        path = self.resumed_manifest.pathway_path(pathway_uuid, stage)
+        if path is None:
+            return False
+
+        pathway.path = path
+        if stage == "snapping":
+            priority_layers = self.resumed_manifest.pathway_priority_layers(
+                pathway_uuid
+            )
+            if priority_layers is not None:
+                settings_paths = self.pathway_priority_layer_paths(pathway)
+                pathway.priority_layers = priority_layers
+                for priority_layer in priority_layers:
+                    layer_uuid = priority_layer.get("uuid")
+                    if layer_uuid in settings_paths:
+                        self.snapped_layers[
+                            (layer_uuid, settings_paths[layer_uuid])
+                        ] = priority_layer.get("path")
+
+        self.checkpoint_pathway(pathway, stage)
+
+        return True
+
+    def resume_activity(self, activity: Activity, stage: str) -> bool:
+        """Restores the activity output of the stage from the run being
+        resumed.
+
+        :param activity: Activity
+        :type activity: Activity
+
+        :param stage: Stage name
+        :type stage: str
+
+        :returns: Whether the activity output was restored
+        :rtype: bool
+        """
+        if self.resumed_manifest is None:
+            return False
+
+        path = self.resumed_manifest.activity_path(str(activity.uuid), stage)
+        if path is None:
+            return False
+
+        activity.path = path
+        self.checkpoint_activity(activity, stage)
+
+        return True
+
+    def resume_stage(self, stage: str, activities: typing.List[Activity]) -> bool:
+        """Restores all the outputs of a stage completed in the run being
+        resumed.
+
+        :param stage: Stage name
+        :type stage: str
+
+        :param activities: List of the analysed activities
+        :type activities: typing.List[Activity]
+
+        :returns: Whether the stage was completed and can be skipped
+        :rtype: bool
+        """
+        if self.resumed_manifest is None or not (
+            self.resumed_manifest.is_stage_completed(stage)
+        ):
+            return False
+
+        if stage in PATHWAY_STAGES:
+            restored = [
+                self.resume_pathway(pathway, stage)
+                for pathway in self.unique_pathways(activities)
+                if str(pathway.uuid) not in self.reused_pathways
+            ]
+        else:
+            restored = [
+                self.resume_activity(activity, stage) for activity in activities
+            ]
+
+        # Outputs removed since the interruption are created again
+        if not all(restored):
+            return False
+
+        self.log_message(f"Skipping the completed {stage} stage \n")
+        self.complete_stage(stage)
+
+        return True
+
+    def finished(self, result: bool):
+        """Calls the handler responsible for doing post analysis workflow.
+
+        :param result: Whether the run() operation finished successfully
+        :type result: bool
+        """
+        if result:
+            if self.scenario_result is not None:
+                self.scenario_result.analysis_output = self.output
+            self.log_message("Finished from the main task \n")
+        else:
+            self.log_message(f"Error from task scenario task {self.error}")
+
+        if self.temporary_directory is not None:
+            shutil.rmtree(self.temporary_directory, ignore_errors=True)
+            self.temporary_directory = None
+
+    def set_status_message(self, message):
+        """Handle when status message is updated.
+
+        :param message: status message
+        :type message: str
+        """
+        self.status_message = message
+        self.emit_event(ScenarioEventType.STATUS_MESSAGE, message=message)
+
+    def set_info_message(self, message, level=Qgis.Info):
+        """Handle when info message is updated.
+
+        :param message: message
+        :type message: str
+        :param level: severity level, defaults to Qgis.Info
+        :type level: int, optional
+        """
+        self.info_message = message
+        self.emit_event(ScenarioEventType.INFO_MESSAGE, message=message, level=level)
+
+    def set_custom_progress(self, value):
+        """Handle when progress value is updated.
+
+        :param value: progress value
+        :type value: float
+        """
+        self.custom_progress = value
+        self.emit_event(ScenarioEventType.PROGRESS, value=value)
+
+    def update_progress(self, value):
+        """Sets the value of the task progress
+
+        :param value: Value to be set on the progress bar
+        :type value: float
+        """
+        if not self.processing_cancelled:
+            self.set_custom_progress(value)
+        else:
+            self.feedback = QgsProcessingFeedback()
+            self.processing_context = QgsProcessingContext()
+
+    def align_extent(self, raster_layer, target_extent):
+        """Snaps the passed extent to the activities pathway layer pixel bounds
+
+        :param raster_layer: The target layer that the passed extent will be
+        aligned with
+        :type raster_layer: QgsRasterLayer
+
+        :param target_extent: Spatial extent that will be used a target extent when
+        doing alignment.
+        :type target_extent: QgsRectangle
+        """
+
+        try:
+            raster_extent = raster_layer.extent()
+
+            x_res = raster_layer.rasterUnitsPerPixelX()
+            y_res = raster_layer.rasterUnitsPerPixelY()
+
+            left = raster_extent.xMinimum() + x_res * math.floor(
+                (target_extent.xMinimum() - raster_extent.xMinimum()) / x_res
+            )
+            right = raster_extent.xMinimum() + x_res * math.ceil(
+                (target_extent.xMaximum() - raster_extent.xMinimum()) / x_res
+            )
+            bottom = raster_extent.yMinimum() + y_res * math.floor(
+                (target_extent.yMinimum() - raster_extent.yMinimum()) / y_res
+            )
+            top = raster_extent.yMaximum() - y_res * math.floor(
+                (raster_extent.yMaximum() - target_extent.yMaximum()) / y_res
+            )
+
+            return QgsRectangle(left, bottom, right, top)
+
+        except Exception as e:
+            self.log_message(
+                tr(
+                    f"Problem snapping area of "
+                    f"interest extent, using the original extent,"
+                    f"{str(e)}"
+                )
+            )
+
+        return target_extent
+
+    def replace_nodata(self, layer_path, output_path, nodata_value: float = -9999.0):
+        """Adds nodata value info into the layer available
+        in the passed layer_path and save the layer in the passed output_path
+        path.
+
+        The addition will replace any current nodata value available in
+        the input layer.
+
+        :param layer_path: Input layer path
+        :type layer_path: str
+
+        :param output_path: Output layer path
+        :type output_path: str
+
+        :param nodata_value: Nodata value to be used
+        :type output_path: int
+
+        :returns: Whether the task operations was successful
+        :rtype: bool
+
+        """
+        self.feedback = QgsProcessingFeedback()
+        self.feedback.progressChanged.connect(self.update_progress)
+
+        try:
+            alg_params = {
+                "COPY_SUBDATASETS": False,
+                "DATA_TYPE": 6,  # Float32
+                "EXTRA": "",
+                "INPUT": layer_path,
+                "NODATA": None,
+                "OPTIONS": "",
+                "TARGET_CRS": None,
+                "OUTPUT": QgsProcessing.TEMPORARY_OUTPUT,
+            }
+            translate_output = processing.run(
+                "gdal:translate",
+                alg_params,
+                context=self.processing_context,
+                feedback=self.feedback,
+                is_child_algorithm=True,
+            )
+
+            alg_params = {
+                "DATA_TYPE": 0,  # Use Input Layer Data Type
+                "EXTRA": "",
+                "INPUT": translate_output["OUTPUT"],
+                "MULTITHREADING": False,
+                "NODATA": nodata_value,
+                "OPTIONS": "",
+                "RESAMPLING": 0,  # Nearest Neighbour
+                "SOURCE_CRS": None,
+                "TARGET_CRS": None,
+                "TARGET_EXTENT": None,
+                "TARGET_EXTENT_CRS": None,
+                "TARGET_RESOLUTION": None,
+                "OUTPUT": output_path,
+            }
+            outputs = processing.run(
+                "gdal:warpreproject",
+                alg_params,
+                context=self.processing_context,
+                feedback=self.feedback,
+                is_child_algorithm=True,
+            )
+
+            return outputs is not None
+        except Exception as e:
+            self.log_message(
+                f"Problem replacing no data value from a snapping output, {e}"
+            )
+
+        return False
+
+    def run_pathways_weighting(
+        self,
+        activities: typing.List[Activity],
+        priority_layers_groups: dict,
+        extent: str,
+        temporary_output: bool = False,
+    ) -> bool:
+        """Runs weighting analysis on the pathways in the activities using
+        the corresponding NCS PWLs.
+
+        The formula is: (suitability_index * pathway) +
+        (priority group coefficient 1 * PWL 1) +
+        (priority group coefficient 2 * PWL 2) ...
+
+        :param activities: List of the selected activities
+        :type activities: typing.List[Activity]
+
+        :param priority_layers_groups: Used priority layers groups and their values
+        :type priority_layers_groups: dict
+
+        :param extent: selected extent from user
+        :type extent: str
+
+        :param temporary_output: Whether to save the processing outputs as temporary
+        files
+        :type temporary_output: bool
+
+        :returns: True if the task operation was successfully completed else False.
+        :rtype: bool
+        """
+        if self.processing_cancelled:
+            return False
+
+        self.set_status_message(tr("Weighting of pathways"))
+
+        if len(activities) == 0:
+            msg = tr("No defined activities for running pathways weighting.")
+            self.set_info_message(
+                msg,
+                level=Qgis.Critical,
+            )
+            self.log_message(msg)
+            return False
+
+        # Get valid pathways
+        pathways: typing.List[NcsPathway] = []
+        activities_paths = []
+
+        try:
+            # Validate activities and corresponding pathways
+            for activity in activities:
+                if not activity.pathways and (
+                    activity.path is None or activity.path == ""
+                ):
+                    self.set_info_message(
+                        tr(
+                            f"No defined activity pathways or an"
+                            f" activity layer for the activity {activity.name}"
+                        ),
+                        level=Qgis.Critical,
+                    )
+                    self.log_message(
+                        f"No defined activity pathways or an "
+                        f"activity layer for the activity {activity.name}"
+                    )
+                    return False
+
+                for pathway in activity.pathways:
+                    if pathway not in pathways:
+                        pathways.append(pathway)
+
+                if activity.path is not None and activity.path != "":
+                    activities_paths.append(activity.path)
+
+            if not pathways and len(activities_paths) > 0:
+                self.run_activities_analysis(activities, extent)
+                return False
+
+            suitability_index = float(
+                self.get_settings_value(Settings.PATHWAY_SUITABILITY_INDEX, default=0)
+            )
+
+            weighted_pathways_directory = os.path.join(
+                self.scenario_directory, "weighted_pathways"
+            )
+            BaseFileUtils.create_new_dir(weighted_pathways_directory)
+
+            if self.stage_backend(AnalysisStage.WEIGHT) == StageBackend.NUMPY:
+                return self.run_batched_pathways_weighting(
+                    pathways,
+                    priority_layers_groups,
+                    extent,
+                    weighted_pathways_directory,
+                    temporary_output,
+                )
+
+            for pathway in pathways:
+                # Skip processing if cancelled
+                if self.processing_cancelled:
+                    return False
+
+                # Weighted output reused from the previous run
+                if str(pathway.uuid) in self.reused_pathways:
+                    continue
+
+                if self.resume_pathway(pathway, "weighting"):
+                    continue
+
+                weighting_expression = self.pathway_expression(
+                    pathway, priority_layers_groups, suitability_index
+                )
+
+                # No need to run the calculation if the expression is the
+                # pathway layer itself.
+                if weighting_expression.is_identity(pathway.path):
+                    self.checkpoint_pathway(pathway, "weighting")
+                    continue
+
+                file_name = clean_filename(pathway.name.replace(" ", "_"))
+                output_file = os.path.join(
+                    weighted_pathways_directory,
+                    f"{file_name}_{str(uuid.uuid4())[:4]}.tif",
+                )
+                layers = weighting_expression.layers
+
+                output = (
+                    QgsProcessing.TEMPORARY_OUTPUT if temporary_output else output_file
+                )
+
+                # Actual processing calculation
+                alg_params = {
+                    "CELLSIZE": 0,
+                    "CRS": None,
+                    "EXTENT": extent,
+                    "OUTPUT": output,
+                }
+
+                cache_key, cached_path = self.cached_stage_output(
+                    "weighting",
+                    layers,
+                    {
+                        "COEFFICIENTS": weighting_expression.coefficients,
+                        "CONSTANT": weighting_expression.constant,
+                    },
+                    extent,
+                )
+                if cached_path:
+                    pathway.path = cached_path
+                    self.checkpoint_pathway(pathway, "weighting")
+                    continue
+
+                # Layers are bound to the expression by unique names
+                calculator_layers = self.raster_calculator_layers(
+                    layers, weighted_pathways_directory
+                )
+                alg_params["LAYERS"] = list(calculator_layers.values())
+                alg_params[
+                    "EXPRESSION"
+                ] = weighting_expression.raster_calculator_expression(
+                    {
+                        path: Path(calculator_path).stem
+                        for path, calculator_path in calculator_layers.items()
+                    }
+                )
+
+                self.log_message(
+                    f" Used parameters for calculating weighting pathways "
+                    f"{alg_params} \n"
+                )
+
+                self.feedback = QgsProcessingFeedback()
+                self.feedback.progressChanged.connect(self.update_progress)
+
+                if self.processing_cancelled:
+                    return False
+
+                results = processing.run(
+                    "qgis:rastercalculator",
+                    alg_params,
+                    context=self.processing_context,
+                    feedback=self.feedback,
+                )
+                pathway.path = self.cache_stage_output(cache_key, results["OUTPUT"])
+                self.checkpoint_pathway(pathway, "weighting")
+
+        except Exception as e:
+            self.log_message(f"Problem weighting pathways, {e}\n")
+            self.cancel_task(e)
+            return False
+
+        return True
+
+    def priority_layer_terms(
+        self, pathway: NcsPathway, priority_layers_groups: list
+    ) -> typing.List[typing.Tuple[str, float]]:
+        """Resolves the priority weighting layers terms used when
+        weighting the passed pathway, a PWL contributes one term for each
+        of its priority groups with a coefficient greater than zero.
+
+        :param pathway: Pathway to be weighted
+        :type pathway: NcsPathway
+
+        :param priority_layers_groups: Used priority layers groups and their values
+        :type priority_layers_groups: list
+
+        :returns: List of the PWL path and priority group coefficient terms
+        :rtype: typing.List[typing.Tuple[str, float]]
+        """
+        terms = []
+        settings_priority_layers = self.get_priority_layers()
+
+        for layer in pathway.priority_layers:
+            if not any(priority_layers_groups):
+                self.log_message(
+                    "There are no defined priority layers in groups,"
+                    " skipping the inclusion of PWLs in pathways "
+                    "weighting."
+                )
+                break
+
+            if layer is None:
+                continue
+
+            settings_layer = self.get_priority_layer(layer.get("uuid"))
+            if settings_layer is None:
+                continue
+
+            pwl = self.snapped_layers.get(
+                (layer.get("uuid"), settings_layer.get("path")),
+                settings_layer.get("path"),
+            )
+
+            missing_pwl_message = (
+                f"Path {pwl} for priority "
+                f"weighting layer {layer.get('name')} "
+                f"doesn't exist, skipping the layer "
+                f"from the pathway {pathway.name} weighting."
+            )
+            if pwl is None or pwl == "":
+                self.log_message(missing_pwl_message)
+                continue
+
+            if not Path(pwl).exists():
+                self.log_message(missing_pwl_message)
+                continue
+
+            for priority_layer in settings_priority_layers:
+                if priority_layer.get("name") == layer.get("name"):
+                    for group in priority_layer.get("groups", []):
+                        value = group.get("value")
+                        priority_group_coefficient = float(value)
+                        if priority_group_coefficient > 0:
+                            terms.append((pwl, priority_group_coefficient))
+
+        return terms
+
+    def snap_analysis_data(self, activities: typing.List[Activity], extent: str):
+        """Snaps the passed activities pathways, carbon layers and priority
+        layers to align with the reference layer set on the settings
+        manager.
+
+        :param activities: List of the selected activities
+        :type activities: typing.List[Activity]
+
+        :param extent: The selected extent from user
+        :type extent: list
+        """
+        if self.processing_cancelled:
+            # Will not proceed if processing has been cancelled by the user
+            return False
+
+        self.set_status_message(
+            tr(
+                "Snapping the selected activity pathways, "
+                "carbon layers and priority layers"
+            )
+        )
+
+        pathways: typing.List[NcsPathway] = []
+
+        try:
+            for activity in activities:
+                if not activity.pathways and (
+                    activity.path is None or activity.path == ""
+                ):
+                    self.set_info_message(
+                        tr(
+                            f"No defined activity pathways or a"
+                            f" activity layer for the activity {activity.name}"
+                        ),
+                        level=Qgis.Critical,
+                    )
+                    self.log_message(
+                        f"No defined activity pathways or a "
+                        f"activity layer for the activity {activity.name}"
+                    )
+                    return False
+
+                for pathway in activity.pathways:
+                    if not (pathway in pathways):
+                        pathways.append(pathway)
+
+            reference_layer_path = self.get_settings_value(Settings.SNAP_LAYER)
+            rescale_values = self.get_settings_value(
+                Settings.RESCALE_VALUES, default=False, setting_type=bool
+            )
+
+            resampling_method = self.get_settings_value(
+                Settings.RESAMPLING_METHOD, default=0
+            )
+
+            if pathways is not None and len(pathways) > 0:
+                snapped_pathways_directory = os.path.join(
+                    self.scenario_directory, "pathways"
+                )
+                snapped_priority_directory = os.path.join(
+                    self.scenario_directory, "priority_layers"
+                )
+
+                # Distinct pathways and priority layers to be snapped
+                snap_pathways = []
+                snap_inputs = {}
+                for pathway in pathways:
+                    if str(pathway.uuid) in self.reused_pathways:
+                        continue
+
+                    if self.resume_pathway(pathway, "snapping"):
+                        continue
+
+                    snap_pathways.append(pathway)
+                    if pathway.path not in snap_inputs:
+                        snap_inputs[pathway.path] = (
+                            snapped_pathways_directory,
+                            self.layer_nodata_value(pathway.path),
+                        )
+
+                    for (
+                        layer_uuid,
+                        priority_layer_path,
+                    ) in self.pathway_priority_layer_paths(pathway).items():
+                        # Layers shared by pathways are snapped once per run
+                        if (layer_uuid, priority_layer_path) in self.snapped_layers:
+                            continue
+
+                        if priority_layer_path not in snap_inputs:
+                            snap_inputs[priority_layer_path] = (
+                                snapped_priority_directory,
+                                self.layer_nodata_value(priority_layer_path),
+                            )
+
+                self.log_message(
+                    f"Snapping {len(snap_inputs)} distinct layers of "
+                    f"{len(snap_pathways)} pathways \n"
+                )
+
+                snapped_paths = self.snap_layers(
+                    snap_inputs,
+                    reference_layer_path,
+                    extent,
+                    rescale_values,
+                    resampling_method,
+                )
+                if snapped_paths is None:
+                    return False
+
+                for pathway in snap_pathways:
+                    for (
+                        layer_uuid,
+                        priority_layer_path,
+                    ) in self.pathway_priority_layer_paths(pathway).items():
+                        if priority_layer_path in snapped_paths:
+                            self.snapped_layers[
+                                (layer_uuid, priority_layer_path)
+                            ] = snapped_paths[priority_layer_path]
+
+                for pathway in snap_pathways:
+                    priority_layer_paths = self.pathway_priority_layer_paths(pathway)
+                    pathway.path = snapped_paths.get(pathway.path, pathway.path)
+
+                    priority_layers = []
+                    for priority_layer in pathway.priority_layers or []:
+                        if priority_layer is None:
+                            continue
+
+                        priority_layer_path = priority_layer_paths.get(
+                            priority_layer.get("uuid")
+                        )
+                        if priority_layer_path is None:
+                            if (
+                                self.get_priority_layer(priority_layer.get("uuid"))
+                                is not None
+                            ):
+                                priority_layers.append(priority_layer)
+                            continue
+
+                        priority_layer["path"] = self.snapped_layers.get(
+                            (priority_layer.get("uuid"), priority_layer_path),
+                            priority_layer_path,
+                        )
+                        priority_layers.append(priority_layer)
+
+                    if pathway.priority_layers:
+                        pathway.priority_layers = priority_layers
+
+                    self.checkpoint_pathway(pathway, "snapping")
+
+        except Exception as e:
+            self.log_message(f"Problem snapping layers, {e} \n")
+            self.log_message(traceback.format_exc())
+            self.cancel_task(e)
+            return False
+
+        return True
+
+    def layer_nodata_value(self, layer_path: str) -> float:
+        """Returns the no data value of the first band of the raster layer.
+
+        :param layer_path: Raster layer source
+        :type layer_path: str
+
+        :returns: No data value
+        :rtype: float
+        """
+        layer = QgsRasterLayer(layer_path, f"{str(uuid.uuid4())[:4]}")
+
+        return layer.dataProvider().sourceNoDataValue(1)
+
+    def pathway_priority_layer_paths(self, pathway: NcsPathway) -> dict:
+        """Returns the settings paths of the pathway priority layers that
+        exist on disk, by priority layer UUID.
+
+        :param pathway: Pathway
+        :type pathway: NcsPathway
+
+        :returns: Priority layers paths by UUID
+        :rtype: dict
+        """
+        paths = {}
+        for priority_layer in pathway.priority_layers or []:
+            if priority_layer is None:
+                continue
+
+            priority_layer_settings = self.get_priority_layer(
+                priority_layer.get("uuid")
+            )
+            if priority_layer_settings is None:
+                continue
+
+            priority_layer_path = priority_layer_settings.get("path")
+            if Path(priority_layer_path).exists():
+                paths[priority_layer.get("uuid")] = priority_layer_path
+
+        return paths
+
+    def snap_layers(
+        self,
+        inputs: typing.Dict[str, typing.Tuple[str, float]],
+        reference_path: str,
+        extent: str,
+        rescale_values: bool,
+        resampling_method: int,
+    ) -> typing.Union[typing.Dict[str, str], None]:
+        """Snaps all the passed layers onto the reference layer grid. The
+        snapping grid is computed once and the layers are warped in
+        parallel by the number of workers set in the settings.
+
+        :param inputs: Output directory and original no data value
+        of each input layer source
+        :type inputs: typing.Dict[str, typing.Tuple[str, float]]
+
+        :param reference_path: Reference layer source
+        :type reference_path: str
+
+        :param extent: Clip extent
+        :type extent: str
+
+        :param rescale_values: Whether to rescale pixel values
+        :type rescale_values: bool
+
+        :param resampling_method: Method to use when resampling
+        :type resampling_method: int
+
+        :returns: Snapped layer path of each input layer source or None
+        if the snapping was cancelled
+        :rtype: typing.Union[typing.Dict[str, str], None]
+        """
+        # QgsAlignRaster is used when rescaling, it computes its own grid
+        grid = (
+            self.snap_grid(reference_path, extent)
+            if self.warp_snapping(rescale_values)
+            else None
+        )
+
+        for directory, _ in set(inputs.values()):
+            BaseFileUtils.create_new_dir(directory)
+
+        def snap(input_path):
+            directory, nodata_value = inputs[input_path]
+            return self.snap_layer(
+                input_path=input_path,
+                reference_path=reference_path,
+                extent=extent,
+                directory=directory,
+                rescale_values=rescale_values,
+                resampling_method=resampling_method,
+                nodata_value=nodata_value,
+                grid=grid,
+            )
+
+        def snap_in_thread(input_path):
+            # The logs are returned with the snapped layer so that only
+            # the calling thread reports them.
+            self.thread_logs.messages = []
+            try:
+                return snap(input_path), self.thread_logs.messages
+            finally:
+                self.thread_logs.messages = None
+
+        workers = 1
+        if grid is not None:
+            workers = max(
+                int(
+                    self.get_settings_value(
+                        Settings.PARALLEL_WORKERS,
+                        default=DEFAULT_VALUES.parallel_workers,
+                    )
+                ),
+                1,
+            )
+
+        snapped_paths = {}
+        if workers == 1:
+            for input_path in inputs:
+                if self.processing_cancelled:
+                    return None
+
+                snapped_paths[input_path] = snap(input_path)
+                self.update_progress(100.0 * len(snapped_paths) / len(inputs))
+
+            return snapped_paths
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(snap_in_thread, input_path): input_path
+                for input_path in inputs
+            }
+            for future in concurrent.futures.as_completed(futures):
+                if self.processing_cancelled:
+                    for pending in futures:
+                        pending.cancel()
+                    return None
+
+                snapped_path, logs = future.result()
+                for log in logs:
+                    self.log_message(*log)
+
+                snapped_paths[futures[future]] = snapped_path
+                self.update_progress(100.0 * len(snapped_paths) / len(inputs))
+
+        return snapped_paths
+
+    def snap_layer(
+        self,
+        input_path: str,
+        reference_path: str,
+        extent: str,
+        directory: str,
+        rescale_values: bool,
+        resampling_method: int,
+        nodata_value: float = -9999.0,
+        grid: RasterGrid = None,
+    ):
+        """Snaps the passed input layer using the reference layer and updates
+        the snap output no data value to be the same as the original input layer
+        no data value.
+
+        :param input_path: Input layer source
+        :type input_path: str
+
+        :param reference_path: Reference layer source
+        :type reference_path: str
+
+        :param extent: Clip extent
+        :type extent: list
+
+        :param directory: Absolute path of the output directory for the snapped
+        layers
+        :type directory: str
+
+        :param rescale_values: Whether to rescale pixel values
+        :type rescale_values: bool
+
+        :param resample_method: Method to use when resampling
+        :type resample_method: QgsAlignRaster.ResampleAlg
+
+        :param nodata_value: Original no data value of the input layer
+        :type nodata_value: float
+
+        :param grid: Snapping grid, computed from the reference layer
+        and extent when not set
+        :type grid: RasterGrid
+
+        :returns: Snapped layer path or the input path if the snapping failed
+        :rtype: str
+        """
+        cache_key, cached_path = self.cached_stage_output(
+            "snap",
+            [input_path, reference_path],
+            {
+                "rescale_values": rescale_values,
+                "resampling_method": resampling_method,
+                "nodata_value": nodata_value,
+                **self.snap_options(),
+            },
+            extent,
+        )
+        if cached_path:
+            return cached_path
+
+        if grid is None:
+            grid = self.snap_grid(reference_path, extent)
+
+        # Layers already on the grid are used without being rewritten
+        aligned_path = self.aligned_layer(input_path, grid, directory, nodata_value)
+        if aligned_path:
+            return aligned_path
+
+        warping = self.warp_snapping(rescale_values)
+        store_key, stored_path = self.stored_snapped_layer(
+            input_path,
+            reference_path,
+            extent,
+            grid if warping else None,
+            rescale_values,
+            resampling_method,
+            nodata_value,
+        )
+        if stored_path:
+            return stored_path
+
+        if warping:
+            output_path = self.warp_layer(
+                input_path,
+                grid,
+                directory,
+                resampling_method,
+                nodata_value,
+            )
+            if output_path is None:
+                return input_path
+
+            return self.store_snapped_layer(
+                store_key, self.cache_stage_output(cache_key, output_path)
+            )
+
+        input_result_path, logs = align_rasters(
+            input_path,
+            reference_path,
+            extent,
+            directory,
+            rescale_values,
+            resampling_method,
+        )
+        for log in logs:
+            self.log_message(log, info=("Problem" not in log))
+
+        output_path = input_path
+
+        if input_result_path is not None:
+            result_path = Path(input_result_path)
+
+            directory = result_path.parent
+            name = result_path.stem
+
+            output_path = os.path.join(directory, f"{name}_final.tif")
+
+            if self.replace_nodata(input_result_path, output_path, nodata_value):
+                output_path = self.store_snapped_layer(
+                    store_key, self.cache_stage_output(cache_key, output_path)
+                )
+
+        return output_path
+
+    def warp_snapping(self, rescale_values: bool) -> bool:
+        """Returns whether the layers are snapped with a GDAL warp, the
+        processing backend and the values rescaling use QgsAlignRaster.
+
+        :param rescale_values: Whether to rescale pixel values
+        :type rescale_values: bool
+
+        :returns: Whether to warp the layers
+        :rtype: bool
+        """
+        return (
+            not rescale_values
+            and self.stage_backend(AnalysisStage.SNAP) == StageBackend.GDAL
+        )
+
+    def aligned_layer(
+        self,
+        input_path: str,
+        grid: RasterGrid,
+        directory: str,
+        nodata_value: float,
+    ) -> typing.Union[str, None]:
+        """Checks from its header whether the input layer is already on
+        the snapping grid with the expected no data value. Such a layer
+        is passed through when it matches the grid exactly, or exposed as
+        a virtual raster of the grid window when it covers a larger area.
+
+        :param input_path: Input layer source
+        :type input_path: str
+
+        :param grid: Snapping grid
+        :type grid: RasterGrid
+
+        :param directory: Absolute path of the output directory for the snapped
+        layers
+        :type directory: str
+
+        :param nodata_value: Original no data value of the input layer
+        :type nodata_value: float
+
+        :returns: Path of the aligned layer or None if the layer
+        needs to be snapped
+        :rtype: typing.Union[str, None]
+        """
+        try:
+            offsets = aligned_offsets(input_path, grid, nodata_value)
+            if offsets is None:
+                return None
+
+            # Read with GDAL as the layers are checked in the snapping threads
+            if offsets == (0, 0) and raster_size(input_path) == (
+                grid.width,
+                grid.height,
+            ):
+                self.log_message(
+                    f"Layer {input_path} is already aligned with the "
+                    f"reference layer, skipping snapping \n"
+                )
+                return input_path
+
+            snap_directory = os.path.join(directory, "snap_layers")
+            BaseFileUtils.create_new_dir(snap_directory)
+
+            output_path = window_vrt(
+                input_path,
+                offsets,
+                grid,
+                os.path.join(
+                    snap_directory,
+                    f"{Path(input_path).stem}_{str(uuid.uuid4())[:4]}.vrt",
+                ),
+            )
+        except Exception as e:
+            self.log_message(f"Problem checking the alignment of {input_path}, {e}")
+            return None
+
+        self.log_message(
+            f"Layer {input_path} is already aligned with the reference "
+            f"layer, using the virtual raster {output_path} \n"
+        )
+
+        return output_path
+
+    def snap_grid(self, reference_path: str, extent: str) -> RasterGrid:
+        """Returns the grid of the reference layer pixels covering the
+        clip extent.
+
+        :param reference_path: Reference layer source
+        :type reference_path: str
+
+        :param extent: Clip extent
+        :type extent: str
+
+        :returns: Snapping grid
+        :rtype: RasterGrid
+        """
+        extent_rectangle, extent_crs = self.extent_rectangle(extent)
+        reference_layer = QgsRasterLayer(reference_path, "reference")
+        snap_extent = transform_extent(
+            extent_rectangle, extent_crs, reference_layer.crs()
+        )
+
+        return reference_grid(
+            reference_path,
+            (
+                snap_extent.xMinimum(),
+                snap_extent.yMinimum(),
+                snap_extent.xMaximum(),
+                snap_extent.yMaximum(),
+            ),
+        )
+
+    def warp_layer(
+        self,
+        input_path: str,
+        grid: RasterGrid,
+        directory: str,
+        resampling_method: int,
+        nodata_value: float = -9999.0,
+    ) -> typing.Union[str, None]:
+        """Snaps the input layer onto the grid in a single warp, which
+        aligns and clips the layer and sets its no data value.
+
+        :param input_path: Input layer source
+        :type input_path: str
+
+        :param grid: Snapping grid
+        :type grid: RasterGrid
+
+        :param directory: Absolute path of the output directory for the snapped
+        layers
+        :type directory: str
+
+        :param resampling_method: Method to use when resampling
+        :type resampling_method: int
+
+        :param nodata_value: Original no data value of the input layer
+        :type nodata_value: float
+
+        :returns: Snapped layer path or None if the snapping failed
+        :rtype: typing.Union[str, None]
+        """
+        warp_multithreading = self.get_settings_value(
+            Settings.WARP_MULTITHREADING, default=False, setting_type=bool
+        )
+
+        try:
+            snap_directory = os.path.join(directory, "snap_layers")
+            BaseFileUtils.create_new_dir(snap_directory)
+
+            output_path = os.path.join(
+                snap_directory,
+                f"{Path(input_path).stem}_{str(uuid.uuid4())[:4]}_final.tif",
+            )
+            warp_to_grid(
+                input_path,
+                grid,
+                output_path,
+                resample_alg=int(resampling_method),
+                nodata=nodata_value,
+                multithreading=warp_multithreading,
+            )
+        except Exception as e:
+            self.log_message(
+                f"Problem occured when snapping {input_path}, {e}."
+                f" Update snap settings and re-run the analysis"
+            )
+            self.log_message(traceback.format_exc())
+            return None
+
+        self.log_message(
+            f"Finished snapping"
+            f" original layer - {input_path},"
+            f"snapped output - {output_path} \n"
+        )
+
+        return output_path
+
+    def run_activities_analysis(
+        self,
+        activities: typing.List[Activity],
+        extent: str,
+        temporary_output: bool = False,
+    ):
+        """Runs the required activity analysis on the passed
+        activities pathways. The analysis is responsible for creating
+        activities layers from their respective pathways layers.
+
+        :param activities: List of the selected activities
+        :type activities: typing.List[Activity]
+
+        :param extent: selected extent from user
+        :type extent: SpatialExtent
+
+        :param temporary_output: Whether to save the processing outputs as
+        temporary
+        files
+        :type temporary_output: bool
+
+        :returns: Whether the task operations was successful
+        :rtype: bool
+        """
+        if self.processing_cancelled:
+            # Will not proceed if processing has been cancelled by the user
+            return False
+
+        self.set_status_message(tr("Creating activity layers from pathways"))
+
+        try:
+            for activity in activities:
+                if self.resume_activity(activity, "activity_sum"):
+                    continue
+
+                activities_directory = os.path.join(
+                    self.scenario_directory, "activities"
+                )
+                BaseFileUtils.create_new_dir(activities_directory)
+                file_name = clean_filename(activity.name.replace(" ", "_"))
+
+                layers = []
+                if not activity.pathways and (
+                    activity.path is None or activity.path == ""
+                ):
+                    self.set_info_message(
+                        tr(
+                            f"No defined activity pathways or a"
+                            f" activity layer for the activity {activity.name}"
+                        ),
+                        level=Qgis.Critical,
+                    )
+                    self.log_message(
+                        f"No defined activity pathways or an "
+                        f"activity layer for the activity {activity.name}"
+                    )
+
+                    return False
+
+                output_file = os.path.join(
+                    activities_directory, f"{file_name}_{str(uuid.uuid4())[:4]}.tif"
+                )
+
+                # Due to the activities base class
+                # activity only one of the following blocks will be executed,
+                # the activity either contain a path or
+                # pathways
+
+                if activity.path is not None and activity.path != "":
+                    layers = [activity.path]
+
+                for pathway in activity.pathways:
+                    layers.append(pathway.path)
+
+                output = (
+                    QgsProcessing.TEMPORARY_OUTPUT if temporary_output else output_file
+                )
+
+                # Actual processing calculation
+                reference_layer = self.get_reference_layer()
+                if (reference_layer is None or reference_layer == "") and len(
+                    layers
+                ) > 0:
+                    reference_layer = layers[0]
+                alg_params = {
+                    "IGNORE_NODATA": True,
+                    "INPUT": layers,
+                    "EXTENT": extent,
+                    "OUTPUT_NODATA_VALUE": -9999,
+                    "REFERENCE_LAYER": reference_layer,
+                    "STATISTIC": 0,  # Sum
+                    "OUTPUT": output,
+                }
+
+                numpy_sum = self.stage_backend(AnalysisStage.SUM) == StageBackend.NUMPY
+                # A saved activity sum keeps its raw values, the cleaning
+                # is only done in the same pass when the sum is temporary.
+                clean_zeros = (
+                    numpy_sum and temporary_output and self.sum_cleaning(activity)
+                )
+
+                cache_key, cached_path = self.cached_stage_output(
+                    "activity_sum",
+                    layers,
+                    {
+                        "IGNORE_NODATA": True,
+                        "OUTPUT_NODATA_VALUE": 0 if clean_zeros else -9999,
+                        "STATISTIC": 0,
+                        "CLEAN_ZEROS": clean_zeros,
+                    },
+                    extent,
+                )
+                if cached_path:
+                    activity.path = cached_path
+                    if clean_zeros:
+                        self.cleaned_activities.add(str(activity.uuid))
+                    self.checkpoint_activity(activity, "activity_sum")
+                    continue
+
+                if numpy_sum:
+                    if clean_zeros:
+                        # Written where the cleaning stage saves its outputs
+                        save_cleaned = self.get_settings_value(
+                            Settings.LANDUSE_NORMALIZED,
+                            default=True,
+                            setting_type=bool,
+                        )
+                        output_file = os.path.join(
+                            (
+                                self.scenario_directory
+                                if save_cleaned
+                                else self.get_temporary_directory()
+                            ),
+                            f"{file_name}_{str(uuid.uuid4())[:4]}_cleaned.tif",
+                        )
+                    elif temporary_output:
+                        output_file = os.path.join(
+                            self.get_temporary_directory(),
+                            os.path.basename(output_file),
+                        )
+                    extent_rectangle, crs = self.extent_rectangle(extent)
+                    output_file = cell_sum(
+                        layers,
+                        self.analysis_grid(layers[0], extent_rectangle, crs),
+                        output_file,
+                        output_nodata=0 if clean_zeros else NO_DATA_VALUE,
+                        clean_zeros=clean_zeros,
+                        statistics=self.gather_statistics(),
+                    )
+                    activity.path = self.cache_stage_output(cache_key, output_file)
+                    if clean_zeros:
+                        self.cleaned_activities.add(str(activity.uuid))
+                    self.checkpoint_activity(activity, "activity_sum")
+                    continue
+
+                self.log_message(
+                    f"Used parameters for activities generation: " f"{alg_params} \n"
+                )
+
+                feedback = QgsProcessingFeedback()
+
+                feedback.progressChanged.connect(self.update_progress)
+
+                if self.processing_cancelled:
+                    return False
+
+                results = processing.run(
+                    "native:cellstatistics",
+                    alg_params,
+                    context=self.processing_context,
+                    feedback=self.feedback,
+                )
+                activity.path = self.cache_stage_output(cache_key, results["OUTPUT"])
+                self.checkpoint_activity(activity, "activity_sum")
+
+        except Exception as e:
+            self.log_message(f"Problem creating activity layers, {e}")
+            self.cancel_task(e)
+            return False
+
+        return True
+
+    def sum_cleaning(self, activity: Activity) -> bool:
+        """Returns whether the activity can be cleaned in the same pass
+        as its sum. This requires the NumPy backend for the cleaning and
+        no masking or sieve stage changing the activity between its sum
+        and its cleaning.
+
+        :param activity: Activity
+        :type activity: Activity
+
+        :returns: Whether to clean the activity when summing it
+        :rtype: bool
+        """
+        if self.stage_backend(AnalysisStage.CLEAN) != StageBackend.NUMPY:
+            return False
+
+        sieve_enabled = self.get_settings_value(
+            Settings.SIEVE_ENABLED, default=False, setting_type=bool
+        )
+
+        return not (sieve_enabled or self.get_masking_layers() or activity.mask_paths)
+
+    def run_activities_masking(
+        self, activities, masking_layers, extent, temporary_output=False
+    ):
+        """Applies the mask layers into the passed activities
+
+        :param activities: List of the selected activities
+        :type activities: typing.List[Activity]
+
+        :param masking_layers: Paths to the mask layers to be used
+        :type masking_layers: dict
+
+        :param extent: selected extent from user
+        :type extent: str
+
+        :param temporary_output: Whether to save the processing outputs as temporary
+        files
+        :type temporary_output: bool
+
+        :returns: Whether the task operations was successful
+        :rtype: bool
+        """
+        if self.processing_cancelled:
+            # Will not proceed if processing has been cancelled by the user
+            return False
+
+        self.set_status_message(tr("Masking activities using the saved masked layers"))
+
+        if self.stage_backend(AnalysisStage.MASK) == StageBackend.NUMPY:
+            return self.run_raster_masking(
+                activities,
+                extent,
+                "masking",
+                masking_layers=masking_layers,
+                temporary_output=temporary_output,
+            )
+
+        try:
+            if len(masking_layers) < 1:
+                return False
+
+            if len(masking_layers) > 1:
+                initial_mask_layer = self.merge_vector_layers(masking_layers)
+            else:
+                mask_layer_path = masking_layers[0]
+                initial_mask_layer = QgsVectorLayer(mask_layer_path, "mask", "ogr")
+
+            if not initial_mask_layer.isValid():
+                self.log_message(
+                    f"Skipping activities masking "
+                    f"using layer {mask_layer_path}, not a valid layer."
+                )
+                return False
+
+            # see https://qgis.org/pyqgis/master/core/Qgis.html#qgis.core.Qgis.GeometryType
+            if Qgis.versionInt() < 33000:
+                layer_check = initial_mask_layer.geometryType() == QgsWkbTypes.Polygon
+                layer_check = (
+                    initial_mask_layer.geometryType() == QgsWkbTypes.PolygonGeometry
+                )
+            else:
+                layer_check = (
+                    initial_mask_layer.geometryType() == Qgis.GeometryType.Polygon
+                )
+
+            if not layer_check:
+                self.log_message(
+                    f"Skipping activities masking "
+                    f"using layer {mask_layer_path}, not a polygon layer."
+                )
+                return False
+
+            extent_layer = self.layer_extent(extent)
+            mask_layer = self.mask_layer_difference(initial_mask_layer, extent_layer)
+
+            if isinstance(mask_layer, str):
+                mask_layer = QgsVectorLayer(mask_layer, "ogr")
+
+            if not mask_layer.isValid():
+                self.log_message(
+                    f"Skipping activities masking "
+                    f"the created difference mask layer {mask_layer.source()},"
+                    f" not a valid layer."
+                )
+                return False
+
+            for activity in activities:
+                if self.resume_activity(activity, "masking"):
+                    continue
+
+                if activity.path is None or activity.path == "":
+                    if not self.processing_cancelled:
+                        self.set_info_message(
+                            tr(
+                                f"Problem when masking activities, "
+                                f"there is no map layer for the activity {activity.name}"
+                            ),
+                            level=Qgis.Critical,
+                        )
+                        self.log_message(
+                            f"Problem when masking activities, "
+                            f"there is no map layer for the activity {activity.name}"
+                        )
+                    else:
+                        # If the user cancelled the processing
+                        self.set_info_message(
+                            tr(f"Processing has been cancelled by the user."),
+                            level=Qgis.Critical,
+                        )
+                        self.log_message(f"Processing has been cancelled by the user.")
+
+                    return False
+
+                masked_activities_directory = os.path.join(
+                    self.scenario_directory, "masked_activities"
+                )
+                BaseFileUtils.create_new_dir(masked_activities_directory)
+                file_name = clean_filename(activity.name.replace(" ", "_"))
+
+                output_file = os.path.join(
+                    masked_activities_directory,
+                    f"{file_name}_{str(uuid.uuid4())[:4]}.tif",
+                )
+
+                output = (
+                    QgsProcessing.TEMPORARY_OUTPUT if temporary_output else output_file
+                )
+
+                cache_key, cached_path = self.cached_stage_output(
+                    "masking",
+                    [activity.path] + list(masking_layers),
+                    {"NO_DATA": -9999},
+                    extent,
+                )
+                if cached_path:
+                    activity.path = cached_path
+                    self.checkpoint_activity(activity, "masking")
+                    continue
+
+                activity_layer = QgsRasterLayer(activity.path, "activity_layer")
+
+                # Actual processing calculation
+                alg_params = {
+                    "INPUT": activity.path,
+                    "MASK": mask_layer,
+                    "SOURCE_CRS": activity_layer.crs(),
+                    "DESTINATION_CRS": activity_layer.crs(),
+                    "TARGET_EXTENT": extent,
+                    "OUTPUT": output,
+                    "NO_DATA": -9999,
+                }
+
+                self.log_message(
+                    f"Used parameters for masking the activities: {alg_params} \n"
+                )
+
+                feedback = QgsProcessingFeedback()
+
+                feedback.progressChanged.connect(self.update_progress)
+
+                if self.processing_cancelled:
+                    return False
+
+                results = processing.run(
+                    "gdal:cliprasterbymasklayer",
+                    alg_params,
+                    context=self.processing_context,
+                    feedback=self.feedback,
+                )
+                activity.path = self.cache_stage_output(cache_key, results["OUTPUT"])
+                self.checkpoint_activity(activity, "masking")
+
+        except Exception as e:
+            self.log_message(f"Problem masking activities layers, {e} \n")
+            self.cancel_task(e)
+            return False
+
+        return True
+
+    def run_internal_activities_masking(
+        self, activities, extent, temporary_output=False
+    ):
+        """Applies the mask layers into the passed activities
+
+        :param activities: List of the selected activities
+        :type activities: typing.List[Activity]
+
+        :param extent: selected extent from user
+        :type extent: str
+
+        :param temporary_output: Whether to save the processing outputs as temporary
+        files
+        :type temporary_output: bool
+
+        :returns: Whether the task operations was successful
+        :rtype: bool
+        """
+        if self.processing_cancelled:
+            # Will not proceed if processing has been cancelled by the user
+            return False
+
+        self.set_status_message(
+            tr("Masking activities using their respective mask layers.")
+        )
+
+        if self.stage_backend(AnalysisStage.MASK) == StageBackend.NUMPY:
+            return self.run_raster_masking(
+                activities,
+                extent,
+                "internal_masking",
+                temporary_output=temporary_output,
+            )
+
+        try:
+            for activity in activities:
+                if self.resume_activity(activity, "internal_masking"):
+                    continue
+
+                masking_layers = activity.mask_paths
+
+                if len(masking_layers) < 1:
+                    self.log_message(
+                        f"Skipping activity masking "
+                        f"No mask layer(s) for activity {activity.name}"
+                    )
+                    self.checkpoint_activity(activity, "internal_masking")
+                    continue
+                mask_layer = self.prepared_mask_layer(masking_layers, extent)
+                if mask_layer is None:
+                    continue
+
+                if activity.path is None or activity.path == "":
+                    if not self.processing_cancelled:
+                        self.set_info_message(
+                            tr(
+                                f"Problem when masking activity, "
+                                f"there is no map layer for the activity {activity.name}"
+                            ),
+                            level=Qgis.Critical,
+                        )
+                        self.log_message(
+                            f"Problem when masking activity, "
+                            f"there is no map layer for the activity {activity.name}"
+                        )
+                    else:
+                        # If the user cancelled the processing
+                        self.set_info_message(
+                            tr(f"Processing has been cancelled by the user."),
+                            level=Qgis.Critical,
+                        )
+                        self.log_message(f"Processing has been cancelled by the user.")
+
+                    continue
+
+                masked_activities_directory = os.path.join(
+                    self.scenario_directory, "final_masked_activities"
+                )
+                BaseFileUtils.create_new_dir(masked_activities_directory)
+                file_name = clean_filename(activity.name.replace(" ", "_"))
+
+                output_file = os.path.join(
+                    masked_activities_directory,
+                    f"{file_name}_{str(uuid.uuid4())[:4]}.tif",
+                )
+
+                output = (
+                    QgsProcessing.TEMPORARY_OUTPUT if temporary_output else output_file
+                )
+
+                activity_layer = QgsRasterLayer(activity.path, "activity_layer")
+
+                if activity_layer.crs() != mask_layer.crs():
+                    self.log_message(
+                        f"Skipping masking, activity layer and"
+                        f" mask layer(s) have different CRS"
+                    )
+                    continue
+
+                if not activity_layer.extent().intersects(mask_layer.extent()):
+                    self.log_message(
+                        "Skipping masking, the extents of the activity layer "
+                        "and mask layers do not overlap."
+                    )
+                    continue
+
+                cache_key, cached_path = self.cached_stage_output(
+                    "internal_masking",
+                    [activity.path] + list(masking_layers),
+                    {"NO_DATA": -9999},
+                    extent,
+                )
+                if cached_path:
+                    activity.path = cached_path
+                    self.checkpoint_activity(activity, "internal_masking")
+                    continue
+
+                # Actual processing calculation
+                alg_params = {
+                    "INPUT": activity.path,
+                    "MASK": mask_layer,
+                    "SOURCE_CRS": activity_layer.crs(),
+                    "DESTINATION_CRS": activity_layer.crs(),
+                    "TARGET_EXTENT": extent,
+                    "OUTPUT": output,
+                    "NO_DATA": -9999,
+                }
+
+                self.log_message(
+                    f"Used parameters for masking the activity {activity.name}: {alg_params} \n"
+                )
+
+                feedback = QgsProcessingFeedback()
+
+                feedback.progressChanged.connect(self.update_progress)
+
+                if self.processing_cancelled:
+                    return False
+
+                results = processing.run(
+                    "gdal:cliprasterbymasklayer",
+                    alg_params,
+                    context=self.processing_context,
+                    feedback=self.feedback,
+                )
+                activity.path = self.cache_stage_output(cache_key, results["OUTPUT"])
+                self.checkpoint_activity(activity, "internal_masking")
+
+        except Exception as e:
+            self.log_message(f"Problem masking activities layers, {e} \n")
+            self.cancel_task(e)
+
+            return False
+
+        return True
+
+    def prepared_mask_layer(
+        self, masking_layers: typing.List[str], extent: str
+    ) -> typing.Union[QgsVectorLayer, None]:
+        """Returns the mask layer used to clip the activities, the
+        difference between the merged mask layers and the extent.
+
+        The layer is prepared once per run for each set of mask layers
+        and extent, activities sharing the same mask layers reuse it.
+
+        :param masking_layers: Mask layers paths
+        :type masking_layers: typing.List[str]
+
+        :param extent: Selected extent from user
+        :type extent: str
+
+        :returns: Prepared mask layer or None if the mask layers
+        can not be used
+        :rtype: typing.Union[QgsVectorLayer, None]
+        """
+        key = (tuple(sorted(masking_layers)), extent)
+        if key not in self.prepared_masks:
+            self.prepared_masks[key] = self.prepare_mask_layer(masking_layers, extent)
+        else:
+            self.log_message(f"Reusing the prepared mask of layers {masking_layers} \n")
+
+        return self.prepared_masks[key]
+
+    def prepare_mask_layer(
+        self, masking_layers: typing.List[str], extent: str
+    ) -> typing.Union[QgsVectorLayer, None]:
+        """Merges the mask layers, checks them against the extent and
+        computes their difference with the extent.
+
+        :param masking_layers: Mask layers paths
+        :type masking_layers: typing.List[str]
+
+        :param extent: Selected extent from user
+        :type extent: str
+
+        :returns: Mask layer or None if the mask layers can not be used
+        :rtype: typing.Union[QgsVectorLayer, None]
+        """
+        if len(masking_layers) > 1:
+            initial_mask_layer = self.merge_vector_layers(masking_layers)
+        else:
+            initial_mask_layer = QgsVectorLayer(masking_layers[0], "mask", "ogr")
+
+        if isinstance(initial_mask_layer, str):
+            initial_mask_layer = QgsVectorLayer(initial_mask_layer, "mask", "ogr")
+
+        if initial_mask_layer is None or not initial_mask_layer.isValid():
+            self.log_message(
+                f"Skipping activity masking "
+                f"using layers {masking_layers}, not a valid layer."
+            )
+            return None
+
+        # see https://qgis.org/pyqgis/master/core/Qgis.html#qgis.core.Qgis.GeometryType
+        if Qgis.versionInt() < 33000:
+            layer_check = (
+                initial_mask_layer.geometryType() == QgsWkbTypes.PolygonGeometry
+            )
+        else:
+            layer_check = initial_mask_layer.geometryType() == Qgis.GeometryType.Polygon
+
+        if not layer_check:
+            self.log_message(
+                f"Skipping activity masking "
+                f"using layers {masking_layers}, not a polygon layer."
+            )
+            return None
+
+        extent_layer = self.layer_extent(extent)
+
+        if extent_layer.crs() != initial_mask_layer.crs():
+            self.log_message(
+                f"Skipping masking, the mask layers crs ({initial_mask_layer.crs().authid()})"
+                f" do not match the scenario crs ({extent_layer.crs().authid()})."
+            )
+            return None
+
+        if not extent_layer.extent().intersects(initial_mask_layer.extent()):
+            self.log_message(
+                "Skipping masking, the mask layers extent"
+                " and the scenario extent do not overlap."
+            )
+            return None
+
+        mask_layer = self.mask_layer_difference(initial_mask_layer, extent_layer)
+
+        if isinstance(mask_layer, str):
+            mask_layer = QgsVectorLayer(mask_layer, "ogr")
+
+        if not mask_layer.isValid():
+            self.log_message(
+                f"Skipping activity masking "
+                f"the created difference mask layer {mask_layer.source()},"
+                f"is not a valid layer."
+            )
+            return None
+
+        return mask_layer
+
+    def mask_raster(self, mask_paths: typing.List[str], grid: RasterGrid) -> str:
+        """Returns the raster of the mask layers burned onto the grid, each
+        set of mask layers is burned once per run.
+
+        :param mask_paths: Mask layers paths
+        :type mask_paths: typing.List[str]
+
+        :param grid: Analysis grid
+        :type grid: RasterGrid
+
+        :returns: Path of the mask raster
+        :rtype: str
+        """
+        key = (tuple(sorted(mask_paths)), grid.geotransform, grid.width, grid.height)
+        if key not in self.mask_rasters:
+            masks_directory = os.path.join(self.scenario_directory, "masks")
+            BaseFileUtils.create_new_dir(masks_directory)
+
+            self.log_message(f"Burning mask layers {mask_paths} \n")
+            self.mask_rasters[key] = burn_mask(
+                mask_paths,
+                grid,
+                os.path.join(masks_directory, f"mask_{str(uuid.uuid4())[:4]}.tif"),
+            )
+
+        return self.mask_rasters[key]
+
+    def run_raster_masking(
+        self,
+        activities: typing.List[Activity],
+        extent: str,
+        stage: str,
+        masking_layers: typing.List[str] = None,
+        temporary_output: bool = False,
+    ) -> bool:
+        """Masks the activities with mask rasters burned once per set of
+        mask layers, the pixels covered by the mask polygons are set as
+        nodata window by window.
+
+        :param activities: List of the selected activities
+        :type activities: typing.List[Activity]
+
+        :param extent: Selected extent from user
+        :type extent: str
+
+        :param stage: Masking stage name
+        :type stage: str
+
+        :param masking_layers: Mask layers paths applied to all the
+        activities, the activities own mask layers are used when None
+        :type masking_layers: typing.List[str]
+
+        :param temporary_output: Whether to save the outputs as temporary files
+        :type temporary_output: bool
+
+        :returns: Whether the task operations was successful
+        :rtype: bool
+        """
+        try:
+            extent_rectangle, crs = self.extent_rectangle(extent)
+            masked_activities_directory = os.path.join(
+                self.scenario_directory,
+                "masked_activities"
+                if masking_layers is not None
+                else "final_masked_activities",
+            )
+            output_directory = (
+                self.get_temporary_directory()
+                if temporary_output
+                else masked_activities_directory
+            )
+            BaseFileUtils.create_new_dir(output_directory)
+
+            for activity in activities:
+                if self.processing_cancelled:
+                    return False
+
+                if self.resume_activity(activity, stage):
+                    continue
+
+                if activity.path is None or activity.path == "":
+                    self.log_message(
+                        f"Problem when masking activities, "
+                        f"there is no map layer for the activity {activity.name}"
+                    )
+                    return False
+
+                mask_paths = self.polygon_mask_paths(
+                    masking_layers
+                    if masking_layers is not None
+                    else activity.mask_paths,
+                    crs,
+                )
+                if not mask_paths:
+                    self.log_message(
+                        f"Skipping activity masking "
+                        f"No mask layer(s) for activity {activity.name}"
+                    )
+                    self.checkpoint_activity(activity, stage)
+                    continue
+
+                cache_key, cached_path = self.cached_stage_output(
+                    f"{stage}_raster",
+                    [activity.path] + mask_paths,
+                    {"NO_DATA": NO_DATA_VALUE},
+                    extent,
+                )
+                if cached_path:
+                    activity.path = cached_path
+                    self.checkpoint_activity(activity, stage)
+                    continue
+
+                grid = self.analysis_grid(activity.path, extent_rectangle, crs)
+                file_name = clean_filename(activity.name.replace(" ", "_"))
+                output_file = os.path.join(
+                    output_directory, f"{file_name}_{str(uuid.uuid4())[:4]}.tif"
+                )
+
+                apply_raster_mask(
+                    activity.path,
+                    self.mask_raster(mask_paths, grid),
+                    grid,
+                    output_file,
+                    statistics=self.gather_statistics(),
+                )
+
+                activity.path = self.cache_stage_output(cache_key, output_file)
+                self.checkpoint_activity(activity, stage)
+
+        except Exception as e:
+            self.log_message(f"Problem masking activities, {e}")
+            self.log_message(traceback.format_exc())
+            self.cancel_task(e)
+            return False
+
+        return True
+
+    def merge_vector_layers(self, layers):
+        """Merges the passed vector layers into a single layer
+
+        :param layers: List of the vector layers paths
+        :type layers: typing.List[str]
+
+        :return: Merged vector layer
+        :rtype: QgsMapLayer
+        """
+
+        input_map_layers = []
+
+        for layer_path in layers:
+            layer = QgsVectorLayer(layer_path, "mask", "ogr")
+            if layer.isValid():
+                input_map_layers.append(layer)
+            else:
+                self.log_message(
+                    f"Skipping invalid mask layer {layer_path} from masking."
+                )
+        if len(input_map_layers) == 0:
+            return None
+        if len(input_map_layers) == 1:
+            return input_map_layers[0].source()
+
+        self.set_status_message(tr("Merging mask layers"))
+
+        # Actual processing calculation
+        alg_params = {
+            "LAYERS": input_map_layers,
+            "CRS": None,
+            "OUTPUT": QgsProcessing.TEMPORARY_OUTPUT,
+        }
+
+        self.log_message(f"Used parameters for merging mask layers: {alg_params} \n")
+
+        results = processing.run(
+            "native:mergevectorlayers",
+            alg_params,
+            context=self.processing_context,
+            feedback=self.feedback,
+        )
+
+        return results["OUTPUT"]
+
+    def layer_extent(self, extent):
+        """Creates a new vector layer contains has a
+        feature with geometry matching an extent parameter.
+        :param extent: Extent parameter
+        :type extent: str
+        :returns: Vector layer
+        :rtype: QgsVectorLayer
+        """
+
+        alg_params = {
+            "INPUT": extent,
+            "CRS": None,
+            "OUTPUT": QgsProcessing.TEMPORARY_OUTPUT,
+        }
+
+        results = processing.run(
+            "native:extenttolayer",
+            alg_params,
+            context=self.processing_context,
+            feedback=self.feedback,
+        )
+
+        return results["OUTPUT"]
+
+    def mask_layer_difference(self, input_layer, overlay_layer):
+        """Creates a new vector layer that contains
+         difference of features between the two passed layers.
+        :param input_layer: Input layer
+        :type input_layer: QgsVectorLayer
+        :param overlay_layer: Target overlay layer
+        :type overlay_layer: QgsVectorLayer
+        :returns: Vector layer
+        :rtype: QgsVectorLayer
+        """
+
+        alg_params = {
+            "INPUT": input_layer,
+            "OVERLAY": overlay_layer,
+            "OVERLAY_FIELDS_PREFIX": "",
+            "GRID_SIZE": None,
+            "OUTPUT": QgsProcessing.TEMPORARY_OUTPUT,
+        }
+
+        results = processing.run(
+            "native:symmetricaldifference",
+            alg_params,
+            context=self.processing_context,
+            feedback=self.feedback,
+        )
+
+        return results["OUTPUT"]
+
+    def run_activities_sieve(self, models, temporary_output=False):
+        """Runs the sieve functionality analysis on the passed models layers,
+        removing the models layer polygons that are smaller than the provided
+        threshold size (in pixels) and replaces them with the pixel value of
+        the largest neighbour polygon.
+
+        :param models: List of the analyzed activities
+        :type models: typing.List[ImplementationModel]
+
+        :param extent: Selected area of interest extent
+        :type extent: str
+
+        :param temporary_output: Whether to save the processing outputs as temporary
+        files
+        :type temporary_output: bool
+
+        :returns: Whether the task operations was successful
+        :rtype: bool
+        """
+        if self.processing_cancelled:
+            # Will not proceed if processing has been cancelled by the user
+            return False
+
+        self.set_status_message(tr("Applying sieve function to the activities"))
+
+        try:
+            for model in models:
+                if self.resume_activity(model, "sieve"):
+                    continue
+
+                if model.path is None or model.path == "":
+                    if not self.processing_cancelled:
+                        self.set_info_message(
+                            tr(
+                                f"Problem when running sieve function on models, "
+                                f"there is no map layer for the model {model.name}"
+                            ),
+                            level=Qgis.Critical,
+                        )
+                        self.log_message(
+                            f"Problem when running sieve function on models, "
+                            f"there is no map layer for the model {model.name}"
+                        )
+                    else:
+                        # If the user cancelled the processing
+                        self.set_info_message(
+                            tr(f"Processing has been cancelled by the user."),
+                            level=Qgis.Critical,
+                        )
+                        self.log_message(f"Processing has been cancelled by the user.")
+
+                    return False
+
+                sieved_ims_directory = os.path.join(
+                    self.scenario_directory, "sieved_ims"
+                )
+                BaseFileUtils.create_new_dir(sieved_ims_directory)
+                file_name = clean_filename(model.name.replace(" ", "_"))
+
+                output_file = os.path.join(
+                    sieved_ims_directory, f"{file_name}_{str(uuid.uuid4())[:4]}.tif"
+                )
+
+                threshold_value = float(
+                    self.get_settings_value(Settings.SIEVE_THRESHOLD, default=10.0)
+                )
+
+                mask_layer = self.get_settings_value(
+                    Settings.SIEVE_MASK_PATH, default=""
+                )
+
+                output = (
+                    QgsProcessing.TEMPORARY_OUTPUT if temporary_output else output_file
+                )
+
+                # Actual processing calculation
+                alg_params = {
+                    "INPUT": model.path,
+                    "THRESHOLD": threshold_value,
+                    "MASK_LAYER": mask_layer,
+                    "OUTPUT": output,
+                }
+
+                self.log_message(f"Used parameters for sieving: {alg_params} \n")
+
+                input_name = os.path.splitext(os.path.basename(model.path))[0]
+
+                sieve_backend = self.stage_backend(AnalysisStage.SIEVE)
+                if sieve_backend != StageBackend.PROCESSING:
+                    if temporary_output:
+                        output_file = os.path.join(
+                            self.get_temporary_directory(),
+                            os.path.basename(output_file),
+                        )
+                    if sieve_backend == StageBackend.NUMPY:
+                        if not self.run_tiled_sieve(
+                            model.path, output_file, threshold_value
+                        ):
+                            return False
+                    else:
+                        sieve_raster(
+                            model.path,
+                            output_file,
+                            threshold_value,
+                            statistics=self.gather_statistics(),
+                        )
+                    model.path = output_file
+                    self.checkpoint_activity(model, "sieve")
+                    continue
+
+                # Step 1: Create a binary mask from the original raster
+                binary_mask = processing.run(
+                    "qgis:rastercalculator",
+                    {
+                        "CELLSIZE": 0,
+                        "LAYERS": [model.path],
+                        "CRS": None,
+                        "EXPRESSION": f"{input_name}@1 > 0",
+                        "OUTPUT": "TEMPORARY_OUTPUT",
+                    },
+                )["OUTPUT"]
+
+                # feedback.pushInfo(f"binary mask {binary_mask}")
+
+                # binary_mask_layer = QgsRasterLayer(binary_mask, 'binary')
+
+                # QgsProject.instance().addMapLayer(binary_mask_layer)
+
+                # Step 2: Run sieve analysis from on the binary mask
+                sieved_mask = processing.run(
+                    "gdal:sieve",
+                    {
+                        "INPUT": binary_mask,
+                        "THRESHOLD": threshold_value,
+                        "EIGHT_CONNECTEDNESS": True,
+                        "NO_MASK": True,
+                        "MASK_LAYER": None,
+                        "OUTPUT": "TEMPORARY_OUTPUT",
+                    },
+                    context=self.processing_context,
+                    feedback=self.feedback,
+                )["OUTPUT"]
+
+                # feedback.pushInfo(f"sieved mask {sieved_mask}")
+
+                # sieved_mask_layer = QgsRasterLayer(sieved_mask, 'sieved_mask')
+
+                # QgsProject.instance().addMapLayer(sieved_mask_layer)
+
+                expr = f"({os.path.splitext(os.path.basename(sieved_mask))[0]}@1 > 0) * {os.path.splitext(os.path.basename(sieved_mask))[0]}@1"
+                # feedback.pushInfo(f"used expression {expr}")
+
+                # Step 3: Remove and convert any no data value to 0
+                sieved_mask_clean = processing.run(
+                    "qgis:rastercalculator",
+                    {
+                        "CELLSIZE": 0,
+                        "LAYERS": [sieved_mask],
+                        "CRS": None,
+                        "EXPRESSION": expr,
+                        "OUTPUT": "TEMPORARY_OUTPUT",
+                    },
+                    context=self.processing_context,
+                    feedback=self.feedback,
+                )["OUTPUT"]
+
+                # feedback.pushInfo(f"sieved mask clean {sieved_mask_clean}")
+
+                # sieved_mask_clean_layer = QgsRasterLayer(sieved_mask_clean, 'sieved_mask_clean')
+
+                # QgsProject.instance().addMapLayer(sieved_mask_clean_layer)
+
+                expr_2 = f"{input_name}@1 * {os.path.splitext(os.path.basename(sieved_mask_clean))[0]}@1"
+
+                # feedback.pushInfo(f"Used expression 2 {expr_2}")
+
+                # Step 4: Join the sieved mask with the original input layer to filter out the small areas
+                sieve_output = processing.run(
+                    "qgis:rastercalculator",
+                    {
+                        "CELLSIZE": 0,
+                        "LAYERS": [model.path, sieved_mask_clean],
+                        "CRS": None,
+                        "EXPRESSION": expr_2,
+                        "OUTPUT": "TEMPORARY_OUTPUT",
+                    },
+                    context=self.processing_context,
+                    feedback=self.feedback,
+                )["OUTPUT"]
+
+                # feedback.pushInfo(f"sieved output joined {sieve_output}")
+
+                # sieve_output_layer = QgsRasterLayer(sieve_output, 'sieve_output')
+
+                # QgsProject.instance().addMapLayer(sieve_output_layer)
+
+                # expr_3 = f'if ( {os.path.splitext(os.path.basename(sieve_output))[0]}@1 <= 0, -9999, {os.path.splitext(os.path.basename(sieve_output))[0]}@1 )'
+
+                # feedback.pushInfo(f"used expression 3 {expr_3}")
+
+                # Step 5. Replace all 0 with -9999 using if ("combined@1" <= 0, -9999, "combined@1")
+                sieve_output_updated = processing.run(
+                    "gdal:rastercalculator",
+                    {
+                        "INPUT_A": f"{sieve_output}",
+                        "BAND_A": 1,
+                        "FORMULA": "9999*(A<=0)*(-1)+A*(A>0)",
+                        "NO_DATA": None,
+                        "EXTENT_OPT": 0,
+                        "PROJWIN": None,
+                        "RTYPE": 5,
+                        "OPTIONS": "",
+                        "EXTRA": "",
+                        "OUTPUT": "TEMPORARY_OUTPUT",
+                    },
+                    context=self.processing_context,
+                    feedback=self.feedback,
+                )["OUTPUT"]
+
+                # feedback.pushInfo(f"sieved output updated {sieve_output_updated}")
+
+                # sieve_output_updated_layer = QgsRasterLayer(sieve_output_updated, 'sieve_output_updated')
+
+                # QgsProject.instance().addMapLayer(sieve_output_updated_layer)
+
+                # Step 6. Run sum statistics with ignore no data values set to false and no data value of -9999
+                results = processing.run(
+                    "native:cellstatistics",
+                    {
+                        "INPUT": [sieve_output_updated],
+                        "STATISTIC": 0,
+                        "IGNORE_NODATA": False,
+                        "REFERENCE_LAYER": sieve_output_updated,
+                        "OUTPUT_NODATA_VALUE": -9999,
+                        "OUTPUT": output,
+                    },
+                    context=self.processing_context,
+                    feedback=self.feedback,
+                )
+
+                # self.log_message(
+                #     f"Used parameters for running sieve function to the models: {alg_params} \n"
+                # )
+
+                feedback = QgsProcessingFeedback()
+
+                feedback.progressChanged.connect(self.update_progress)
+
+                if self.processing_cancelled:
+                    return False
+
+                model.path = results["OUTPUT"]
+                self.checkpoint_activity(model, "sieve")
+
+        except Exception as e:
+            self.log_message(f"Problem running sieve function on models layers, {e} \n")
+            self.cancel_task(e)
+            return False
+
+        return True
+
+    def run_tiled_sieve(
+        self, input_path: str, output_path: str, threshold: float
+    ) -> bool:
+        """Sieves the layer with the tiled connected components labelling,
+        the tiles size follows the memory budget in the settings.
+
+        :param input_path: Path of the layer to be sieved
+        :type input_path: str
+
+        :param output_path: Path of the sieved layer
+        :type output_path: str
+
+        :param threshold: Minimum area size in pixels
+        :type threshold: float
+
+        :returns: True if the layer was sieved, False if cancelled
+        :rtype: bool
+        """
+        memory_budget = int(
+            self.get_settings_value(
+                Settings.MEMORY_BUDGET, default=DEFAULT_VALUES.memory_budget
+            )
+        )
+        tile_size = sieve_tile_size(memory_budget * 1024 * 1024)
+
+        self.log_message(
+            f"Sieving {input_path} in tiles of {tile_size} pixels "
+            f"with a threshold of {threshold} pixels \n"
+        )
+
+        return TiledSieve(
+            input_path,
+            int(threshold),
+            tile_size,
+            cancel_callback=lambda: self.processing_cancelled,
+            statistics=self.gather_statistics(),
+        ).run(output_path)
+
+    def run_activities_normalization(
+        self,
+        activities: typing.List[Activity],
+        extent: str,
+        temporary_output: bool = False,
+    ):
+        """Runs the normalization analysis on the activities' layers,
+        adjusting band values measured on different scale, the resulting scale
+        is computed using the below formula
+        Normalized_activity = (Carbon coefficient + Suitability index) * (
+            (Activity layer value) - (Activity band minimum value)) /
+            (Activity band maximum value - Activity band minimum value))
+
+        If the carbon coefficient and suitability index are both zero then
+        the computation won't take them into account in the normalization
+        calculation.
+
+        :param activities: List of the analyzed activities
+        :type activities: typing.List[Activity]
+
+        :param extent: Selected area of interest extent
+        :type extent: str
+
+        :param temporary_output: Whether to save the processing outputs as
+        temporary files
+        :type temporary_output: bool
+
+        :returns: Whether the task operations was successful
+        :rtype: bool
+        """
+        if self.processing_cancelled:
+            # Will not proceed if processing has been cancelled by the user
+            return False
+
+        self.set_status_message(tr("Normalization of the activities"))
+
+        try:
+            for activity in activities:
+                if activity.path is None or activity.path == "":
+                    if not self.processing_cancelled:
+                        self.set_info_message(
+                            tr(
+                                f"Problem when running activities normalization, "
+                                f"there is no map layer for the activity {activity.name}"
+                            ),
+                            level=Qgis.Critical,
+                        )
+                        self.log_message(
+                            f"Problem when running activities normalization, "
+                            f"there is no map layer for the activity {activity.name}"
+                        )
+                    else:
+                        # If the user cancelled the processing
+                        self.set_info_message(
+                            tr(f"Processing has been cancelled by the user."),
+                            level=Qgis.Critical,
+                        )
+                        self.log_message(f"Processing has been cancelled by the user.")
+
+                    return False
+
+                layers = []
+                normalized_activities_directory = os.path.join(
+                    self.scenario_directory, "normalized_activities"
+                )
+                BaseFileUtils.create_new_dir(normalized_activities_directory)
+                file_name = clean_filename(activity.name.replace(" ", "_"))
+
+                output_file = os.path.join(
+                    normalized_activities_directory,
+                    f"{file_name}_{str(uuid.uuid4())[:4]}.tif",
+                )
+
+                # Statistics gathered when the activity was written avoid
+                # reading the whole layer again
+                statistics = read_statistics(activity.path)
+                if statistics is not None and statistics.count:
+                    min_value = statistics.minimum
+                    max_value = statistics.maximum
+                else:
+                    activity_layer = QgsRasterLayer(activity.path, activity.name)
+                    provider = activity_layer.dataProvider()
+                    band_statistics = provider.bandStatistics(1)
+
+                    min_value = band_statistics.minimumValue
+                    max_value = band_statistics.maximumValue
+
+                self.log_message(
+                    f"Found minimum {min_value} and "
+                    f"maximum {max_value} for activity {activity.name} \n"
+                )
+
+                layer_name = Path(activity.path).stem
+
+                layers.append(activity.path)
+
+                carbon_coefficient = float(
+                    self.get_settings_value(Settings.CARBON_COEFFICIENT, default=0.0)
+                )
+
+                suitability_index = float(
+                    self.get_settings_value(
+                        Settings.PATHWAY_SUITABILITY_INDEX, default=0
+                    )
+                )
+
+                normalization_index = carbon_coefficient + suitability_index
+
+                if normalization_index > 0:
+                    expression = (
+                        f" {normalization_index} * "
+                        f'("{layer_name}@1" - {min_value}) /'
+                        f" ({max_value} - {min_value})"
+                    )
+
+                else:
+                    expression = (
+                        f'("{layer_name}@1" - {min_value}) /'
+                        f" ({max_value} - {min_value})"
+                    )
+
+                output = (
+                    QgsProcessing.TEMPORARY_OUTPUT if temporary_output else output_file
+                )
+
+                # Actual processing calculation
+                alg_params = {
+                    "CELLSIZE": 0,
+                    "CRS": None,
+                    "EXPRESSION": expression,
+                    "EXTENT": extent,
+                    "LAYERS": layers,
+                    "OUTPUT": output,
+                }
+
+                self.log_message(
+                    f"Used parameters for normalization of the activities: {alg_params} \n"
+                )
+
+                feedback = QgsProcessingFeedback()
+
+                feedback.progressChanged.connect(self.update_progress)
+
+                if self.processing_cancelled:
+                    return False
+
+                results = processing.run(
+                    "qgis:rastercalculator",
+                    alg_params,
+                    context=self.processing_context,
+                    feedback=self.feedback,
+                )
+                activity.path = results["OUTPUT"]
+
+        except Exception as e:
+            self.log_message(f"Problem normalizing activity layers, {e} \n")
+            self.cancel_task(e)
+            return False
+
+        return True
+
+    def run_activities_cleaning(
+        self,
+        activities: typing.List[Activity],
+        extent: str,
+        temporary_output: bool = False,
+    ):
+        """Cleans the weighted activities replacing
+        zero values with no-data as they are not statistical meaningful for the
+        scenario analysis.
+
+        :param extent: Selected extent from user
+        :type extent: str
+
+        :param temporary_output: Whether to save the processing outputs as temporary
+        files
+        :type temporary_output: bool
+
+        :returns: Whether the task operations was successful
+        :rtype: bool
+        """
+
+        if self.processing_cancelled:
+            return False
+
+        self.set_status_message(tr("Updating weighted activity values"))
+
+        try:
+            for activity in activities:
+                if self.resume_activity(activity, "cleaning"):
+                    continue
+
+                if str(activity.uuid) in self.cleaned_activities:
+                    self.checkpoint_activity(activity, "cleaning")
+                    continue
+
+                if activity.path is None or activity.path == "":
+                    self.set_info_message(
+                        tr(
+                            f"Problem when running activity updates, "
+                            f"there is no map layer for the activity {activity.name}"
+                        ),
+                        level=Qgis.Critical,
+                    )
+                    self.log_message(
+                        f"Problem when running activity updates, "
+                        f"there is no map layer for the activity {activity.name}"
+                    )
+
+                    return False
+
+                layers = [activity.path]
+
+                file_name = clean_filename(activity.name.replace(" ", "_"))
+
+                output_file = os.path.join(
+                    self.scenario_directory,
+                    f"{file_name}_{str(uuid.uuid4())[:4]}_cleaned.tif",
+                )
+
+                # Actual processing calculation
+                # The aim is to convert pixels values to no data, that is why we are
+                # using the sum operation with only one layer.
+
+                output = (
+                    QgsProcessing.TEMPORARY_OUTPUT if temporary_output else output_file
+                )
+                reference_layer = self.get_reference_layer()
+                if (reference_layer is None or reference_layer == "") and len(
+                    layers
+                ) > 0:
+                    reference_layer = layers[0]
+
+                alg_params = {
+                    "IGNORE_NODATA": True,
+                    "INPUT": layers,
+                    "EXTENT": extent,
+                    "OUTPUT_NODATA_VALUE": 0,
+                    "REFERENCE_LAYER": reference_layer,
+                    "STATISTIC": 0,  # Sum
+                    "OUTPUT": output,
+                }
+
+                self.log_message(
+                    f"Used parameters for "
+                    f"updates on the weighted activities: {alg_params} \n"
+                )
+
+                feedback = QgsProcessingFeedback()
+
+                feedback.progressChanged.connect(self.update_progress)
+
+                if self.processing_cancelled:
+                    return False
+
+                if self.stage_backend(AnalysisStage.CLEAN) == StageBackend.NUMPY:
+                    if temporary_output:
+                        output_file = os.path.join(
+                            self.get_temporary_directory(),
+                            os.path.basename(output_file),
+                        )
+                    extent_rectangle, crs = self.extent_rectangle(extent)
+                    activity.path = cell_sum(
+                        [activity.path],
+                        self.analysis_grid(activity.path, extent_rectangle, crs),
+                        output_file,
+                        output_nodata=0,
+                        clean_zeros=True,
+                        statistics=self.gather_statistics(),
+                    )
+                    self.checkpoint_activity(activity, "cleaning")
+                    continue
+
+                results = processing.run(
+                    "native:cellstatistics",
+                    alg_params,
+                    context=self.processing_context,
+                    feedback=self.feedback,
+                )
+                activity.path = results["OUTPUT"]
+                self.checkpoint_activity(activity, "cleaning")
+
+        except Exception as e:
+            self.log_message(f"Problem cleaning activities, {e}")
+            self.log_message(traceback.format_exc())
+            self.cancel_task(e)
+            return False
+
+        return True
+
+    def run_highest_position_analysis(self, temporary_output: bool = False):
+        """Runs the highest position analysis which is last step
+        in scenario analysis. Uses the activities set by the current ongoing
+        analysis.
+
+        :param temporary_output: Whether to save the processing outputs as temporary
+        files
+        :type temporary_output: bool
+
+        :returns: Whether the task operations was successful
+        :rtype: bool
+
+        """
+        if self.processing_cancelled:
+            # Will not proceed if processing has been cancelled by the user
+            return False
+
+        passed_extent_box = self.analysis_extent.bbox
+        passed_extent = QgsRectangle(
+            passed_extent_box[0],
+            passed_extent_box[2],
+            passed_extent_box[1],
+            passed_extent_box[3],
+        )
+
+        # We explicitly set the created_date since the current implementation
+        # of the data model means that the attribute value is set only once when
+        # the class is loaded hence subsequent instances will have the same value.
+        self.scenario_result = ScenarioResult(
+            scenario=self.scenario,
+            scenario_directory=self.scenario_directory,
+            created_date=datetime.datetime.now(),
+            stage_metrics=self.metrics.records,
+        )
+
+        try:
+            layers = {}
+
+            self.set_status_message(tr("Calculating the highest position"))
+
+            for activity in self.analysis_activities:
+                if activity.path is not None and activity.path != "":
+                    raster_layer = QgsRasterLayer(activity.path, activity.name)
+                    layers[activity.name] = (
+                        raster_layer if raster_layer is not None else None
+                    )
+                else:
+                    for pathway in activity.pathways:
+                        layers[activity.name] = QgsRasterLayer(pathway.path)
+
+            source_crs = QgsCoordinateReferenceSystem("EPSG:4326")
+            dest_crs = list(layers.values())[0].crs() if len(layers) > 0 else source_crs
+
+            extent_string = (
+                f"{passed_extent.xMinimum()},{passed_extent.xMaximum()},"
+                f"{passed_extent.yMinimum()},{passed_extent.yMaximum()}"
+                f" [{dest_crs.authid()}]"
+            )
+
+            output_file = os.path.join(
+                self.scenario_directory,
+                f"{SCENARIO_OUTPUT_FILE_NAME}_{str(self.scenario.uuid)[:4]}.tif",
+            )
+
+            # Preparing the input rasters for the highest position
+            # analysis in a correct order
+            activity_names = [activity.name for activity in self.analysis_activities]
+            all_activities = sorted(
+                self.analysis_activities,
+                key=lambda activity_instance: activity_instance.style_pixel_value,
+            )
+            for index, activity in enumerate(all_activities):
+                activity.style_pixel_value = index + 1
+
+            all_activity_names = [activity.name for activity in all_activities]
+            sources = []
+
+            for activity_name in all_activity_names:
+                if activity_name in activity_names:
+                    sources.append(layers[activity_name].source())
+
+            self.log_message(
+                f"Layers sources {[Path(source).stem for source in sources]}"
+            )
+
+            if self.stage_backend(AnalysisStage.HIGHEST_POSITION) == StageBackend.NUMPY:
+                if temporary_output:
+                    output_file = os.path.join(
+                        self.get_temporary_directory(), os.path.basename(output_file)
+                    )
+                return self.run_native_highest_position(
+                    sources, passed_extent, dest_crs, output_file
+                )
+
+            output_file = (
+                QgsProcessing.TEMPORARY_OUTPUT if temporary_output else output_file
+            )
+
+            reference_layer = self.get_reference_layer()
+            if reference_layer is None or reference_layer == "":
+                reference_layer = list(layers.values())[0]
+
+            alg_params = {
+                "IGNORE_NODATA": True,
+                "INPUT_RASTERS": sources,
+                "EXTENT": extent_string,
+                "OUTPUT_NODATA_VALUE": -9999,
+                "REFERENCE_LAYER": reference_layer,
+                "OUTPUT": output_file,
+            }
+
+            self.log_message(
+                f"Used parameters for highest position analysis {alg_params} \n"
+            )
+
+            self.feedback = QgsProcessingFeedback()
+
+            self.feedback.progressChanged.connect(self.update_progress)
+
+            if self.processing_cancelled:
+                return False
+
+            self.output = processing.run(
+                "native:highestpositioninrasterstack",
+                alg_params,
+                context=self.processing_context,
+                feedback=self.feedback,
+            )
+
+        except Exception as err:
+            self.log_message(
+                tr(
+                    "An error occurred when running task for "
+                    'scenario analysis, error message "{}"'.format(str(err))
+                )
+            )
+            self.log_message(traceback.format_exc())
+            self.cancel_task(err)
+            return False
+
+        return True
+
+    def run_native_highest_position(
+        self,
+        sources: typing.List[str],
+        extent: QgsRectangle,
+        crs: QgsCoordinateReferenceSystem,
+        output_file: str,
+    ) -> bool:
+        """Runs the highest position analysis with the streaming native
+        kernel, which keeps a running maximum and position per window
+        instead of opening the whole activities stack at once.
+
+        :param sources: Activities rasters in the highest position order
+        :type sources: typing.List[str]
+
+        :param extent: Analysis extent
+        :type extent: QgsRectangle
+
+        :param crs: Analysis CRS
+        :type crs: QgsCoordinateReferenceSystem
+
+        :param output_file: Highest position output path
+        :type output_file: str
+
+        :returns: Whether the task operations was successful
+        :rtype: bool
+        """
+        plan = EnginePlan(
+            grid=self.analysis_grid(sources[0], extent, crs),
+            pathways=[],
+            activities=[
+                ActivityPlan(uuid=str(index), name=Path(source).stem, path=source)
+                for index, source in enumerate(sources)
+            ],
+            highest_position_path=output_file,
+            statistics=self.gather_statistics(),
+        )
+        self.set_streaming_windows(plan, pixel_bytes=HIGHEST_POSITION_PIXEL_BYTES)
+
+        self.log_message(
+            f"Running the native highest position of {len(sources)} "
+            f"activities, streaming {plan.window_width}x{plan.window_height} "
+            f"windows \n"
+        )
+
+        engine = HighestPositionEngine(
+            plan,
+            progress_callback=self.update_progress,
+            cancel_callback=lambda: self.processing_cancelled,
+        )
+        if not engine.run():
+            return False
+
+        self.output = {"OUTPUT": output_file}
+
+        return True
+
+    def polygon_mask_paths(
+        self, mask_paths: typing.List[str], crs: QgsCoordinateReferenceSystem
+    ) -> typing.List[str]:
+        """Filters the mask layers paths that can be burned onto the
+        analysis grid, valid polygon layers in the analysis CRS.
+
+        :param mask_paths: Mask layers paths
+        :type mask_paths: typing.List[str]
+
+        :param crs: Analysis CRS
+        :type crs: QgsCoordinateReferenceSystem
+
+        :returns: Usable mask layers paths
+        :rtype: typing.List[str]
+        """
+        usable_paths = []
+        for mask_path in mask_paths:
+            mask_layer = QgsVectorLayer(mask_path, "mask", "ogr")
+            if not mask_layer.isValid():
+                self.log_message(
+                    f"Skipping masking using layer {mask_path}, not a valid layer."
+                )
+                continue
+
+            if Qgis.versionInt() < 33000:
+                layer_check = mask_layer.geometryType() == QgsWkbTypes.PolygonGeometry
+            else:
+                layer_check = mask_layer.geometryType() == Qgis.GeometryType.Polygon
+
+            if not layer_check:
+                self.log_message(
+                    f"Skipping masking using layer {mask_path}, not a polygon layer."
+                )
+                continue
+
+            if mask_layer.crs() != crs:
+                self.log_message(
+                    f"Skipping masking, the mask layer crs ({mask_layer.crs().authid()})"
+                    f" do not match the scenario crs ({crs.authid()})."
+                )
+                continue
+
+            usable_paths.append(mask_path)
+
+        return usable_paths
+
+    def pathway_terms(
+        self,
+        pathway: NcsPathway,
+        priority_layers_groups: list,
+        suitability_index: float,
+    ) -> typing.List[typing.Tuple[str, float]]:
+        """Returns the weighting terms of the pathway, the pathway layer
+        weighted by the suitability index followed by its priority
+        weighting layers weighted by their groups coefficients.
+
+        :param pathway: Pathway
+        :type pathway: NcsPathway
+
+        :param priority_layers_groups: Used priority layers groups and their values
+        :type priority_layers_groups: list
+
+        :param suitability_index: Pathway suitability index
+        :type suitability_index: float
+
+        :returns: Layer paths and their coefficients
+        :rtype: typing.List[typing.Tuple[str, float]]
+        """
+        coefficient = suitability_index if suitability_index > 0 else 1.0
+
+        return [(pathway.path, coefficient)] + self.priority_layer_terms(
+            pathway, priority_layers_groups
+        )
+
+    def pathway_expression(
+        self,
+        pathway: NcsPathway,
+        priority_layers_groups: list,
+        suitability_index: float,
+    ) -> LinearExpression:
+        """Returns the folded weighting expression of the pathway.
+
+        :param pathway: Pathway
+        :type pathway: NcsPathway
+
+        :param priority_layers_groups: Used priority layers groups and their values
+        :type priority_layers_groups: list
+
+        :param suitability_index: Pathway suitability index
+        :type suitability_index: float
+
+        :returns: Weighting expression
+        :rtype: LinearExpression
+        """
+        return LinearExpression.from_terms(
+            self.pathway_terms(pathway, priority_layers_groups, suitability_index)
+        ).fold()
+
+    def raster_calculator_layers(
+        self, layers: typing.List[str], directory: str
+    ) -> typing.Dict[str, str]:
+        """Returns the layers passed to the raster calculator, which refers
+        to the layers by their file name. Layers sharing a file name with
+        another layer are exposed through a uniquely named virtual raster.
+
+        :param layers: Layer paths
+        :type layers: typing.List[str]
+
+        :param directory: Directory of the virtual rasters
+        :type directory: str
+
+        :returns: Raster calculator layer path of each layer path
+        :rtype: typing.Dict[str, str]
+        """
+        stems = [Path(path).stem for path in layers]
+        calculator_layers = {}
+        for path, stem in zip(layers, stems):
+            if stems.count(stem) == 1:
+                calculator_layers[path] = path
+                continue
+
+            alias_directory = os.path.join(directory, "calculator_layers")
+            BaseFileUtils.create_new_dir(alias_directory)
+            calculator_layers[path] = alias_raster(
+                path,
+                os.path.join(alias_directory, f"{stem}_{str(uuid.uuid4())[:8]}.vrt"),
+            )
+
+        return calculator_layers
+
+    def extent_rectangle(
+        self, extent: str
+    ) -> typing.Tuple[QgsRectangle, QgsCoordinateReferenceSystem]:
+        """Parses a processing extent string in the
+        "xmin,xmax,ymin,ymax [authid]" format.
+
+        :param extent: Processing extent string
+        :type extent: str
+
+        :returns: Extent rectangle and CRS
+        :rtype: typing.Tuple[QgsRectangle, QgsCoordinateReferenceSystem]
+        """
+        coordinates, _, authid = extent.partition("[")
+        x_min, x_max, y_min, y_max = [
+            float(value) for value in coordinates.strip().split(",")
+        ]
+
+        return (
+            QgsRectangle(x_min, y_min, x_max, y_max),
+            QgsCoordinateReferenceSystem(authid.rstrip("]").strip()),
+        )
+
+    def analysis_grid(
+        self, layer_path: str, extent: QgsRectangle, crs: QgsCoordinateReferenceSystem
+    ) -> RasterGrid:
+        """Returns the grid covering the extent with the resolution of
+        the reference layer, or of the passed layer when snapping is
+        disabled.
+
+        :param layer_path: Path of the layer used when there is no
+        reference layer
+        :type layer_path: str
+
+        :param extent: Snapped analysis extent
+        :type extent: QgsRectangle
+
+        :param crs: Analysis CRS
+        :type crs: QgsCoordinateReferenceSystem
+
+        :returns: Analysis grid
+        :rtype: RasterGrid
+        """
+        reference_layer_path = self.get_reference_layer()
+        if reference_layer_path:
+            grid_layer = QgsRasterLayer(reference_layer_path, "reference")
+        else:
+            grid_layer = QgsRasterLayer(layer_path, "grid")
+
+        return RasterGrid.from_extent(
+            extent.xMinimum(),
+            extent.xMaximum(),
+            extent.yMinimum(),
+            extent.yMaximum(),
+            grid_layer.rasterUnitsPerPixelX(),
+            grid_layer.rasterUnitsPerPixelY(),
+            crs.toWkt(),
+        )
+
+    def run_batched_pathways_weighting(
+        self,
+        pathways: typing.List[NcsPathway],
+        priority_layers_groups: list,
+        extent: str,
+        directory: str,
+        temporary_output: bool = False,
+    ) -> bool:
+        """Weights all the pathways in a single windowed pass of the native
+        engine. The pathways are compiled into a pathway by layer
+        coefficient matrix so every pathway and priority weighting layer
+        is read once for all the pathways using it.
+
+        :param pathways: Pathways to be weighted
+        :type pathways: typing.List[NcsPathway]
+
+        :param priority_layers_groups: Used priority layers groups and their values
+        :type priority_layers_groups: list
+
+        :param extent: Selected extent from user
+        :type extent: str
+
+        :param directory: Weighted pathways directory
+        :type directory: str
+
+        :param temporary_output: Whether to save the outputs as temporary files
+        :type temporary_output: bool
+
+        :returns: True if the task operation was successfully completed else False.
+        :rtype: bool
+        """
+        suitability_index = float(
+            self.get_settings_value(Settings.PATHWAY_SUITABILITY_INDEX, default=0)
+        )
+        output_directory = (
+            self.get_temporary_directory() if temporary_output else directory
+        )
+
+        pathway_plans = []
+        cache_keys = {}
+        for pathway in pathways:
+            if str(pathway.uuid) in self.reused_pathways:
+                continue
+
+            if self.resume_pathway(pathway, "weighting"):
+                continue
+
+            expression = self.pathway_expression(
+                pathway, priority_layers_groups, suitability_index
+            )
+
+            # No need to weight the pathway if the expression is the
+            # pathway layer itself.
+            if expression.is_identity(pathway.path):
+                self.checkpoint_pathway(pathway, "weighting")
+                continue
+
+            cache_key, cached_path = self.cached_stage_output(
+                "weighting_batched",
+                expression.layers,
+                {
+                    "COEFFICIENTS": expression.coefficients,
+                    "CONSTANT": expression.constant,
+                },
+                extent,
+            )
+            if cached_path:
+                pathway.path = cached_path
+                self.checkpoint_pathway(pathway, "weighting")
+                continue
+
+            file_name = clean_filename(pathway.name.replace(" ", "_"))
+            cache_keys[str(pathway.uuid)] = cache_key
+            pathway_plans.append(
+                PathwayPlan(
+                    uuid=str(pathway.uuid),
+                    name=pathway.name,
+                    path=pathway.path,
+                    terms=[(term.layer, term.coefficient) for term in expression.terms],
+                    output_path=os.path.join(
+                        output_directory, f"{file_name}_{str(uuid.uuid4())[:4]}.tif"
+                    ),
+                )
+            )
+
+        if not pathway_plans:
+            return True
+
+        extent_rectangle, crs = self.extent_rectangle(extent)
+        plan = EnginePlan(
+            grid=self.analysis_grid(pathway_plans[0].path, extent_rectangle, crs),
+            pathways=pathway_plans,
+            activities=[],
+            statistics=self.gather_statistics(),
+        )
+        self.set_streaming_windows(plan)
+
+        self.log_message(
+            f"Weighting {len(pathway_plans)} pathways from "
+            f"{len(plan.source_paths())} distinct layers \n"
+        )
+
+        engine = FusedRasterEngine(
+            plan,
+            progress_callback=self.update_progress,
+            cancel_callback=lambda: self.processing_cancelled,
+        )
+        if not engine.run():
+            return False
+
+        pathway_plans = {p.uuid: p for p in pathway_plans}
+        for pathway in pathways:
+            pathway_plan = pathway_plans.get(str(pathway.uuid))
+            if pathway_plan is None:
+                continue
+            pathway.path = self.cache_stage_output(
+                cache_keys[pathway_plan.uuid], pathway_plan.output_path
+            )
+            self.checkpoint_pathway(pathway, "weighting")
+
+        return True
+
+    def run_fused_analysis(
+        self,
+        activities: typing.List[Activity],
+        priority_layers_groups: list,
+        extent: QgsRectangle,
+        crs: QgsCoordinateReferenceSystem,
+    ) -> bool:
+        """Runs the pathways weighting, activities creation, masking,
+        cleaning and highest position analysis in a single windowed pass
+        using the native raster engine. Only the outputs enabled in the
+        settings are written.
+
+        :param activities: List of the selected activities
+        :type activities: typing.List[Activity]
+
+        :param priority_layers_groups: Used priority layers groups and their values
+        :type priority_layers_groups: list
+
+        :param extent: Snapped analysis extent
+        :type extent: QgsRectangle
+
+        :param crs: Analysis CRS
+        :type crs: QgsCoordinateReferenceSystem
+
+        :returns: Whether the task operations was successful
+        :rtype: bool
+        """
+        if self.processing_cancelled:
+            return False
+
+        self.set_status_message(tr("Running the scenario analysis in a single pass"))
+
+        self.scenario_result = ScenarioResult(
+            scenario=self.scenario,
+            scenario_directory=self.scenario_directory,
+            created_date=datetime.datetime.now(),
+            stage_metrics=self.metrics.records,
+        )
+
+        try:
+            plan = self.fused_analysis_plan(
+                activities, priority_layers_groups, extent, crs
+            )
+            if plan is None:
+                return False
+
+            if self.stage_backend(AnalysisStage.MASK) == StageBackend.NUMPY:
+                mask_sets = [tuple(plan.mask_paths)] + [
+                    tuple(activity.mask_paths) for activity in plan.activities
+                ]
+                for mask_set in mask_sets:
+                    if mask_set and mask_set not in plan.mask_rasters:
+                        plan.mask_rasters[mask_set] = self.mask_raster(
+                            list(mask_set), plan.grid
+                        )
+
+            parallel_workers = max(
+                int(
+                    self.get_settings_value(
+                        Settings.PARALLEL_WORKERS,
+                        default=DEFAULT_VALUES.parallel_workers,
+                    )
+                ),
+                1,
+            )
+            tile_size = int(
+                self.get_settings_value(
+                    Settings.TILE_SIZE, default=DEFAULT_VALUES.tile_size
+                )
+            )
+
+            # Each worker process streams its tiles within its budget share
+            self.set_streaming_windows(plan, parallel_workers)
+
+            self.log_message(
+                f"Running fused analysis on a {plan.grid.width}x"
+                f"{plan.grid.height} grid with {len(plan.pathways)} pathways "
+                f"and {len(plan.activities)} activities, streaming "
+                f"{plan.window_width}x{plan.window_height} windows \n"
+            )
+
+            if parallel_workers > 1 and (
+                plan.grid.width > tile_size or plan.grid.height > tile_size
+            ):
+                self.log_message(
+                    f"Running {tile_size} pixels tiles using "
+                    f"{parallel_workers} worker processes \n"
+                )
+                engine = TiledEngineExecutor(
+                    plan,
+                    os.path.join(self.scenario_directory, "tiles"),
+                    parallel_workers,
+                    tile_size,
+                    progress_callback=self.update_progress,
+                    cancel_callback=lambda: self.processing_cancelled,
+                )
+            else:
+                engine = FusedRasterEngine(
+                    plan,
+                    progress_callback=self.update_progress,
+                    cancel_callback=lambda: self.processing_cancelled,
+                )
+
+            if not engine.run():
+                return False
+
+            pathway_plans = {p.uuid: p for p in plan.pathways}
+            for pathway in self.unique_pathways(activities):
+                pathway_plan = pathway_plans.get(str(pathway.uuid))
+                if pathway_plan is None:
+                    continue
+                if pathway_plan.output_path:
+                    pathway.path = pathway_plan.output_path
+                self.run_manifest.record_pathway(
+                    str(pathway.uuid), "weighting", pathway.path
+                )
+
+            activity_plans = {a.uuid: a for a in plan.activities}
+            for activity in activities:
+                activity_plan = activity_plans[str(activity.uuid)]
+                output_path = (
+                    activity_plan.cleaned_output_path or activity_plan.output_path
+                )
+                if output_path:
+                    activity.path = output_path
+                if activity_plan.cleaned_output_path or activity_plan.path:
+                    self.run_manifest.record_activity(
+                        str(activity.uuid), "cleaning", activity.path
+                    )
+
+            self.output = {"OUTPUT": plan.highest_position_path}
+
+        except Exception as err:
+            self.log_message(f"Problem running the fused analysis, {err} \n")
+            self.log_message(traceback.format_exc())
+            self.cancel_task(err)
+            return False
+
+        return True
+
+    def set_streaming_windows(
+        self, plan: EnginePlan, workers: int = 1, pixel_bytes: int = 0
+    ):
+        """Sizes the windows streamed by the native engine from the
+        memory budget setting, aligning them with the internal blocks of
+        the first plan input.
+
+        :param plan: Native engine plan
+        :type plan: EnginePlan
+
+        :param workers: Number of engine processes sharing the budget
+        :type workers: int
+
+        :param pixel_bytes: Working memory of each window pixel, estimated
+        from the plan when zero
+        :type pixel_bytes: int
+        """
+        memory_budget = int(
+            float(
+                self.get_settings_value(
+                    Settings.MEMORY_BUDGET, default=DEFAULT_VALUES.memory_budget
+                )
+            )
+            * 1024
+            * 1024
+            / workers
+        )
+
+        layout = (256, 256, 0, 0)
+        source_paths = plan.source_paths()
+        if source_paths:
+            try:
+                layout = block_layout(source_paths[0], plan.grid)
+            except ValueError as e:
+                self.log_message(f"Using the default window blocks, {e}")
+
+        plan.set_memory_budget(memory_budget, *layout, bytes_per_pixel=pixel_bytes)
+
+    def unique_pathways(
+        self, activities: typing.List[Activity]
+    ) -> typing.List[NcsPathway]:
+        """Returns the distinct pathways of the passed activities.
+
+        :param activities: List of the selected activities
+        :type activities: typing.List[Activity]
+
+        :returns: Distinct pathways
+        :rtype: typing.List[NcsPathway]
+        """
+        pathways = []
+        for activity in activities:
+            for pathway in activity.pathways:
+                if pathway not in pathways:
+                    pathways.append(pathway)
+
+        return pathways
+
+    def fused_analysis_plan(
+        self,
+        activities: typing.List[Activity],
+        priority_layers_groups: list,
+        extent: QgsRectangle,
+        crs: QgsCoordinateReferenceSystem,
+    ) -> typing.Union[EnginePlan, None]:
+        """Builds the native engine plan of the analysis, with the
+        output paths of the outputs enabled in the settings.
+
+        :param activities: List of the selected activities
+        :type activities: typing.List[Activity]
+
+        :param priority_layers_groups: Used priority layers groups and their values
+        :type priority_layers_groups: list
+
+        :param extent: Snapped analysis extent
+        :type extent: QgsRectangle
+
+        :param crs: Analysis CRS
+        :type crs: QgsCoordinateReferenceSystem
+
+        :returns: Engine plan or None if the activities are not valid
+        :rtype: typing.Union[EnginePlan, None]
+        """
+        for activity in activities:
+            if not activity.pathways and (activity.path is None or activity.path == ""):
+                msg = (
+                    f"No defined activity pathways or an "
+                    f"activity layer for the activity {activity.name}"
+                )
+                self.set_info_message(tr(msg), level=Qgis.Critical)
+                self.log_message(msg)
+                return None
+
+        pathways = self.unique_pathways(
+            [a for a in activities if str(a.uuid) not in self.reused_activities]
+        )
+
+        grid = self.analysis_grid(
+            pathways[0].path if pathways else activities[0].path, extent, crs
+        )
+
+        suitability_index = float(
+            self.get_settings_value(Settings.PATHWAY_SUITABILITY_INDEX, default=0)
+        )
+        save_weighted = self.get_settings_value(
+            Settings.NCS_WEIGHTED, default=True, setting_type=bool
+        )
+        save_activities = self.get_settings_value(
+            Settings.LANDUSE_PROJECT, default=True, setting_type=bool
+        )
+        save_cleaned = self.get_settings_value(
+            Settings.LANDUSE_NORMALIZED, default=True, setting_type=bool
+        )
+        save_highest_position = self.get_settings_value(
+            Settings.HIGHEST_POSITION, default=True, setting_type=bool
+        )
+
+        def output_path(directory, name, suffix=""):
+            BaseFileUtils.create_new_dir(directory)
+            file_name = clean_filename(name.replace(" ", "_"))
+            return os.path.join(
+                directory, f"{file_name}_{str(uuid.uuid4())[:4]}{suffix}.tif"
+            )
+
+        pathway_plans = []
+        for pathway in pathways:
+            if str(pathway.uuid) in self.reused_pathways:
+                pathway_plans.append(
+                    PathwayPlan(
+                        uuid=str(pathway.uuid),
+                        name=pathway.name,
+                        path=pathway.path,
+                        terms=[(pathway.path, 1.0)],
+                    )
+                )
+                continue
+
+            terms = self.pathway_terms(
+                pathway, priority_layers_groups, suitability_index
+            )
+            weighted = suitability_index > 0 or len(terms) > 1
+
+            pathway_plans.append(
+                PathwayPlan(
+                    uuid=str(pathway.uuid),
+                    name=pathway.name,
+                    path=pathway.path,
+                    terms=terms,
+                    output_path=(
+                        output_path(
+                            os.path.join(self.scenario_directory, "weighted_pathways"),
+                            pathway.name,
+                        )
+                        if weighted and save_weighted
+                        else ""
+                    ),
+                )
+            )
+
+        masking_layers = self.polygon_mask_paths(self.get_masking_layers(), crs)
+        self.log_message(f"Masking layers: {masking_layers}")
+
+        # Highest position order follows the activities style pixel values
+        ordered_activities = sorted(
+            activities,
+            key=lambda activity_instance: activity_instance.style_pixel_value,
+        )
+        activity_plans = []
+        for index, activity in enumerate(ordered_activities):
+            activity.style_pixel_value = index + 1
+
+            if str(activity.uuid) in self.reused_activities:
+                # Cleaned output reused from the previous run
+                activity_plans.append(
+                    ActivityPlan(
+                        uuid=str(activity.uuid),
+                        name=activity.name,
+                        path=activity.path,
+                    )
+                )
+                continue
+
+            activity_plans.append(
+                ActivityPlan(
+                    uuid=str(activity.uuid),
+                    name=activity.name,
+                    pathways=[str(pathway.uuid) for pathway in activity.pathways],
+                    path=activity.path or "",
+                    mask_paths=self.polygon_mask_paths(activity.mask_paths, crs),
+                    output_path=(
+                        output_path(
+                            os.path.join(self.scenario_directory, "activities"),
+                            activity.name,
+                        )
+                        if save_activities
+                        else ""
+                    ),
+                    cleaned_output_path=(
+                        output_path(self.scenario_directory, activity.name, "_cleaned")
+                        if save_cleaned
+                        else ""
+                    ),
+                )
+            )
+
+        scenario_file_name = (
+            f"{SCENARIO_OUTPUT_FILE_NAME}_{str(self.scenario.uuid)[:4]}.tif"
+        )
+        highest_position_directory = (
+            self.scenario_directory
+            if save_highest_position
+            else self.get_temporary_directory()
+        )
+
+        return EnginePlan(
+            grid=grid,
+            pathways=pathway_plans,
+            activities=activity_plans,
+            mask_paths=masking_layers,
+            highest_position_path=os.path.join(
+                highest_position_directory, scenario_file_name
+            ),
+            statistics=self.gather_statistics(),
+        )
@@ -0,0 +1,334 @@
+# -*- coding: utf-8 -*-
+"""
+    Out-of-core sieve of the activities.
+
+    The positive pixels of a raster are labelled into 8-connected
+    components tile by tile. Components crossing the tile borders are
+    merged with a union-find over the tile component labels, so only one
+    tile and one row of labels are held in memory. Pixels of components
+    smaller than the threshold are set as nodata in a single output pass.
+"""
+
+import math
+import typing
+
+import numpy as np
+from osgeo import gdal
+
+from ..definitions.constants import NO_DATA_VALUE
+from ..utils.raster import GridSource, GridWriter, RasterGrid, iter_windows
+
+# Bytes held for each tile pixel while labelling the tile components.
+SIEVE_PIXEL_BYTES = 48
+
+# Smallest tile size in pixels used when labelling the components.
+MIN_SIEVE_TILE_SIZE = 256
+
+
+def sieve_tile_size(memory_budget: int) -> int:
+    """Returns the size of the square tiles that fit the memory budget.
+
+    :param memory_budget: Memory budget in bytes
+    :type memory_budget: int
+
+    :returns: Tile size in pixels
+    :rtype: int
+    """
+    return max(int(math.sqrt(memory_budget / SIEVE_PIXEL_BYTES)), MIN_SIEVE_TILE_SIZE)
+
+
+def label_components(foreground: np.ndarray) -> typing.Tuple[np.ndarray, int]:
+    """Labels the 8-connected components of the foreground pixels with
+    the two-pass labelling of the row runs of foreground pixels. The
+    first pass merges each run with the runs of the previous row that it
+    touches, the second pass numbers the runs by their root run. Both
+    passes are linear in the number of pixels of the tile.
+
+    :param foreground: Boolean mask of the foreground pixels
+    :type foreground: np.ndarray
+
+    :returns: Component labels numbered from zero, -1 for the background
+    pixels, and the number of components
+    :rtype: typing.Tuple[np.ndarray, int]
+    """
+    height, width = foreground.shape
+    labels = np.full(foreground.shape, -1, dtype=np.int64)
+
+    # Runs of each row, as their start and exclusive end columns
+    padded = np.zeros((height, width + 2), dtype=np.int8)
+    padded[:, 1:-1] = foreground
+    changes = np.diff(padded, axis=1)
+    rows, starts = np.nonzero(changes == 1)
+    ends = np.nonzero(changes == -1)[1]
+    if len(starts) == 0:
+        return labels, 0
+
+    # A run touches the runs of the previous row that end at or after
+    # its start and start at or before its end, which are consecutive.
+    stride = width + 1
+    previous_row = (rows - 1) * stride
+    first = np.searchsorted(rows * stride + ends, previous_row + starts, "left")
+    last = np.searchsorted(rows * stride + starts, previous_row + ends, "right")
+    counts = np.maximum(last - first, 0)
+    runs = np.repeat(np.arange(len(starts)), counts)
+    touched = (
+        np.arange(counts.sum())
+        - np.repeat(np.cumsum(counts) - counts, counts)
+        + np.repeat(first, counts)
+    )
+
+    # First pass, each root is the smallest run of its set so a run
+    # parent always precedes the run.
+    parent = list(range(len(starts)))
+    for run, other in zip(runs.tolist(), touched.tolist()):
+        while parent[run] != run:
+            parent[run] = parent[parent[run]]
+            run = parent[run]
+        while parent[other] != other:
+            parent[other] = parent[parent[other]]
+            other = parent[other]
+        if run < other:
+            parent[other] = run
+        elif other < run:
+            parent[run] = other
+
+    # Second pass, the runs are numbered in order from their root
+    components = [0] * len(starts)
+    count = 0
+    for run, run_parent in enumerate(parent):
+        if run_parent == run:
+            components[run] = count
+            count += 1
+        else:
+            components[run] = components[run_parent]
+
+    # Foreground pixels are in the order of their runs
+    labels[foreground] = np.repeat(np.array(components, dtype=np.int64), ends - starts)
+
+    return labels, count
+
+
+class UnionFind:
+    """Disjoint sets of the component labels, grown as tiles are
+    labelled.
+    """
+
+    def __init__(self):
+        self.parent = np.zeros(0, dtype=np.int64)
+        self.size = np.zeros(0, dtype=np.int64)
+        self.count = 0
+
+    def add(self, sizes: np.ndarray) -> int:
+        """Adds new single component sets.
+
+        :param sizes: Pixel counts of the new components
+        :type sizes: np.ndarray
+
+        :returns: Label of the first new component
+        :rtype: int
+        """
+        offset = self.count
+        required = offset + len(sizes)
+        if required > len(self.parent):
+            capacity = max(required, 2 * len(self.parent))
+            self.parent = np.resize(self.parent, capacity)
+            self.size = np.resize(self.size, capacity)
+
+        self.parent[offset:required] = np.arange(offset, required)
+        self.size[offset:required] = sizes
+        self.count = required
+
+        return offset
+
+    def find(self, label: int) -> int:
+        """Returns the root label of the set, compressing the path."""
+        root = label
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[label] != root:
+            self.parent[label], label = root, self.parent[label]
+
+        return root
+
+    def union_pairs(self, first: np.ndarray, second: np.ndarray):
+        """Merges the sets of each pair of labels.
+
+        :param first: First labels of the pairs
+        :type first: np.ndarray
+
+        :param second: Second labels of the pairs
+        :type second: np.ndarray
+        """
+        if len(first) == 0:
+            return
+
+        pairs = np.unique(np.stack([first, second], axis=1), axis=0)
+        for first_label, second_label in pairs:
+            first_root = self.find(int(first_label))
+            second_root = self.find(int(second_label))
+            if first_root == second_root:
+                continue
+            if first_root > second_root:
+                first_root, second_root = second_root, first_root
+            self.parent[second_root] = first_root
+            self.size[first_root] += self.size[second_root]
+
+    def roots(self) -> np.ndarray:
+        """Returns the root label of every label."""
+        parent = self.parent[: self.count].copy()
+        while True:
+            jumped = parent[parent]
+            if np.array_equal(jumped, parent):
+                return parent
+            parent = jumped
+
+
+def _border_pairs(
+    labels: np.ndarray, neighbours: np.ndarray
+) -> typing.Tuple[np.ndarray, np.ndarray]:
+    """Returns the pairs of labels of the border pixels and their
+    8-connected neighbours on the other side of the border.
+
+    :param labels: Labels of the pixels along the border
+    :type labels: np.ndarray
+
+    :param neighbours: Labels of the pixels across the border, with one
+    extra pixel on each side of the border
+    :type neighbours: np.ndarray
+
+    :returns: Pairs of connected labels
+    :rtype: typing.Tuple[np.ndarray, np.ndarray]
+    """
+    first = []
+    second = []
+    for shift in range(3):
+        across = neighbours[shift : shift + len(labels)]
+        connected = (labels >= 0) & (across >= 0)
+        first.append(labels[connected])
+        second.append(across[connected])
+
+    return np.concatenate(first), np.concatenate(second)
+
+
+def _padded(values: np.ndarray, start: int, stop: int) -> np.ndarray:
+    """Returns values[start - 1:stop + 1], padded with -1 outside
+    the array.
+    """
+    result = np.full(stop - start + 2, -1, dtype=np.int64)
+    source_start = max(start - 1, 0)
+    source_stop = min(stop + 1, len(values))
+    offset = source_start - (start - 1)
+    result[offset : offset + source_stop - source_start] = values[
+        source_start:source_stop
+    ]
+
+    return result
+
+
+class TiledSieve:
+    """Removes the 8-connected components of positive pixels smaller
+    than a threshold, with memory bounded by the tile size.
+    """
+
+    def __init__(
+        self,
+        source_path: str,
+        threshold: int,
+        tile_size: int = 1024,
+        cancel_callback: typing.Callable[[], bool] = None,
+        statistics: bool = False,
+    ):
+        dataset = gdal.Open(source_path)
+        if dataset is None:
+            raise ValueError(f"Unable to open raster {source_path}")
+
+        self.grid = RasterGrid.from_dataset(dataset)
+        self.source_path = source_path
+        self.threshold = threshold
+        self.tile_size = max(int(tile_size), 1)
+        self.cancel_callback = cancel_callback
+        self.statistics = statistics
+
+    def run(self, output_path: str) -> bool:
+        """Writes the sieved raster, the pixels outside the kept
+        components are set as nodata.
+
+        :param output_path: Path of the sieved raster
+        :type output_path: str
+
+        :returns: True if the raster was sieved, False if cancelled
+        :rtype: bool
+        """
+        components = UnionFind()
+        bottom = np.full(self.grid.width, -1, dtype=np.int64)
+        next_bottom = np.full(self.grid.width, -1, dtype=np.int64)
+        right = None
+        offsets = []
+
+        source = GridSource(self.source_path, self.grid)
+        try:
+            for window in iter_windows(self.grid, self.tile_size, self.tile_size):
+                if self.cancel_callback is not None and self.cancel_callback():
+                    return False
+
+                if window.col_off == 0 and window.row_off > 0:
+                    bottom, next_bottom = next_bottom, bottom
+                    next_bottom[:] = -1
+
+                values, valid = source.read(window)
+                foreground = valid & (values > 0)
+                labels, count = label_components(foreground)
+                offset = components.add(
+                    np.bincount(labels[foreground], minlength=count)
+                )
+                offsets.append(offset)
+                labels[foreground] += offset
+
+                columns = slice(window.col_off, window.col_off + window.width)
+                if window.row_off > 0:
+                    components.union_pairs(
+                        *_border_pairs(
+                            labels[0],
+                            _padded(
+                                bottom,
+                                window.col_off,
+                                window.col_off + window.width,
+                            ),
+                        )
+                    )
+                if window.col_off > 0:
+                    components.union_pairs(
+                        *_border_pairs(labels[:, 0], _padded(right, 0, window.height))
+                    )
+
+                right = labels[:, -1].copy()
+                next_bottom[columns] = labels[-1]
+
+            roots = components.roots()
+            keep = components.size[roots] >= self.threshold
+
+            # Second pass, the tiles are labelled again in the same order
+            writer = GridWriter(
+                output_path,
+                self.grid,
+                nodata=NO_DATA_VALUE,
+                statistics=self.statistics,
+            )
+            try:
+                windows = iter_windows(self.grid, self.tile_size, self.tile_size)
+                for window, offset in zip(windows, offsets):
+                    if self.cancel_callback is not None and self.cancel_callback():
+                        return False
+
+                    values, valid = source.read(window)
+                    foreground = valid & (values > 0)
+                    labels, _ = label_components(foreground)
+                    kept = foreground.copy()
+                    kept[foreground] = keep[labels[foreground] + offset]
+                    writer.write(window, values, kept)
+            finally:
+                writer.close()
+        finally:
+            source.close()
+
+        return True
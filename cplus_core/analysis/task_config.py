@@ -2,10 +2,19 @@
 """
     TaskConfig
 """
+import inspect
 import typing
 import enum
-
-from ..models.base import Scenario, Activity
+import uuid
+
+from ..models.base import (
+    Activity,
+    LayerType,
+    NcsPathway,
+    NcsPathwayType,
+    Scenario,
+    SpatialExtent,
+)
 from ..definitions.defaults import DEFAULT_VALUES
 from ..utils.conf import Settings
 
@@ -40,6 +49,26 @@ class TaskConfig(object):
     highest_position = DEFAULT_VALUES.highest_position
     base_dir = ""
 
+    # native raster engine
+    fused_engine_enabled = DEFAULT_VALUES.fused_engine_enabled
+    memory_budget = DEFAULT_VALUES.memory_budget
+    parallel_workers = DEFAULT_VALUES.parallel_workers
+    tile_size = DEFAULT_VALUES.tile_size
+    batched_weighting = DEFAULT_VALUES.batched_weighting
+    native_highest_position = DEFAULT_VALUES.native_highest_position
+    raster_masking = DEFAULT_VALUES.raster_masking
+    warp_multithreading = DEFAULT_VALUES.warp_multithreading
+    streaming_statistics = DEFAULT_VALUES.streaming_statistics
+    stage_backends: typing.Dict = {}
+
+    # stage outputs cache
+    cache_dir = ""
+    cache_max_size = DEFAULT_VALUES.cache_max_size
+    snap_store_dir = ""
+
+    # incremental analysis
+    previous_run_dir = ""
+
     def __init__(
         self,
         scenario,
@@ -62,6 +91,20 @@ class TaskConfig(object):
         landuse_weighted=DEFAULT_VALUES.landuse_weighted,
         highest_position=DEFAULT_VALUES.highest_position,
         base_dir="",
+        fused_engine_enabled=DEFAULT_VALUES.fused_engine_enabled,
+        memory_budget=DEFAULT_VALUES.memory_budget,
+        parallel_workers=DEFAULT_VALUES.parallel_workers,
+        tile_size=DEFAULT_VALUES.tile_size,
+        batched_weighting=DEFAULT_VALUES.batched_weighting,
+        native_highest_position=DEFAULT_VALUES.native_highest_position,
+        raster_masking=DEFAULT_VALUES.raster_masking,
+        warp_multithreading=DEFAULT_VALUES.warp_multithreading,
+        streaming_statistics=DEFAULT_VALUES.streaming_statistics,
+        stage_backends=None,
+        cache_dir="",
+        cache_max_size=DEFAULT_VALUES.cache_max_size,
+        snap_store_dir="",
+        previous_run_dir="",
     ) -> None:
         """Initialize analysis task configuration.
 
@@ -125,6 +168,73 @@ class TaskConfig(object):
 
         :param base_dir: base scenario directory, defaults to ""
         :type base_dir: str, optional
+
+        :param fused_engine_enabled: Run the analysis stages in a single
+            windowed pass using the native raster engine,
+            defaults to DEFAULT_VALUES.fused_engine_enabled
+        :type fused_engine_enabled: bool, optional
+
+        :param memory_budget: Memory budget in megabytes used to size the
+            windows streamed by the native raster engine,
+            defaults to DEFAULT_VALUES.memory_budget
+        :type memory_budget: int, optional
+
+        :param parallel_workers: Number of processes running the native
+            raster engine tiles in parallel,
+            defaults to DEFAULT_VALUES.parallel_workers
+        :type parallel_workers: int, optional
+
+        :param tile_size: Size in pixels of the tiles run in parallel,
+            defaults to DEFAULT_VALUES.tile_size
+        :type tile_size: int, optional
+
+        :param batched_weighting: Weight the pathways in a single windowed
+            pass that reads each pathway and priority weighting layer once,
+            defaults to DEFAULT_VALUES.batched_weighting
+        :type batched_weighting: bool, optional
+
+        :param native_highest_position: Compute the highest position with
+            the streaming native kernel instead of the QGIS highest position
+            in raster stack algorithm, defaults to
+            DEFAULT_VALUES.native_highest_position
+        :type native_highest_position: bool, optional
+
+        :param raster_masking: Burn the mask layers once into mask rasters
+            on the analysis grid and apply them per window instead of
+            clipping every activity with the vector masks, defaults to
+            DEFAULT_VALUES.raster_masking
+        :type raster_masking: bool, optional
+
+        :param warp_multithreading: Use multiple threads when warping the
+            layers during snapping, defaults to
+            DEFAULT_VALUES.warp_multithreading
+        :type warp_multithreading: bool, optional
+
+        :param streaming_statistics: Gather the statistics of the native
+            stages outputs while writing them, stored in a sidecar next to
+            each output, defaults to DEFAULT_VALUES.streaming_statistics
+        :type streaming_statistics: bool, optional
+
+        :param stage_backends: Backend names by analysis stage name, stages
+            that are not set use their default backend, defaults to None
+        :type stage_backends: dict, optional
+
+        :param cache_dir: Directory of the stage outputs cache shared
+            between runs, the cache is disabled when empty, defaults to ""
+        :type cache_dir: str, optional
+
+        :param cache_max_size: Maximum size in megabytes of the stage
+            outputs cache, defaults to DEFAULT_VALUES.cache_max_size
+        :type cache_max_size: int, optional
+
+        :param snap_store_dir: Directory of the snapped layers store shared
+            between runs, the store is disabled when empty, defaults to ""
+        :type snap_store_dir: str, optional
+
+        :param previous_run_dir: Scenario directory of a previous run whose
+            outputs are reused when only priority groups coefficients
+            changed, defaults to ""
+        :type previous_run_dir: str, optional
         """
         self.scenario = scenario
         self.priority_layers = priority_layers
@@ -152,8 +262,24 @@ class TaskConfig(object):
 
         self.base_dir = base_dir
 
-    def get_activity(
-            self, activity_uuid: str) -> typing.Union[Activity, None]:
+        self.fused_engine_enabled = fused_engine_enabled
+        self.memory_budget = memory_budget
+        self.parallel_workers = parallel_workers
+        self.tile_size = tile_size
+        self.batched_weighting = batched_weighting
+        self.native_highest_position = native_highest_position
+        self.raster_masking = raster_masking
+        self.warp_multithreading = warp_multithreading
+        self.streaming_statistics = streaming_statistics
+        self.stage_backends = stage_backends or {}
+
+        self.cache_dir = cache_dir
+        self.cache_max_size = cache_max_size
+        self.snap_store_dir = snap_store_dir
+
+        self.previous_run_dir = previous_run_dir
+
+    def get_activity(self, activity_uuid: str) -> typing.Union[Activity, None]:
         """Retrieve activity by uuid.
 
         :param activity_uuid: Activity UUID
@@ -164,8 +290,7 @@ class TaskConfig(object):
         """
         activity = None
         filtered = [
-            act for act in self.all_activities if
-            str(act.uuid) == activity_uuid
+            act for act in self.all_activities if str(act.uuid) == activity_uuid
         ]
         if filtered:
             activity = filtered[0]
@@ -217,6 +342,7 @@ class TaskConfig(object):
         :rtype: dict
         """
         input_dict = {
+            "scenario_uuid": str(self.scenario.uuid),
             "scenario_name": self.scenario.name,
             "scenario_desc": self.scenario.description,
             "extent": self.scenario.extent.bbox,
@@ -239,6 +365,20 @@ class TaskConfig(object):
             "landuse_weighted": self.landuse_weighted,
             "highest_position": self.highest_position,
             "base_dir": self.base_dir,
+            "fused_engine_enabled": self.fused_engine_enabled,
+            "memory_budget": self.memory_budget,
+            "parallel_workers": self.parallel_workers,
+            "tile_size": self.tile_size,
+            "batched_weighting": self.batched_weighting,
+            "native_highest_position": self.native_highest_position,
+            "raster_masking": self.raster_masking,
+            "warp_multithreading": self.warp_multithreading,
+            "streaming_statistics": self.streaming_statistics,
+            "stage_backends": self.stage_backends,
+            "cache_dir": self.cache_dir,
+            "cache_max_size": self.cache_max_size,
+            "snap_store_dir": self.snap_store_dir,
+            "previous_run_dir": self.previous_run_dir,
         }
         for activity in self.scenario.activities:
             activity_dict = {
@@ -250,6 +390,8 @@ class TaskConfig(object):
                 "user_defined": activity.user_defined,
                 "pathways": [],
                 "layer_styles": activity.layer_styles,
+                "mask_paths": activity.mask_paths,
+                "style_pixel_value": activity.style_pixel_value,
             }
             for pathway in activity.pathways:
                 activity_dict["pathways"].append(
@@ -260,7 +402,92 @@ class TaskConfig(object):
                         "path": pathway.path,
                         "layer_type": pathway.layer_type,
                         "priority_layers": pathway.priority_layers,
+                        "pathway_type": pathway.pathway_type,
                     }
                 )
             input_dict["activities"].append(activity_dict)
         return input_dict
+
+    @classmethod
+    def from_dict(cls, input_dict: dict) -> "TaskConfig":
+        """Create the task config from its dictionary, the inverse of
+        to_dict. A new scenario UUID is generated when the dictionary has
+        no scenario_uuid key.
+
+        :param input_dict: Dictionary of task config
+        :type input_dict: dict
+
+        :return: Task config
+        :rtype: TaskConfig
+        """
+        activities = []
+        for activity_dict in input_dict.get("activities", []):
+            pathways = [
+                NcsPathway(
+                    uuid=uuid.UUID(str(pathway_dict["uuid"])),
+                    name=pathway_dict["name"],
+                    description=pathway_dict.get("description", ""),
+                    path=pathway_dict.get("path", ""),
+                    layer_type=LayerType(
+                        pathway_dict.get("layer_type", LayerType.UNDEFINED)
+                    ),
+                    priority_layers=pathway_dict.get("priority_layers", []),
+                    pathway_type=NcsPathwayType(
+                        pathway_dict.get("pathway_type", NcsPathwayType.UNDEFINED)
+                    ),
+                )
+                for pathway_dict in activity_dict.get("pathways", [])
+            ]
+            activities.append(
+                Activity(
+                    uuid=uuid.UUID(str(activity_dict["uuid"])),
+                    name=activity_dict["name"],
+                    description=activity_dict.get("description", ""),
+                    path=activity_dict.get("path", ""),
+                    layer_type=LayerType(
+                        activity_dict.get("layer_type", LayerType.UNDEFINED)
+                    ),
+                    user_defined=activity_dict.get("user_defined", False),
+                    pathways=pathways,
+                    layer_styles=activity_dict.get("layer_styles", {}),
+                    mask_paths=activity_dict.get("mask_paths", []),
+                    style_pixel_value=activity_dict.get("style_pixel_value", -1),
+                )
+            )
+
+        priority_layer_groups = input_dict.get("priority_layer_groups", [])
+        scenario_uuid = input_dict.get("scenario_uuid")
+        scenario = Scenario(
+            uuid=uuid.UUID(str(scenario_uuid)) if scenario_uuid else uuid.uuid4(),
+            name=input_dict.get("scenario_name", ""),
+            description=input_dict.get("scenario_desc", ""),
+            extent=SpatialExtent(bbox=input_dict.get("extent", [])),
+            activities=activities,
+            weighted_activities=[],
+            priority_layer_groups=priority_layer_groups,
+        )
+
+        parameters = inspect.signature(cls.__init__).parameters
+        options = {
+            key: value
+            for key, value in input_dict.items()
+            if key in parameters
+            and key
+            not in (
+                "self",
+                "scenario",
+                "priority_layers",
+                "priority_layer_groups",
+                "analysis_activities",
+                "all_activities",
+            )
+        }
+
+        return cls(
+            scenario,
+            input_dict.get("priority_layers", []),
+            priority_layer_groups,
+            activities,
+            activities,
+            **options,
+        )
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""
+    Batched weighting of the pathways through a sparse pathway by layer
+    coefficient matrix.
+
+    Every distinct layer, either a pathway or a priority weighting layer,
+    is a column of the matrix and every pathway is a row. A window block
+    of each layer is read once and accumulated into all the pathways
+    that use it, so the work scales with the number of distinct layers
+    instead of the number of pathway and layer pairs.
+"""
+
+import typing
+
+import numpy as np
+
+from . import kernels
+from .expressions import LinearExpression
+
+
+class CoefficientMatrix:
+    """Sparse pathway by layer coefficient matrix stored by column."""
+
+    def __init__(
+        self,
+        rows: typing.List[str],
+        layers: typing.List[str],
+        columns: typing.List[typing.Tuple[np.ndarray, np.ndarray]],
+        constants: np.ndarray = None,
+    ):
+        """
+        :param rows: Identifiers of the matrix rows
+        :type rows: typing.List[str]
+
+        :param layers: Layer paths of the matrix columns
+        :type layers: typing.List[str]
+
+        :param columns: Row indices and coefficients of each column
+        :type columns: typing.List[typing.Tuple[np.ndarray, np.ndarray]]
+
+        :param constants: Constant of each row, zero when not set
+        :type constants: np.ndarray
+        """
+        self.rows = rows
+        self.layers = layers
+        self.columns = columns
+        self.constants = (
+            constants
+            if constants is not None
+            else np.zeros(len(rows), dtype=np.float32)
+        )
+
+    @classmethod
+    def from_terms(
+        cls, terms: typing.Dict[str, typing.List[typing.Tuple[str, float]]]
+    ) -> "CoefficientMatrix":
+        """Compiles the weighting terms of the pathways into a matrix.
+
+        :param terms: Layer paths and coefficients of each row identifier
+        :type terms: typing.Dict[str, typing.List[typing.Tuple[str, float]]]
+
+        :returns: Coefficient matrix
+        :rtype: CoefficientMatrix
+        """
+        return cls.from_expressions(
+            {
+                row: LinearExpression.from_terms(row_terms)
+                for row, row_terms in terms.items()
+            }
+        )
+
+    @classmethod
+    def from_expressions(
+        cls, expressions: typing.Dict[str, LinearExpression]
+    ) -> "CoefficientMatrix":
+        """Compiles the weighting expressions of the pathways into a
+        matrix, the expressions are folded first so a layer repeated in
+        an expression is a single entry.
+
+        :param expressions: Weighting expression of each row identifier
+        :type expressions: typing.Dict[str, LinearExpression]
+
+        :returns: Coefficient matrix
+        :rtype: CoefficientMatrix
+        """
+        rows = list(expressions)
+        layers = []
+        entries: typing.Dict[str, typing.Dict[int, float]] = {}
+        constants = np.zeros(len(rows), dtype=np.float32)
+
+        for row, expression in enumerate(expressions.values()):
+            expression = expression.fold()
+            constants[row] = expression.constant
+            for term in expression.terms:
+                if term.layer not in entries:
+                    layers.append(term.layer)
+                    entries[term.layer] = {}
+                entries[term.layer][row] = term.coefficient
+
+        columns = [
+            (
+                np.fromiter(entries[path].keys(), dtype=np.intp),
+                np.fromiter(entries[path].values(), dtype=np.float32),
+            )
+            for path in layers
+        ]
+
+        return cls(rows, layers, columns, constants)
+
+    def dense(self) -> np.ndarray:
+        """Returns the matrix as a dense array of rows by layers.
+
+        :returns: Dense coefficient matrix
+        :rtype: np.ndarray
+        """
+        matrix = np.zeros((len(self.rows), len(self.layers)), dtype=np.float32)
+        for column, (rows, coefficients) in enumerate(self.columns):
+            matrix[rows, column] = coefficients
+
+        return matrix
+
+    def accumulate(
+        self, blocks: typing.Sequence[kernels.Block]
+    ) -> typing.Dict[str, kernels.Block]:
+        """Computes the weighted sum of every row from the window blocks
+        of the layers, a nodata pixel in any of the row layers results
+        in a nodata output pixel as in the raster calculator.
+
+        :param blocks: Values and valid masks of the layers, in the
+        matrix columns order
+        :type blocks: typing.Sequence[kernels.Block]
+
+        :returns: Weighted values and valid mask of each row identifier
+        :rtype: typing.Dict[str, kernels.Block]
+        """
+        if not self.rows:
+            return {}
+
+        shape = (len(self.rows),) + blocks[0][0].shape
+        values = np.empty(shape, dtype=np.float32)
+        values[:] = self.constants[:, None, None]
+        valid = np.ones(shape, dtype=bool)
+
+        for (rows, coefficients), (layer_values, layer_valid) in zip(
+            self.columns, blocks
+        ):
+            values[rows] += coefficients[:, None, None] * layer_values
+            valid[rows] &= layer_valid
+
+        return {
+            row: (values[index], valid[index]) for index, row in enumerate(self.rows)
+        }
@@ -26,3 +26,13 @@ class DEFAULT_VALUES(object):
     landuse_normalized = True
     landuse_weighted = True
     highest_position = True
+    fused_engine_enabled = False
+    memory_budget = 512
+    parallel_workers = 1
+    tile_size = 4096
+    batched_weighting = False
+    native_highest_position = False
+    raster_masking = False
+    warp_multithreading = False
+    streaming_statistics = False
+    cache_max_size = 10240
@@ -10,19 +10,15 @@ import os.path
 import typing
 from uuid import UUID
 
-from qgis.core import (
-    QgsColorBrewerColorRamp,
-    QgsColorRamp,
-    QgsCptCityColorRamp,
-    QgsFillSymbol,
-    QgsGradientColorRamp,
-    QgsLimitedRandomColorRamp,
-    QgsMapLayer,
-    QgsPresetSchemeColorRamp,
-    QgsRandomColorRamp,
-    QgsRasterLayer,
-    QgsVectorLayer,
-)
+# QGIS classes are imported where they are used, so the models can be
+# created and serialized without loading QGIS.
+if typing.TYPE_CHECKING:
+    from qgis.core import (
+        QgsColorRamp,
+        QgsFillSymbol,
+        QgsMapLayer,
+        QgsRasterLayer,
+    )
 
 from ..definitions.constants import (
     COLOR_RAMP_PROPERTIES_ATTRIBUTE,
@@ -166,13 +162,15 @@ class LayerModelComponent(BaseModelComponent):
         if not layer.isValid():
             return
 
+        from qgis.core import QgsRasterLayer, QgsVectorLayer
+
         if isinstance(layer, QgsRasterLayer):
             self.layer_type = LayerType.RASTER
 
         elif isinstance(layer, QgsVectorLayer):
             self.layer_type = LayerType.VECTOR
 
-    def to_map_layer(self) -> typing.Union[QgsMapLayer, None]:
+    def to_map_layer(self) -> typing.Union["QgsMapLayer", None]:
         """Constructs a map layer from the specified path.
 
         It will first check if the layer property has been set
@@ -186,6 +184,8 @@ class LayerModelComponent(BaseModelComponent):
         if not os.path.exists(self.path):
             return None
 
+        from qgis.core import QgsRasterLayer, QgsVectorLayer
+
         layer = None
         if self.layer_type == LayerType.RASTER:
             layer = QgsRasterLayer(self.path, self.name)
@@ -338,7 +338,7 @@ class NcsPathway(LayerModelComponent):
 
         return True
 
-    def pw_layers(self) -> typing.List[QgsRasterLayer]:
+    def pw_layers(self) -> typing.List["QgsRasterLayer"]:
         """Returns the list of priority weighting layers defined under
         the :py:attr:`~priority_layers` attribute.
 
@@ -346,6 +346,8 @@ class NcsPathway(LayerModelComponent):
         if the path is not defined.
         :rtype: list
         """
+        from qgis.core import QgsRasterLayer
+
         return [
             QgsRasterLayer(layer.get("path"))
             for layer in self.priority_layers
@@ -490,7 +492,7 @@ class Activity(LayerModelComponent):
 
         return pathways[0]
 
-    def pw_layers(self) -> typing.List[QgsRasterLayer]:
+    def pw_layers(self) -> typing.List["QgsRasterLayer"]:
         """Returns the list of priority weighting layers defined under
         the :py:attr:`~priority_layers` attribute.
 
@@ -498,6 +500,8 @@ class Activity(LayerModelComponent):
         if the path is not defined.
         :rtype: list
         """
+        from qgis.core import QgsRasterLayer
+
         return [
             QgsRasterLayer(layer.get("path"))
             for layer in self.priority_layers
@@ -572,7 +576,7 @@ class Activity(LayerModelComponent):
 
         return self.layer_styles[ACTIVITY_LAYER_STYLE_ATTRIBUTE]
 
-    def scenario_fill_symbol(self) -> typing.Union[QgsFillSymbol, None]:
+    def scenario_fill_symbol(self) -> typing.Union["QgsFillSymbol", None]:
         """Creates a fill symbol for the activity in the scenario.
 
         :returns: Fill symbol for the activity in the scenario
@@ -583,9 +587,11 @@ class Activity(LayerModelComponent):
         if len(scenario_style_info) == 0:
             return None
 
+        from qgis.core import QgsFillSymbol
+
         return QgsFillSymbol.createSimple(scenario_style_info)
 
-    def color_ramp(self) -> typing.Union[QgsColorRamp, None]:
+    def color_ramp(self) -> typing.Union["QgsColorRamp", None]:
         """Create a color ramp for styling the activity layer resulting
         from a scenario run.
 
@@ -605,6 +611,15 @@ class Activity(LayerModelComponent):
         if ramp_type is None:
             return None
 
+        from qgis.core import (
+            QgsColorBrewerColorRamp,
+            QgsCptCityColorRamp,
+            QgsGradientColorRamp,
+            QgsLimitedRandomColorRamp,
+            QgsPresetSchemeColorRamp,
+            QgsRandomColorRamp,
+        )
+
         # New ramp types will need to be added here manually
         if ramp_type == QgsColorBrewerColorRamp.typeString():
             return QgsColorBrewerColorRamp.create(ramp_info)
@@ -655,3 +670,6 @@ class ScenarioResult:
     analysis_output: typing.Dict = None
     output_layer_name: str = ""
     scenario_directory: str = ""
+    # Timing, I/O and memory metrics of the analysis stages, records
+    # of the running stages are appended as the stages complete.
+    stage_metrics: typing.List = dataclasses.field(default_factory=list)
@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+"""
+    QGIS application of the analysis run outside of the QGIS desktop.
+"""
+
+
+def init_qgis():
+    """Initializes the QGIS application and processing without a GUI.
+
+    :returns: QGIS application
+    :rtype: QgsApplication
+    """
+    from qgis.core import QgsApplication
+    from qgis.analysis import QgsNativeAlgorithms
+    from processing.core.Processing import Processing
+
+    application = QgsApplication([], False)
+    application.initQgis()
+    Processing.initialize()
+    QgsApplication.processingRegistry().addProvider(QgsNativeAlgorithms())
+
+    return application
@@ -0,0 +1,369 @@
+# -*- coding: utf-8 -*-
+"""
+    Persistent content-addressed cache of the analysis stage outputs.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import typing
+import uuid
+
+from .statistics import STATISTICS_SUFFIX, statistics_path
+
+# Size of the chunks read when hashing file contents.
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def file_identity(path: str, content_hash: bool = False) -> typing.Dict:
+    """Returns the identity of a file used in the cache keys, based on
+    its path, size and modification time or on its content hash.
+    Sources that are not local files are identified by their URI.
+
+    :param path: File path or layer URI
+    :type path: str
+
+    :param content_hash: Whether to hash the file content
+    :type content_hash: bool
+
+    :returns: File identity
+    :rtype: typing.Dict
+    """
+    if not path or not os.path.isfile(path):
+        return {"uri": str(path)}
+
+    stat = os.stat(path)
+    if not content_hash:
+        return {
+            "path": os.path.abspath(path),
+            "size": stat.st_size,
+            "mtime": stat.st_mtime_ns,
+        }
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+
+    return {"size": stat.st_size, "sha256": digest.hexdigest()}
+
+
+class StageCache:
+    """Cache of stage output rasters stored in a directory shared
+    between runs. Entries are evicted in least recently used order once
+    the cache grows beyond its maximum size.
+
+    Each entry is a raster named after its key along with a JSON
+    sidecar holding the entry size and last access time. Outputs are
+    linked into the cache and entries are linked out of it, so the
+    analysis never reads a file inside the cache that eviction could
+    remove. The pinned keys and aliases are guarded by a lock so the
+    cache can be used by the snapping threads.
+    """
+
+    def __init__(self, directory: str, max_size: int = 0):
+        """
+        :param directory: Cache directory
+        :type directory: str
+
+        :param max_size: Maximum cache size in bytes, zero for no limit
+        :type max_size: int
+        """
+        self.directory = directory
+        self.max_size = max_size
+        os.makedirs(directory, exist_ok=True)
+
+        # Keys stored or fetched through this cache, never evicted by it
+        self.pinned: typing.Set[str] = set()
+
+        # Identities of the files linked to or from the entries, so keys
+        # computed from them do not depend on their location
+        self.aliases: typing.Dict[str, typing.Dict] = {}
+        self._lock = threading.RLock()
+
+    def key(
+        self,
+        stage: str,
+        inputs: typing.List[str],
+        params: typing.Dict,
+        extent: str = "",
+        reference: str = "",
+    ) -> str:
+        """Computes the cache key of a stage output.
+
+        :param stage: Stage name
+        :type stage: str
+
+        :param inputs: Paths of the stage inputs
+        :type inputs: typing.List[str]
+
+        :param params: Stage parameters, excluding the inputs and output
+        :type params: typing.Dict
+
+        :param extent: Processing extent
+        :type extent: str
+
+        :param reference: Path of the reference layer
+        :type reference: str
+
+        :returns: Cache key
+        :rtype: str
+        """
+        identity = {
+            "stage": stage,
+            "inputs": [self._entry_identity(path) for path in inputs],
+            "params": params,
+            "extent": extent,
+            "reference": self._entry_identity(reference) if reference else "",
+        }
+        content = json.dumps(identity, sort_keys=True, default=str)
+
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+    def fetch(self, key: str) -> typing.Union[str, None]:
+        """Returns the cached output of the key, updating its last
+        access time.
+
+        :param key: Cache key
+        :type key: str
+
+        :returns: Path of the cached raster or None if there is no entry
+        :rtype: typing.Union[str, None]
+        """
+        path = self.entry_path(key)
+        if not os.path.exists(path):
+            return None
+
+        with self._lock:
+            self.pinned.add(key)
+        self._write_metadata(key, os.path.getsize(path))
+
+        return path
+
+    def materialize(self, key: str, output_path: str) -> typing.Union[str, None]:
+        """Links or copies the cached output of the key, along with its
+        statistics sidecar, to the output path.
+
+        :param key: Cache key
+        :type key: str
+
+        :param output_path: Path the cached raster is placed at
+        :type output_path: str
+
+        :returns: Output path or None if there is no entry
+        :rtype: typing.Union[str, None]
+        """
+        entry_path = self.fetch(key)
+        if entry_path is None:
+            return None
+
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        try:
+            self._place(entry_path, output_path)
+            if os.path.exists(statistics_path(entry_path)):
+                self._place(statistics_path(entry_path), statistics_path(output_path))
+        except FileNotFoundError:
+            # Evicted by another process since the lookup
+            return None
+
+        self.add_alias(output_path, {"entry": os.path.basename(entry_path)})
+
+        return output_path
+
+    def store(self, key: str, path: str) -> str:
+        """Adds the output raster to the cache. Files are hard linked
+        when possible and copied otherwise, the entry is renamed into
+        place so concurrent readers never see partial files. The
+        statistics sidecar of the raster is stored along with it.
+
+        :param key: Cache key
+        :type key: str
+
+        :param path: Path of the output raster
+        :type path: str
+
+        :returns: Path of the cached raster
+        :rtype: str
+        """
+        entry_path = self.entry_path(key)
+        self._place(path, entry_path)
+        if os.path.exists(statistics_path(path)):
+            self._place(statistics_path(path), statistics_path(entry_path))
+
+        with self._lock:
+            self.pinned.add(key)
+        self.add_alias(path, {"entry": os.path.basename(entry_path)})
+        self._write_metadata(key, os.path.getsize(entry_path))
+        self.evict()
+
+        return entry_path
+
+    def add_alias(self, path: str, identity: typing.Dict):
+        """Records the identity used in the keys computed from a file
+        linked to or from an entry.
+
+        :param path: File path
+        :type path: str
+
+        :param identity: Identity of the file in the cache keys
+        :type identity: typing.Dict
+        """
+        with self._lock:
+            self.aliases[os.path.abspath(path)] = identity
+
+    def _place(self, path: str, entry_path: str):
+        """Links or copies the file into the entry path, copies keep the
+        modification time checked by the statistics sidecars.
+        """
+        temporary_path = f"{entry_path}.{uuid.uuid4().hex}.tmp"
+
+        try:
+            os.link(path, temporary_path)
+        except OSError:
+            shutil.copy2(path, temporary_path)
+        os.replace(temporary_path, entry_path)
+
+    def entry_path(self, key: str) -> str:
+        """Returns the raster path of the key entry."""
+        return os.path.join(self.directory, f"{key}.tif")
+
+    def entries(self) -> typing.List[typing.Dict]:
+        """Returns the metadata of the cache entries.
+
+        :returns: List of entries metadata
+        :rtype: typing.List[typing.Dict]
+        """
+        entries = []
+        for file_name in os.listdir(self.directory):
+            if not file_name.endswith(".json") or file_name.endswith(STATISTICS_SUFFIX):
+                continue
+            try:
+                with open(os.path.join(self.directory, file_name)) as f:
+                    entries.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+
+        return entries
+
+    def evict(self, keep: typing.List[str] = None):
+        """Removes the least recently used entries until the cache
+        fits its maximum size.
+
+        :param keep: Keys that must not be evicted, in addition to the
+        pinned keys
+        :type keep: typing.List[str]
+        """
+        if self.max_size <= 0:
+            return
+
+        with self._lock:
+            keep = self.pinned.union(keep or [])
+        entries = sorted(self.entries(), key=lambda entry: entry["last_access"])
+        total_size = sum(entry["size"] for entry in entries)
+
+        for entry in entries:
+            if total_size <= self.max_size:
+                break
+            if entry["key"] in keep:
+                continue
+
+            for path in (
+                self.entry_path(entry["key"]),
+                statistics_path(self.entry_path(entry["key"])),
+                self._metadata_path(entry["key"]),
+            ):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            total_size -= entry["size"]
+
+    def _entry_identity(self, path: str) -> typing.Dict:
+        """Cache entries and the files linked to or from them are
+        immutable so they are identified by their key, other files use
+        their file identity.
+        """
+        with self._lock:
+            alias = self.aliases.get(os.path.abspath(path)) if path else None
+        if alias is not None:
+            return alias
+
+        if path and os.path.dirname(os.path.abspath(path)) == os.path.abspath(
+            self.directory
+        ):
+            return {"entry": os.path.basename(path)}
+
+        return file_identity(path)
+
+    def _metadata_path(self, key: str) -> str:
+        """Returns the metadata sidecar path of the key entry."""
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _write_metadata(self, key: str, size: int):
+        """Writes the entry metadata with the current access time."""
+        metadata_path = self._metadata_path(key)
+        temporary_path = f"{metadata_path}.{uuid.uuid4().hex}.tmp"
+        with open(temporary_path, "w") as f:
+            json.dump({"key": key, "size": size, "last_access": time.time()}, f)
+        os.replace(temporary_path, metadata_path)
+
+
+class SnapStore(StageCache):
+    """Store of snapped layers shared between runs and concurrent
+    workers. Entries are keyed by the source layer and the snapping grid
+    and options, so any run snapping the same layer onto the same grid
+    reuses the stored layer.
+    """
+
+    def layer_key(
+        self,
+        input_path: str,
+        grid: typing.Dict,
+        extent: str,
+        snap_method: int,
+        snap_rescale: bool,
+        nodata_value: float,
+        options: typing.Dict = None,
+    ) -> str:
+        """Computes the store key of a snapped layer.
+
+        :param input_path: Source layer path
+        :type input_path: str
+
+        :param grid: Definition of the reference layer grid
+        :type grid: typing.Dict
+
+        :param extent: Clip extent
+        :type extent: str
+
+        :param snap_method: Resampling method
+        :type snap_method: int
+
+        :param snap_rescale: Whether the values are rescaled
+        :type snap_rescale: bool
+
+        :param nodata_value: Nodata value of the snapped layer
+        :type nodata_value: float
+
+        :param options: Snap backend and other options changing the
+        snapped layer
+        :type options: typing.Dict
+
+        :returns: Store key
+        :rtype: str
+        """
+        return self.key(
+            "snap",
+            [input_path],
+            {
+                "grid": grid,
+                "snap_method": snap_method,
+                "snap_rescale": snap_rescale,
+                "nodata_value": nodata_value,
+                "options": options or {},
+            },
+            extent,
+        )
@@ -46,3 +46,23 @@ class Settings(enum.Enum):
     LANDUSE_NORMALIZED = "landuse_normalized"
     LANDUSE_WEIGHTED = "landuse_weighted"
     HIGHEST_POSITION = "highest_position"
+
+    # Native raster engine
+    FUSED_ENGINE_ENABLED = "fused_engine_enabled"
+    MEMORY_BUDGET = "memory_budget"
+    PARALLEL_WORKERS = "parallel_workers"
+    TILE_SIZE = "tile_size"
+    BATCHED_WEIGHTING = "batched_weighting"
+    NATIVE_HIGHEST_POSITION = "native_highest_position"
+    RASTER_MASKING = "raster_masking"
+    WARP_MULTITHREADING = "warp_multithreading"
+    STREAMING_STATISTICS = "streaming_statistics"
+    STAGE_BACKENDS = "stage_backends"
+
+    # Stage outputs cache
+    CACHE_DIR = "cache_dir"
+    CACHE_MAX_SIZE = "cache_max_size"
+    SNAP_STORE_DIR = "snap_store_dir"
+
+    # Incremental analysis
+    PREVIOUS_RUN_DIR = "previous_run_dir"
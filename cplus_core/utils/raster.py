@@ -0,0 +1,765 @@
+# -*- coding: utf-8 -*-
+"""
+    Raster grid and windowed input/output utilities used by the
+    native analysis engine.
+"""
+
+import dataclasses
+import math
+import typing
+
+import numpy as np
+from osgeo import gdal, osr
+
+from ..definitions.constants import NO_DATA_VALUE
+from .statistics import RasterStatistics, write_statistics
+
+
+# Relative tolerance used when comparing pixel sizes and grid origins.
+GRID_TOLERANCE = 1e-6
+
+
+@dataclasses.dataclass
+class Window:
+    """Rectangular block of pixels on a raster grid."""
+
+    col_off: int
+    row_off: int
+    width: int
+    height: int
+
+
+@dataclasses.dataclass
+class RasterGrid:
+    """North-up raster grid definition that all the engine
+    inputs and outputs are aligned to.
+    """
+
+    x_min: float
+    y_max: float
+    x_res: float
+    y_res: float
+    width: int
+    height: int
+    crs_wkt: str = ""
+
+    @classmethod
+    def from_extent(
+        cls,
+        x_min: float,
+        x_max: float,
+        y_min: float,
+        y_max: float,
+        x_res: float,
+        y_res: float,
+        crs_wkt: str = "",
+    ) -> "RasterGrid":
+        """Creates a grid covering the passed extent with the given
+        pixel size.
+
+        :param x_min: Minimum x coordinate of the extent
+        :type x_min: float
+
+        :param x_max: Maximum x coordinate of the extent
+        :type x_max: float
+
+        :param y_min: Minimum y coordinate of the extent
+        :type y_min: float
+
+        :param y_max: Maximum y coordinate of the extent
+        :type y_max: float
+
+        :param x_res: Pixel width
+        :type x_res: float
+
+        :param y_res: Pixel height, as a positive value
+        :type y_res: float
+
+        :param crs_wkt: WKT definition of the grid CRS
+        :type crs_wkt: str
+
+        :returns: Raster grid
+        :rtype: RasterGrid
+        """
+        x_res = abs(x_res)
+        y_res = abs(y_res)
+        width = max(int(round((x_max - x_min) / x_res)), 1)
+        height = max(int(round((y_max - y_min) / y_res)), 1)
+
+        return cls(x_min, y_max, x_res, y_res, width, height, crs_wkt)
+
+    @classmethod
+    def from_dataset(cls, dataset: gdal.Dataset) -> "RasterGrid":
+        """Creates the grid of a north-up raster dataset.
+
+        :param dataset: Raster dataset
+        :type dataset: gdal.Dataset
+
+        :returns: Raster grid
+        :rtype: RasterGrid
+        """
+        x_min, x_res, _, y_max, _, y_res = dataset.GetGeoTransform()
+
+        return cls(
+            x_min,
+            y_max,
+            abs(x_res),
+            abs(y_res),
+            dataset.RasterXSize,
+            dataset.RasterYSize,
+            dataset.GetProjection(),
+        )
+
+    @property
+    def x_max(self) -> float:
+        """Maximum x coordinate of the grid."""
+        return self.x_min + self.width * self.x_res
+
+    @property
+    def y_min(self) -> float:
+        """Minimum y coordinate of the grid."""
+        return self.y_max - self.height * self.y_res
+
+    @property
+    def bounds(self) -> typing.Tuple[float, float, float, float]:
+        """Grid bounds as (x_min, y_min, x_max, y_max)."""
+        return self.x_min, self.y_min, self.x_max, self.y_max
+
+    @property
+    def geotransform(self) -> typing.Tuple[float, ...]:
+        """GDAL geotransform of the grid."""
+        return self.x_min, self.x_res, 0.0, self.y_max, 0.0, -self.y_res
+
+    def window_grid(self, window: Window) -> "RasterGrid":
+        """Returns the grid covered by the passed window.
+
+        :param window: Window on this grid
+        :type window: Window
+
+        :returns: Grid of the window
+        :rtype: RasterGrid
+        """
+        return RasterGrid(
+            self.x_min + window.col_off * self.x_res,
+            self.y_max - window.row_off * self.y_res,
+            self.x_res,
+            self.y_res,
+            window.width,
+            window.height,
+            self.crs_wkt,
+        )
+
+
+def _spans(
+    size: int, step: int, phase: int = 0
+) -> typing.Iterator[typing.Tuple[int, int]]:
+    """Splits a grid dimension into (offset, length) spans of the given
+    step, the first span ends at the phase offset when it is set.
+    """
+    offset = 0
+    if 0 < phase < size:
+        yield 0, phase
+        offset = phase
+
+    while offset < size:
+        yield offset, min(step, size - offset)
+        offset += step
+
+
+def iter_windows(
+    grid: RasterGrid,
+    window_width: int,
+    window_height: int,
+    col_phase: int = 0,
+    row_phase: int = 0,
+) -> typing.Iterator[Window]:
+    """Iterates the grid in windows of the given size, row by row.
+    Windows on the right and bottom edges are clipped to the grid.
+
+    The phases shift the window boundaries so that they coincide with
+    the internal blocks of a source raster, see :py:func:`block_layout`.
+
+    :param grid: Grid to iterate
+    :type grid: RasterGrid
+
+    :param window_width: Window width in pixels
+    :type window_width: int
+
+    :param window_height: Window height in pixels
+    :type window_height: int
+
+    :param col_phase: Grid column of the first block boundary
+    :type col_phase: int
+
+    :param row_phase: Grid row of the first block boundary
+    :type row_phase: int
+
+    :returns: Iterator of the grid windows
+    :rtype: typing.Iterator[Window]
+    """
+    window_width = max(int(window_width), 1)
+    window_height = max(int(window_height), 1)
+
+    for row_off, height in _spans(grid.height, window_height, row_phase):
+        for col_off, width in _spans(grid.width, window_width, col_phase):
+            yield Window(col_off, row_off, width, height)
+
+
+def block_layout(path: str, grid: RasterGrid) -> typing.Tuple[int, int, int, int]:
+    """Returns the internal block size of the raster and the grid
+    column and row of its first block boundaries.
+
+    :param path: Raster path
+    :type path: str
+
+    :param grid: Target grid
+    :type grid: RasterGrid
+
+    :returns: Block width, block height, column phase and row phase.
+    The phases are zero when the raster is not aligned with the grid.
+    :rtype: typing.Tuple[int, int, int, int]
+    """
+    dataset = gdal.Open(path)
+    if dataset is None:
+        raise ValueError(f"Unable to open raster {path}")
+
+    block_width, block_height = dataset.GetRasterBand(1).GetBlockSize()
+    offsets = grid_offsets(dataset, grid)
+    if offsets is None:
+        return block_width, block_height, 0, 0
+
+    col, row = offsets
+
+    return block_width, block_height, (-col) % block_width, (-row) % block_height
+
+
+def plan_window_size(
+    grid: RasterGrid,
+    bytes_per_pixel: int,
+    memory_budget: int,
+    block_width: int = 256,
+    block_height: int = 256,
+) -> typing.Tuple[int, int]:
+    """Computes the largest window, in multiples of the block size,
+    whose working set fits the memory budget. Full width strips are
+    preferred, narrower windows are used when a single strip of blocks
+    does not fit.
+
+    :param grid: Grid to iterate
+    :type grid: RasterGrid
+
+    :param bytes_per_pixel: Working memory needed for each window pixel
+    :type bytes_per_pixel: int
+
+    :param memory_budget: Memory budget in bytes
+    :type memory_budget: int
+
+    :param block_width: Width of the source internal blocks
+    :type block_width: int
+
+    :param block_height: Height of the source internal blocks
+    :type block_height: int
+
+    :returns: Window width and height in pixels
+    :rtype: typing.Tuple[int, int]
+    """
+    block_width = max(min(block_width, grid.width), 1)
+    block_height = max(min(block_height, grid.height), 1)
+    budget_pixels = max(memory_budget // max(bytes_per_pixel, 1), 1)
+
+    strip_pixels = grid.width * block_height
+    if budget_pixels >= strip_pixels:
+        strips = budget_pixels // strip_pixels
+        return grid.width, min(strips * block_height, grid.height)
+
+    blocks = max(budget_pixels // (block_width * block_height), 1)
+
+    return min(blocks * block_width, grid.width), block_height
+
+
+def same_crs(first_wkt: str, second_wkt: str) -> bool:
+    """Checks if the two CRS definitions are equivalent. Empty
+    definitions are considered as matching any CRS.
+
+    :param first_wkt: First CRS WKT
+    :type first_wkt: str
+
+    :param second_wkt: Second CRS WKT
+    :type second_wkt: str
+
+    :returns: Whether the CRS definitions are the same
+    :rtype: bool
+    """
+    if not first_wkt or not second_wkt:
+        return True
+
+    first = osr.SpatialReference()
+    first.ImportFromWkt(first_wkt)
+    second = osr.SpatialReference()
+    second.ImportFromWkt(second_wkt)
+
+    return bool(first.IsSame(second))
+
+
+def grid_offsets(
+    dataset: gdal.Dataset, grid: RasterGrid
+) -> typing.Union[typing.Tuple[int, int], None]:
+    """Returns the pixel offsets of the grid origin in the dataset if
+    the dataset pixels are aligned with the grid.
+
+    :param dataset: Source dataset
+    :type dataset: gdal.Dataset
+
+    :param grid: Target grid
+    :type grid: RasterGrid
+
+    :returns: Column and row offsets of the grid origin in the dataset
+    or None if the dataset is not aligned with the grid.
+    :rtype: typing.Union[typing.Tuple[int, int], None]
+    """
+    transform = dataset.GetGeoTransform()
+    if transform[2] != 0 or transform[4] != 0:
+        return None
+
+    x_res = transform[1]
+    y_res = -transform[5]
+
+    if (
+        abs(x_res - grid.x_res) > GRID_TOLERANCE * grid.x_res
+        or abs(y_res - grid.y_res) > GRID_TOLERANCE * grid.y_res
+    ):
+        return None
+
+    col = (grid.x_min - transform[0]) / grid.x_res
+    row = (transform[3] - grid.y_max) / grid.y_res
+
+    if abs(col - round(col)) > GRID_TOLERANCE or abs(row - round(row)) > GRID_TOLERANCE:
+        return None
+
+    if not same_crs(dataset.GetProjection(), grid.crs_wkt):
+        return None
+
+    return int(round(col)), int(round(row))
+
+
+class GridSource:
+    """Reads windows of a raster band on a target grid.
+
+    Sources that are already aligned with the grid are read directly,
+    otherwise they are exposed through a virtual warped dataset
+    with the grid definition.
+    """
+
+    def __init__(self, path: str, grid: RasterGrid, band: int = 1):
+        dataset = gdal.Open(path)
+        if dataset is None:
+            raise ValueError(f"Unable to open raster {path}")
+
+        source_band = dataset.GetRasterBand(band)
+        nodata = source_band.GetNoDataValue()
+        offsets = grid_offsets(dataset, grid)
+
+        if offsets is None:
+            dataset = gdal.Warp(
+                "",
+                dataset,
+                format="VRT",
+                outputBounds=grid.bounds,
+                width=grid.width,
+                height=grid.height,
+                dstSRS=grid.crs_wkt or None,
+                srcNodata=nodata,
+                dstNodata=nodata if nodata is not None else NO_DATA_VALUE,
+                resampleAlg="near",
+            )
+            if dataset is None:
+                raise ValueError(f"Unable to align raster {path} to the grid")
+            nodata = dataset.GetRasterBand(band).GetNoDataValue()
+            offsets = (0, 0)
+
+        self.path = path
+        self.dataset = dataset
+        self.band = dataset.GetRasterBand(band)
+        self.nodata = nodata
+        self.col_offset, self.row_offset = offsets
+
+    def read(self, window: Window) -> typing.Tuple[np.ndarray, np.ndarray]:
+        """Reads the passed grid window, pixels outside the source
+        are returned as invalid.
+
+        :param window: Grid window
+        :type window: Window
+
+        :returns: Float32 values and the boolean mask of the valid pixels
+        :rtype: typing.Tuple[np.ndarray, np.ndarray]
+        """
+        values = np.zeros((window.height, window.width), dtype=np.float32)
+        valid = np.zeros((window.height, window.width), dtype=bool)
+
+        col = window.col_off + self.col_offset
+        row = window.row_off + self.row_offset
+        x_start = max(col, 0)
+        y_start = max(row, 0)
+        x_end = min(col + window.width, self.dataset.RasterXSize)
+        y_end = min(row + window.height, self.dataset.RasterYSize)
+
+        if x_end <= x_start or y_end <= y_start:
+            return values, valid
+
+        block = self.band.ReadAsArray(
+            x_start, y_start, x_end - x_start, y_end - y_start
+        )
+        block_valid = ~np.isnan(block) if block.dtype.kind == "f" else True
+        if self.nodata is not None and not math.isnan(self.nodata):
+            block_valid = block_valid & (block != self.nodata)
+
+        rows = slice(y_start - row, y_end - row)
+        cols = slice(x_start - col, x_end - col)
+        values[rows, cols] = block
+        valid[rows, cols] = block_valid
+
+        return values, valid
+
+    def close(self):
+        """Releases the source dataset."""
+        self.band = None
+        self.dataset = None
+
+
+class GridWriter:
+    """Writes windows of a single band GeoTIFF on a target grid,
+    optionally gathering the statistics of the written pixels.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        grid: RasterGrid,
+        data_type: int = gdal.GDT_Float32,
+        nodata: float = NO_DATA_VALUE,
+        statistics: bool = False,
+    ):
+        driver = gdal.GetDriverByName("GTiff")
+        dataset = driver.Create(
+            path,
+            grid.width,
+            grid.height,
+            1,
+            data_type,
+            options=["TILED=YES", "BIGTIFF=IF_SAFER"],
+        )
+        if dataset is None:
+            raise ValueError(f"Unable to create raster {path}")
+
+        dataset.SetGeoTransform(grid.geotransform)
+        if grid.crs_wkt:
+            dataset.SetProjection(grid.crs_wkt)
+
+        band = dataset.GetRasterBand(1)
+        band.SetNoDataValue(nodata)
+
+        self.path = path
+        self.nodata = nodata
+        self.dataset = dataset
+        self.band = band
+        self.statistics = RasterStatistics() if statistics else None
+
+    def write(self, window: Window, values: np.ndarray, valid: np.ndarray):
+        """Writes the window values, invalid pixels are written as nodata.
+
+        :param window: Grid window
+        :type window: Window
+
+        :param values: Window values
+        :type values: np.ndarray
+
+        :param valid: Boolean mask of the valid pixels
+        :type valid: np.ndarray
+        """
+        block = np.where(valid, values, self.nodata).astype(values.dtype, copy=False)
+        self.band.WriteArray(block, window.col_off, window.row_off)
+
+        if self.statistics is not None:
+            self.statistics.update(values[valid])
+
+    def close(self):
+        """Flushes and closes the output dataset, writing the gathered
+        statistics sidecar.
+        """
+        if self.dataset is None:
+            return
+        self.band.FlushCache()
+        self.band = None
+        self.dataset = None
+
+        if self.statistics is not None:
+            write_statistics(self.path, self.statistics)
+
+
+def burn_mask(
+    vector_paths: typing.List[str], grid: RasterGrid, output_path: str
+) -> str:
+    """Burns the polygons of the vector layers onto the grid as a bit
+    packed Byte raster, pixels covered by the polygons are set to one.
+
+    :param vector_paths: Paths of the polygon layers
+    :type vector_paths: typing.List[str]
+
+    :param grid: Target grid
+    :type grid: RasterGrid
+
+    :param output_path: Path of the mask raster
+    :type output_path: str
+
+    :returns: Path of the mask raster
+    :rtype: str
+    """
+    dataset = gdal.GetDriverByName("GTiff").Create(
+        output_path,
+        grid.width,
+        grid.height,
+        1,
+        gdal.GDT_Byte,
+        options=["TILED=YES", "NBITS=1", "COMPRESS=DEFLATE", "BIGTIFF=IF_SAFER"],
+    )
+    if dataset is None:
+        raise ValueError(f"Unable to create mask raster {output_path}")
+
+    dataset.SetGeoTransform(grid.geotransform)
+    if grid.crs_wkt:
+        dataset.SetProjection(grid.crs_wkt)
+
+    for path in vector_paths:
+        vector = gdal.OpenEx(path, gdal.OF_VECTOR)
+        if vector is None:
+            raise ValueError(f"Unable to open mask layer {path}")
+        gdal.Rasterize(
+            dataset,
+            vector,
+            layers=[vector.GetLayer(0).GetName()],
+            burnValues=[1],
+        )
+        vector = None
+
+    dataset.FlushCache()
+    dataset = None
+
+    return output_path
+
+
+def reference_grid(
+    reference_path: str, bounds: typing.Tuple[float, float, float, float]
+) -> RasterGrid:
+    """Returns the grid of the reference raster pixels covering the
+    bounds, the bounds are expanded to the reference pixel boundaries.
+
+    :param reference_path: Reference raster path
+    :type reference_path: str
+
+    :param bounds: Bounds as (x_min, y_min, x_max, y_max) in the
+    reference CRS
+    :type bounds: typing.Tuple[float, float, float, float]
+
+    :returns: Grid aligned with the reference raster
+    :rtype: RasterGrid
+    """
+    dataset = gdal.Open(reference_path)
+    if dataset is None:
+        raise ValueError(f"Unable to open raster {reference_path}")
+
+    origin_x, x_res, _, origin_y, _, y_res = dataset.GetGeoTransform()
+    x_res = abs(x_res)
+    y_res = abs(y_res)
+    x_min, y_min, x_max, y_max = bounds
+
+    col_start = math.floor((x_min - origin_x) / x_res + GRID_TOLERANCE)
+    col_end = math.ceil((x_max - origin_x) / x_res - GRID_TOLERANCE)
+    row_start = math.floor((origin_y - y_max) / y_res + GRID_TOLERANCE)
+    row_end = math.ceil((origin_y - y_min) / y_res - GRID_TOLERANCE)
+
+    return RasterGrid(
+        x_min=origin_x + col_start * x_res,
+        y_max=origin_y - row_start * y_res,
+        x_res=x_res,
+        y_res=y_res,
+        width=max(col_end - col_start, 1),
+        height=max(row_end - row_start, 1),
+        crs_wkt=dataset.GetProjection(),
+    )
+
+
+def warp_to_grid(
+    input_path: str,
+    grid: RasterGrid,
+    output_path: str,
+    resample_alg: int = gdal.GRA_NearestNeighbour,
+    nodata: float = NO_DATA_VALUE,
+    multithreading: bool = False,
+) -> str:
+    """Reprojects, aligns and clips the input raster onto the grid in a
+    single warp, writing a Float32 GeoTIFF whose nodata value replaces
+    the input nodata value.
+
+    :param input_path: Input raster path
+    :type input_path: str
+
+    :param grid: Target grid
+    :type grid: RasterGrid
+
+    :param output_path: Output raster path
+    :type output_path: str
+
+    :param resample_alg: GDAL resampling algorithm
+    :type resample_alg: int
+
+    :param nodata: Nodata value of the output
+    :type nodata: float
+
+    :param multithreading: Whether to warp using multiple threads
+    :type multithreading: bool
+
+    :returns: Output raster path
+    :rtype: str
+    """
+    dataset = gdal.Warp(
+        output_path,
+        input_path,
+        format="GTiff",
+        outputBounds=grid.bounds,
+        width=grid.width,
+        height=grid.height,
+        dstSRS=grid.crs_wkt or None,
+        dstNodata=nodata,
+        outputType=gdal.GDT_Float32,
+        resampleAlg=resample_alg,
+        multithread=multithreading,
+        warpOptions=["NUM_THREADS=ALL_CPUS"] if multithreading else [],
+        creationOptions=["TILED=YES", "BIGTIFF=IF_SAFER"],
+    )
+    if dataset is None:
+        raise ValueError(f"Unable to warp raster {input_path} to the grid")
+
+    dataset.FlushCache()
+    dataset = None
+
+    return output_path
+
+
+def aligned_offsets(
+    path: str, grid: RasterGrid, nodata: float
+) -> typing.Union[typing.Tuple[int, int], None]:
+    """Checks from the raster header only whether the raster is already
+    on the grid, covers the whole grid and uses the passed nodata value.
+
+    :param path: Raster path
+    :type path: str
+
+    :param grid: Target grid
+    :type grid: RasterGrid
+
+    :param nodata: Expected nodata value
+    :type nodata: float
+
+    :returns: Column and row offsets of the grid origin in the raster or
+    None if the raster needs to be warped onto the grid.
+    :rtype: typing.Union[typing.Tuple[int, int], None]
+    """
+    dataset = gdal.Open(path)
+    if dataset is None:
+        return None
+
+    offsets = grid_offsets(dataset, grid)
+    if offsets is None:
+        return None
+
+    col, row = offsets
+    if (
+        col < 0
+        or row < 0
+        or col + grid.width > dataset.RasterXSize
+        or row + grid.height > dataset.RasterYSize
+    ):
+        return None
+
+    source_nodata = dataset.GetRasterBand(1).GetNoDataValue()
+    if source_nodata is None or nodata is None:
+        return None
+
+    if math.isnan(nodata):
+        return offsets if math.isnan(source_nodata) else None
+
+    return offsets if source_nodata == nodata else None
+
+
+def raster_size(path: str) -> typing.Tuple[int, int]:
+    """Returns the size of the raster read from its header.
+
+    :param path: Raster path
+    :type path: str
+
+    :returns: Raster width and height in pixels
+    :rtype: typing.Tuple[int, int]
+    """
+    dataset = gdal.Open(path)
+    if dataset is None:
+        raise ValueError(f"Unable to open raster {path}")
+
+    return dataset.RasterXSize, dataset.RasterYSize
+
+
+def window_vrt(
+    path: str, offsets: typing.Tuple[int, int], grid: RasterGrid, output_path: str
+) -> str:
+    """Exposes the grid window of an aligned raster as a virtual raster
+    referencing the source pixels, without copying them.
+
+    :param path: Aligned raster path
+    :type path: str
+
+    :param offsets: Column and row offsets of the grid origin in the raster
+    :type offsets: typing.Tuple[int, int]
+
+    :param grid: Target grid
+    :type grid: RasterGrid
+
+    :param output_path: Path of the virtual raster
+    :type output_path: str
+
+    :returns: Path of the virtual raster
+    :rtype: str
+    """
+    col, row = offsets
+    dataset = gdal.Translate(
+        output_path,
+        path,
+        format="VRT",
+        srcWin=[col, row, grid.width, grid.height],
+    )
+    if dataset is None:
+        raise ValueError(f"Unable to create the virtual raster of {path}")
+
+    dataset = None
+
+    return output_path
+
+
+def alias_raster(path: str, output_path: str) -> str:
+    """Exposes the raster through a virtual raster at the output path,
+    giving it a new file name without copying its pixels.
+
+    :param path: Raster path
+    :type path: str
+
+    :param output_path: Path of the virtual raster
+    :type output_path: str
+
+    :returns: Path of the virtual raster
+    :rtype: str
+    """
+    dataset = gdal.BuildVRT(output_path, [path])
+    if dataset is None:
+        raise ValueError(f"Unable to create the virtual raster of {path}")
+
+    dataset = None
+
+    return output_path
@@ -0,0 +1,307 @@
+# -*- coding: utf-8 -*-
+"""
+    Streaming raster statistics gathered while the outputs are written
+    and stored in a sidecar file next to each output raster.
+"""
+
+import json
+import math
+import os
+import typing
+import uuid
+
+import numpy as np
+from osgeo import gdal
+
+# Suffix appended to the raster path for its statistics sidecar.
+STATISTICS_SUFFIX = ".stats.json"
+
+# Maximum number of histogram bins.
+HISTOGRAM_BINS = 256
+
+# Bits of the float64 mantissa, bounds the histogram bin indices.
+MANTISSA_BITS = 52
+
+
+class RasterStatistics:
+    """Exact minimum, maximum, sum and count of the valid pixels with a
+    histogram of power of two bin widths. Bins are anchored at zero so
+    that the statistics of separate windows or tiles can be merged.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.sum = 0.0
+        self.sum_squares = 0.0
+        self.minimum = math.inf
+        self.maximum = -math.inf
+        self.bin_exponent: typing.Union[int, None] = None
+        self.bin_start = 0
+        self.bins = np.zeros(0, dtype=np.int64)
+
+    @property
+    def bin_width(self) -> float:
+        """Width of the histogram bins."""
+        return math.ldexp(1.0, self.bin_exponent or 0)
+
+    @property
+    def mean(self) -> float:
+        """Mean of the valid pixels."""
+        return self.sum / self.count if self.count else math.nan
+
+    @property
+    def std(self) -> float:
+        """Population standard deviation of the valid pixels."""
+        if not self.count:
+            return math.nan
+        variance = self.sum_squares / self.count - self.mean**2
+
+        return math.sqrt(max(variance, 0.0))
+
+    def update(self, values: np.ndarray):
+        """Adds the values of valid pixels.
+
+        :param values: Values of the valid pixels
+        :type values: np.ndarray
+        """
+        values = np.asarray(values, dtype=np.float64).ravel()
+        if values.size == 0:
+            return
+
+        minimum = float(values.min())
+        maximum = float(values.max())
+        self.count += int(values.size)
+        self.sum += float(values.sum())
+        self.sum_squares += float(np.dot(values, values))
+        self.minimum = min(self.minimum, minimum)
+        self.maximum = max(self.maximum, maximum)
+
+        if self.bin_exponent is None:
+            self.bin_exponent = self._initial_exponent(minimum, maximum)
+        self._fit(minimum, maximum)
+
+        indices = np.floor(values / self.bin_width).astype(np.int64)
+        self.bins += np.bincount(indices - self.bin_start, minlength=len(self.bins))
+
+    def merge(self, other: "RasterStatistics"):
+        """Adds the statistics of other pixels.
+
+        :param other: Statistics of the other pixels
+        :type other: RasterStatistics
+        """
+        if other.count == 0:
+            return
+
+        self.count += other.count
+        self.sum += other.sum
+        self.sum_squares += other.sum_squares
+        self.minimum = min(self.minimum, other.minimum)
+        self.maximum = max(self.maximum, other.maximum)
+
+        other_bins = other.bins
+        other_start = other.bin_start
+        if self.bin_exponent is None:
+            self.bin_exponent = other.bin_exponent
+        for _ in range(other.bin_exponent, self.bin_exponent):
+            other_start, other_bins = _coarsen(other_start, other_bins)
+        while self.bin_exponent < other.bin_exponent:
+            self._coarsen()
+
+        while True:
+            start, end = other_start, other_start + len(other_bins)
+            if len(self.bins):
+                start = min(start, self.bin_start)
+                end = max(end, self.bin_start + len(self.bins))
+            if end - start <= HISTOGRAM_BINS:
+                break
+            self._coarsen()
+            other_start, other_bins = _coarsen(other_start, other_bins)
+
+        self._fit_indices(other_start, other_start + len(other_bins))
+        offset = other_start - self.bin_start
+        self.bins[offset : offset + len(other_bins)] += other_bins
+
+    def to_dict(self) -> dict:
+        """Returns the statistics as a dictionary.
+
+        :returns: Statistics dictionary
+        :rtype: dict
+        """
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "sum_squares": self.sum_squares,
+            "minimum": self.minimum if self.count else None,
+            "maximum": self.maximum if self.count else None,
+            "mean": self.mean if self.count else None,
+            "std": self.std if self.count else None,
+            "histogram": {
+                "bin_exponent": self.bin_exponent,
+                "bin_start": self.bin_start,
+                "bin_width": self.bin_width,
+                "counts": self.bins.tolist(),
+            },
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "RasterStatistics":
+        """Creates the statistics from their dictionary.
+
+        :param data: Statistics dictionary
+        :type data: dict
+
+        :returns: Raster statistics
+        :rtype: RasterStatistics
+        """
+        statistics = cls()
+        statistics.count = int(data["count"])
+        statistics.sum = float(data["sum"])
+        statistics.sum_squares = float(data["sum_squares"])
+        if statistics.count:
+            statistics.minimum = float(data["minimum"])
+            statistics.maximum = float(data["maximum"])
+        histogram = data["histogram"]
+        statistics.bin_exponent = histogram["bin_exponent"]
+        statistics.bin_start = int(histogram["bin_start"])
+        statistics.bins = np.array(histogram["counts"], dtype=np.int64)
+
+        return statistics
+
+    @staticmethod
+    def _initial_exponent(minimum: float, maximum: float) -> int:
+        """Returns the smallest bin width exponent spanning the values
+        range in the histogram bins, with bin indices that fit the
+        float64 mantissa.
+        """
+        magnitude = max(abs(minimum), abs(maximum))
+        exponent = math.frexp(magnitude)[1] - MANTISSA_BITS if magnitude else 0
+        if maximum > minimum:
+            exponent = max(
+                exponent, math.ceil(math.log2((maximum - minimum) / HISTOGRAM_BINS))
+            )
+
+        return exponent
+
+    def _coarsen(self):
+        """Doubles the bins width, merging the pairs of bins."""
+        self.bin_start, self.bins = _coarsen(self.bin_start, self.bins)
+        self.bin_exponent += 1
+
+    def _fit(self, minimum: float, maximum: float):
+        """Extends the histogram to the values range."""
+        self._fit_indices(
+            math.floor(minimum / self.bin_width),
+            math.floor(maximum / self.bin_width) + 1,
+        )
+
+    def _fit_indices(self, start: int, end: int):
+        """Extends the histogram to the bin indices range, coarsening
+        the bins while the range does not fit the bins count.
+        """
+        if len(self.bins):
+            start = min(start, self.bin_start)
+            end = max(end, self.bin_start + len(self.bins))
+
+        while end - start > HISTOGRAM_BINS:
+            self._coarsen()
+            start = start // 2
+            end = (end - 1) // 2 + 1
+
+        bins = np.zeros(end - start, dtype=np.int64)
+        if len(self.bins):
+            offset = self.bin_start - start
+            bins[offset : offset + len(self.bins)] = self.bins
+        self.bin_start = start
+        self.bins = bins
+
+
+def _coarsen(start: int, bins: np.ndarray) -> typing.Tuple[int, np.ndarray]:
+    """Merges the pairs of bins of a histogram anchored at zero.
+
+    :param start: Index of the first bin
+    :type start: int
+
+    :param bins: Bin counts
+    :type bins: np.ndarray
+
+    :returns: Index of the first merged bin and the merged counts
+    :rtype: typing.Tuple[int, np.ndarray]
+    """
+    if len(bins) == 0:
+        return start // 2, bins
+
+    indices = np.arange(start, start + len(bins)) // 2
+    merged_start = int(indices[0])
+
+    return merged_start, np.bincount(indices - merged_start, weights=bins).astype(
+        np.int64
+    )
+
+
+def statistics_path(path: str) -> str:
+    """Returns the statistics sidecar path of the raster."""
+    return f"{path}{STATISTICS_SUFFIX}"
+
+
+def write_statistics(path: str, statistics: RasterStatistics):
+    """Sets the statistics on the raster band and writes the sidecar of
+    the raster, the sidecar records the raster size and modification
+    time to detect a raster rewritten after its statistics.
+
+    :param path: Raster path
+    :type path: str
+
+    :param statistics: Raster statistics
+    :type statistics: RasterStatistics
+    """
+    if statistics.count:
+        dataset = gdal.Open(path, gdal.GA_Update)
+        if dataset is not None:
+            dataset.GetRasterBand(1).SetStatistics(
+                statistics.minimum,
+                statistics.maximum,
+                statistics.mean,
+                statistics.std,
+            )
+            dataset = None
+
+    stat = os.stat(path)
+    data = statistics.to_dict()
+    data["raster_size"] = stat.st_size
+    data["raster_mtime"] = stat.st_mtime_ns
+
+    sidecar_path = statistics_path(path)
+    temporary_path = f"{sidecar_path}.{uuid.uuid4().hex}.tmp"
+    with open(temporary_path, "w") as f:
+        json.dump(data, f)
+    os.replace(temporary_path, sidecar_path)
+
+
+def read_statistics(path: str) -> typing.Union[RasterStatistics, None]:
+    """Reads the statistics sidecar of the raster.
+
+    :param path: Raster path
+    :type path: str
+
+    :returns: Raster statistics or None if the raster has no up to
+    date sidecar
+    :rtype: typing.Union[RasterStatistics, None]
+    """
+    sidecar_path = statistics_path(path)
+    if not os.path.exists(sidecar_path) or not os.path.exists(path):
+        return None
+
+    try:
+        with open(sidecar_path) as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    stat = os.stat(path)
+    if (data.get("raster_size"), data.get("raster_mtime")) != (
+        stat.st_size,
+        stat.st_mtime_ns,
+    ):
+        return None
+
+    return RasterStatistics.from_dict(data)
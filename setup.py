@@ -23,7 +23,9 @@ setup(
         "Programming Language :: Python :: 3.10",
     ],
     keywords="cplus plugin qgis",
-    packages=find_packages(exclude=["tests", "tests.*"]),
+    packages=find_packages(
+        exclude=["tests", "tests.*", "benchmarks", "benchmarks.*"],
+    ),
     package_data={"cplus_core": ["version.json", "data/**"]},
     include_package_data=True,
     install_requires=[],
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""
+    Tests of the tiled sieve of the activities.
+"""
+
+import os
+
+import numpy as np
+import pytest
+
+pytest.importorskip("osgeo")
+
+from osgeo import gdal, osr
+
+from cplus_core.analysis.sieve import TiledSieve
+from cplus_core.definitions.constants import NO_DATA_VALUE
+
+# Size of the test raster, not a multiple of the tile sizes.
+WIDTH = 23
+HEIGHT = 17
+
+# Minimum component size kept by the sieve.
+THRESHOLD = 5
+
+
+@pytest.fixture
+def source_path(tmp_path) -> str:
+    """Creates a raster of sparse positive pixels with nodata pixels,
+    forming components of various sizes that cross the tile borders.
+    """
+    generator = np.random.default_rng(20)
+    values = np.where(
+        generator.random((HEIGHT, WIDTH)) < 0.45,
+        generator.uniform(0.1, 1.0, (HEIGHT, WIDTH)),
+        0.0,
+    ).astype(np.float32)
+    values[generator.random((HEIGHT, WIDTH)) < 0.05] = NO_DATA_VALUE
+
+    path = os.path.join(tmp_path, "activity.tif")
+    dataset = gdal.GetDriverByName("GTiff").Create(
+        path, WIDTH, HEIGHT, 1, gdal.GDT_Float32
+    )
+    dataset.SetGeoTransform((500000.0, 30.0, 0.0, 7000000.0, 0.0, -30.0))
+    crs = osr.SpatialReference()
+    crs.ImportFromEPSG(32735)
+    dataset.SetProjection(crs.ExportToWkt())
+    band = dataset.GetRasterBand(1)
+    band.SetNoDataValue(NO_DATA_VALUE)
+    band.WriteArray(values)
+    dataset = None
+
+    return path
+
+
+def sieved_values(source_path: str, output_path: str, tile_size: int) -> np.ndarray:
+    """Sieves the raster with the tile size and returns the output values."""
+    assert TiledSieve(source_path, THRESHOLD, tile_size=tile_size).run(output_path)
+
+    dataset = gdal.Open(output_path)
+    values = dataset.GetRasterBand(1).ReadAsArray()
+    dataset = None
+
+    return values
+
+
+@pytest.mark.parametrize("tile_size", [1, 3, WIDTH])
+def test_tiled_sieve_matches_single_tile(source_path, tmp_path, tile_size):
+    expected = sieved_values(
+        source_path,
+        os.path.join(tmp_path, "single_tile.tif"),
+        max(WIDTH, HEIGHT),
+    )
+    values = sieved_values(
+        source_path, os.path.join(tmp_path, f"tiles_{tile_size}.tif"), tile_size
+    )
+
+    np.testing.assert_array_equal(values, expected)
+
+
+def test_tiled_sieve_removes_small_components(source_path, tmp_path):
+    dataset = gdal.Open(source_path)
+    source = dataset.GetRasterBand(1).ReadAsArray()
+    dataset = None
+
+    values = sieved_values(source_path, os.path.join(tmp_path, "sieved.tif"), 3)
+    kept = values != NO_DATA_VALUE
+
+    assert 0 < np.count_nonzero(kept) < np.count_nonzero(source > 0)
+    np.testing.assert_array_equal(values[kept], source[kept])